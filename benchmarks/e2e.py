@@ -0,0 +1,320 @@
+"""
+Наскрізний офлайн-бенчмарк бота: справжній conv_handler з src/bot.py проти
+локальних фейкових Telegram Bot API та OpenAI-сумісного серверів.
+
+Запуск (з кореня проєкту):
+    python -m benchmarks.e2e --chats 2000 --concurrency 200
+
+Кожен симульований чат проходить сценарій одного з режимів (random, gpt,
+talk, quiz, translater, voicechat) – команда, кнопки та повідомлення
+надходять по черзі, як від живого користувача, а різні чати обробляються
+паралельно. Виводить p50/p95/p99 часу обробки оновлення (загалом і по
+режимах), кількість оновлень за секунду, кількість викликів Bot API та
+пікову памʼять процесу (RSS).
+
+Голосовий режим потребує ffmpeg; розпізнавання та синтез мовлення
+(зовнішні сервіси Google) замінюються офлайн-заглушками. Якщо ffmpeg не
+встановлено, режим voicechat пропускається.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.fake_telegram import FakeTelegramServer
+
+# Крок сценарію: ("command" | "text" | "callback" | "voice", значення)
+Step = Tuple[str, str]
+
+SCENARIOS: Dict[str, List[Step]] = {
+    "random": [
+        ("command", "/random"),
+        ("callback", "more_btn"),
+        ("callback", "end_btn"),
+    ],
+    "gpt": [
+        ("command", "/gpt"),
+        ("text", "Розкажи щось цікаве"),
+        ("text", "А ще?"),
+        ("callback", "end_btn"),
+    ],
+    "talk": [
+        ("command", "/talk"),
+        ("callback", "talk_cobain"),
+        ("text", "Привіт!"),
+        ("callback", "end_btn"),
+    ],
+    "quiz": [
+        ("command", "/quiz"),
+        ("callback", "quiz_prog"),
+        ("text", "відповідь"),
+        ("callback", "quiz_more"),
+        ("text", "відповідь"),
+        ("callback", "end_btn"),
+    ],
+    "translater": [
+        ("command", "/translater"),
+        ("callback", "to_en"),
+        ("text", "Привіт, світ"),
+        ("callback", "end_btn"),
+    ],
+    "voicechat": [
+        ("command", "/voicechat"),
+        ("voice", "voice"),
+        ("callback", "end_btn"),
+    ],
+}
+
+
+class UpdateFactory:
+    """
+    Створює JSON-оновлення Telegram від імені симульованих користувачів.
+    """
+
+    def __init__(self) -> None:
+        self.update_id = 0
+
+    def build(self, chat_id: int, kind: str, value: str) -> Dict[str, Any]:
+        """
+        Повертає оновлення для кроку сценарію.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату (і користувача).
+            kind (str): Тип кроку ("command", "text", "callback", "voice").
+            value (str): Текст, команда або дані кнопки.
+        Повертає:
+            Dict[str, Any]: Оновлення у форматі Bot API.
+        """
+        self.update_id += 1
+        user = {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"}
+        message: Dict[str, Any] = {
+            "message_id": self.update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": user,
+        }
+        if kind == "callback":
+            message["text"] = "menu"
+            return {
+                "update_id": self.update_id,
+                "callback_query": {
+                    "id": str(self.update_id),
+                    "from": user,
+                    "chat_instance": str(chat_id),
+                    "data": value,
+                    "message": message,
+                },
+            }
+        if kind == "voice":
+            message["voice"] = {
+                "file_id": value,
+                "file_unique_id": value,
+                "duration": 1,
+            }
+        else:
+            message["text"] = value
+            if kind == "command":
+                message["entities"] = [
+                    {"type": "bot_command", "offset": 0, "length": len(value)}
+                ]
+        return {"update_id": self.update_id, "message": message}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Повертає перцентиль (метод найближчого рангу).
+
+    Параметри:
+        values (List[float]): Відсортовані значення.
+        q (float): Перцентиль від 0 до 100.
+    Повертає:
+        float: Значення перцентиля (0, якщо значень немає).
+    """
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, round(q / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def sample_audio() -> Optional[bytes]:
+    """
+    Генерує секунду тону в OGG/Opus за допомогою ffmpeg (або None без ffmpeg).
+    """
+    if shutil.which("ffmpeg") is None:
+        return None
+    return subprocess.run(
+        [
+            "ffmpeg",
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "sine=frequency=440:duration=1",
+            "-c:a",
+            "libopus",
+            "-f",
+            "ogg",
+            "pipe:1",
+        ],
+        check=True,
+        capture_output=True,
+    ).stdout
+
+
+def configure_environment(
+    args: argparse.Namespace,
+    telegram: FakeTelegramServer,
+    openai: FakeOpenAIServer,
+    data_dir: str,
+) -> None:
+    """
+    Налаштовує змінні середовища бота на фейкові сервери. Має викликатися
+    до імпорту src, бо src.config читає середовище під час імпорту.
+    """
+    os.environ.update(
+        {
+            "BOT_TOKEN": "123456:FAKE-TOKEN",
+            "CHATGPT_TOKEN": "sk-fake",
+            "TELEGRAM_BASE_URL": telegram.base_url,
+            "TELEGRAM_BASE_FILE_URL": telegram.base_file_url,
+            "OPENAI_BASE_URL": openai.base_url,
+            "OPENAI_PROXY": "",
+            "DATA_DIR": data_dir,
+            "STATE_DB_PATH": os.path.join(data_dir, "state.db"),
+            "FILE_ID_CACHE_PATH": os.path.join(data_dir, "file_ids.json"),
+            "STATE_STORE": args.state_store,
+        }
+    )
+    # Ліміти на чат розраховані на живих людей, а ліміти Telegram фейковий
+    # сервер не застосовує, тож за замовчуванням вони знімаються; явно задані
+    # змінні середовища мають пріоритет
+    for name, value in {
+        "GPT_CHAT_RATE": "1000",
+        "GPT_CHAT_BURST": "1000",
+        "TELEGRAM_GLOBAL_RATE": "100000",
+        "TELEGRAM_CHAT_RATE": "1000",
+        "TELEGRAM_CHAT_BURST": "1000",
+        "GPT_MAX_QUEUE": str(args.chats),
+        "GPT_MAX_CONCURRENCY": str(args.gpt_concurrency),
+    }.items():
+        os.environ.setdefault(name, value)
+
+
+async def run(args: argparse.Namespace) -> None:
+    audio = sample_audio()
+    modes = [mode for mode in args.modes.split(",") if mode]
+    if "voicechat" in modes and audio is None:
+        print("ffmpeg не знайдено – режим voicechat пропущено.")
+        modes.remove("voicechat")
+
+    telegram = FakeTelegramServer(latency=args.telegram_latency, file_data=audio or b"")
+    openai = FakeOpenAIServer(latency=args.openai_latency)
+    await telegram.start()
+    await openai.start()
+    data_dir = tempfile.mkdtemp(prefix="bot-e2e-")
+    configure_environment(args, telegram, openai, data_dir)
+
+    bot = importlib.import_module("src.bot")
+
+    async def recognize(pcm: bytes, language: str = "uk-UA") -> str:
+        return "Привіт, як справи?"
+
+    async def synthesize(text: str, lang: str = "uk") -> bytes:
+        return audio
+
+    bot.voice_pipeline.recognize = recognize
+    bot.voice_pipeline.synthesize = synthesize
+
+    from telegram import Update
+
+    application = bot.build_application()
+    errors: List[BaseException] = []
+
+    async def count_error(update: object, context) -> None:
+        errors.append(context.error)
+
+    application.add_error_handler(count_error)
+    await application.initialize()
+    await application.post_init(application)
+
+    factory = UpdateFactory()
+    latencies: Dict[str, List[float]] = {mode: [] for mode in modes}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    processor = application.update_processor
+
+    async def simulate(chat_id: int, mode: str) -> None:
+        async with semaphore:
+            for kind, value in SCENARIOS[mode]:
+                update = Update.de_json(
+                    factory.build(chat_id, kind, value), application.bot
+                )
+                started = time.perf_counter()
+                await processor.process_update(
+                    update, application.process_update(update)
+                )
+                latencies[mode].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            simulate(args.first_chat_id + i, modes[i % len(modes)])
+            for i in range(args.chats)
+        )
+    )
+    elapsed = time.perf_counter() - started
+
+    # Той самий порядок, що й у run_polling: спершу shutdown (з останнім
+    # записом persistence), потім post_shutdown
+    await application.shutdown()
+    await application.post_shutdown(application)
+    await telegram.stop()
+    await openai.stop()
+
+    total = sorted(value for values in latencies.values() for value in values)
+    print(f"{'mode':<12} {'updates':>8} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9}")
+    for mode, values in [*latencies.items(), ("all", total)]:
+        values = sorted(values)
+        print(
+            f"{mode:<12} {len(values):>8} "
+            + " ".join(f"{percentile(values, q) * 1000:>9.1f}" for q in (50, 95, 99))
+        )
+    print(f"Чатів: {args.chats}, час: {elapsed:.2f} с")
+    print(f"Оновлень/с: {len(total) / elapsed:.1f}")
+    print(f"Помилок обробників: {len(errors)}")
+    print(f"Запитів до OpenAI: {openai.requests}")
+    print(f"Викликів Bot API: {dict(telegram.calls.most_common())}")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"Пікова памʼять (RSS): {peak / 1024:.1f} МіБ")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--modes", type=str, default=",".join(SCENARIOS))
+    parser.add_argument("--telegram-latency", type=float, default=0.05)
+    parser.add_argument("--openai-latency", type=float, default=0.2)
+    parser.add_argument("--gpt-concurrency", type=int, default=64)
+    parser.add_argument("--state-store", type=str, default="memory")
+    parser.add_argument("--first-chat-id", type=int, default=100_000)
+    args = parser.parse_args()
+    # Журнал бота на рівні INFO суттєво сповільнює обробку тисяч чатів
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
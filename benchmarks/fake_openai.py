@@ -0,0 +1,282 @@
+"""
+Локальний фейковий OpenAI-сумісний сервер для навантажувальних тестів.
+
+Відповідає на POST /v1/chat/completions з настроюваною затримкою,
+підтримує keep-alive, тож коректно відображає роботу пулу зʼєднань.
+Вміє імітувати збої API: помилки 429/5xx (з Retry-After) та повільні відповіді.
+"""
+
+from collections import deque
+from typing import Deque, NamedTuple, Optional
+
+import asyncio
+import json
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Fault(NamedTuple):
+    """
+    Збій, яким сервер відповість на запит.
+
+    status – HTTP-статус (200 – звичайна відповідь), retry_after – значення
+    заголовка Retry-After, delay – додаткова затримка перед відповіддю, с.
+    """
+
+    status: int
+    retry_after: Optional[float] = None
+    delay: float = 0.0
+
+
+class FakeOpenAIServer:
+    """
+    Мінімальний HTTP/1.1 сервер, що імітує /v1/chat/completions.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.2,
+        error_rate: float = 0.0,
+    ):
+        """
+        Параметри:
+            host (str): Адреса для прослуховування.
+            port (int): Порт (0 – вибрати вільний).
+            latency (float): Штучна затримка відповіді, с.
+            error_rate (float): Частка запитів, на які сервер відповідає 500.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.faults: Deque[Fault] = deque()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._values = 0
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        """
+        Повертає base_url для клієнта OpenAI.
+        """
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        """
+        Запускає сервер.
+        """
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("FakeOpenAIServer слухає %s", self.base_url)
+
+    async def stop(self) -> None:
+        """
+        Зупиняє сервер.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def inject(
+        self,
+        status: int,
+        count: int = 1,
+        retry_after: Optional[float] = None,
+        delay: float = 0.0,
+    ) -> None:
+        """
+        Додає збої, якими сервер відповість на наступні count запитів.
+
+        Параметри:
+            status (int): HTTP-статус (200 – лише затримка без помилки).
+            count (int): Кількість запитів.
+            retry_after (Optional[float]): Значення заголовка Retry-After, с.
+            delay (float): Додаткова затримка перед відповіддю, с.
+        """
+        self.faults.extend([Fault(status, retry_after, delay)] * count)
+
+    def next_fault(self) -> Optional[Fault]:
+        """
+        Повертає збій для поточного запиту: спершу заплановані через inject,
+        потім випадкові помилки з ймовірністю error_rate.
+        """
+        if self.faults:
+            return self.faults.popleft()
+        if self.error_rate and random.random() < self.error_rate:
+            return Fault(500)
+        return None
+
+    async def completion_body(self, request: dict) -> dict:
+        """
+        Формує тіло відповіді chat.completions.
+
+        Параметри:
+            request (dict): JSON-запит клієнта.
+        Повертає:
+            dict: Відповідь у форматі OpenAI.
+        """
+        await asyncio.sleep(self.latency)
+        messages = request.get("messages", [])
+        last = messages[-1]["content"] if messages else ""
+        content = f"echo: {last}"
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            content = json.dumps(self.fake_json(schema), ensure_ascii=False)
+        return {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+    def fake_json(self, schema: dict):
+        """
+        Генерує значення, що відповідає JSON schema (для структурованих відповідей).
+
+        Параметри:
+            schema (dict): JSON schema.
+        Повертає:
+            Значення відповідного типу.
+        """
+        kind = schema.get("type")
+        if kind == "object":
+            return {
+                key: self.fake_json(value)
+                for key, value in schema.get("properties", {}).items()
+            }
+        if kind == "array":
+            return [self.fake_json(schema.get("items", {})) for _ in range(5)]
+        if kind in ("integer", "number"):
+            return self.requests
+        if kind == "boolean":
+            return True
+        # Різні рядки, щоб елементи масиву не відсіювались як повтори
+        self._values += 1
+        return f"fake {self.requests}.{self._values}"
+
+    @staticmethod
+    def stream_body(payload: dict) -> bytes:
+        """
+        Перетворює відповідь на послідовність SSE-подій chat.completion.chunk
+        (по одній події на слово).
+
+        Параметри:
+            payload (dict): Відповідь у форматі chat.completion.
+        Повертає:
+            bytes: Тіло відповіді text/event-stream.
+        """
+        content = payload["choices"][0]["message"]["content"]
+        events = []
+        for word in content.split(" "):
+            chunk = {
+                "id": payload["id"],
+                "object": "chat.completion.chunk",
+                "created": payload["created"],
+                "model": payload["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": word + " "},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            events.append(f"data: {json.dumps(chunk)}\n\n")
+        events.append("data: [DONE]\n\n")
+        return "".join(events).encode()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Обробляє зʼєднання (кілька запитів поспіль завдяки keep-alive).
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+                self.requests += 1
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                fault = self.next_fault()
+                try:
+                    if fault is not None:
+                        await asyncio.sleep(fault.delay)
+                    if fault is not None and fault.status != 200:
+                        self._write_error(writer, fault)
+                        await writer.drain()
+                        continue
+                    request = json.loads(body or b"{}")
+                    payload = await self.completion_body(request)
+                finally:
+                    self.in_flight -= 1
+                if request.get("stream"):
+                    content_type = "text/event-stream"
+                    data = self.stream_body(payload)
+                else:
+                    content_type = "application/json"
+                    data = json.dumps(payload).encode()
+                writer.write(
+                    "HTTP/1.1 200 OK\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    "Connection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (
+            asyncio.IncompleteReadError,
+            ConnectionResetError,
+            asyncio.CancelledError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write_error(writer: asyncio.StreamWriter, fault: Fault) -> None:
+        """
+        Записує відповідь з помилкою у форматі OpenAI API.
+        """
+        data = json.dumps(
+            {
+                "error": {
+                    "message": f"Injected fault {fault.status}",
+                    "type": "server_error",
+                    "code": None,
+                }
+            }
+        ).encode()
+        headers = (
+            f"HTTP/1.1 {fault.status} Fault\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+        )
+        if fault.retry_after is not None:
+            headers += f"Retry-After: {fault.retry_after:g}\r\n"
+        writer.write((headers + "Connection: keep-alive\r\n\r\n").encode() + data)
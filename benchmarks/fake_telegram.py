@@ -0,0 +1,235 @@
+"""
+Локальний фейковий Telegram Bot API сервер для наскрізних бенчмарків.
+
+Відповідає на POST /bot<token>/<method> з настроюваною затримкою та віддає
+файли за /file/bot<token>/<path>. Приймає тіла запитів у форматах JSON,
+application/x-www-form-urlencoded та multipart/form-data (як їх надсилає
+python-telegram-bot) і повертає правдоподібні обʼєкти Message, User, File.
+"""
+
+from collections import Counter
+from typing import Any, Dict
+from urllib.parse import parse_qsl, unquote
+
+import asyncio
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Методи, що повертають надіслане або змінене повідомлення
+_MESSAGE_METHODS = {
+    "sendMessage",
+    "sendPhoto",
+    "sendVoice",
+    "sendAudio",
+    "sendDocument",
+    "editMessageText",
+    "editMessageReplyMarkup",
+    "editMessageCaption",
+}
+
+_FIELD_NAME = re.compile(rb'name="([^"]+)"')
+
+
+class FakeTelegramServer:
+    """
+    Мінімальний HTTP/1.1 сервер, що імітує Telegram Bot API.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.05,
+        file_data: bytes = b"",
+    ):
+        """
+        Параметри:
+            host (str): Адреса для прослуховування.
+            port (int): Порт (0 – вибрати вільний).
+            latency (float): Штучна затримка відповіді, с.
+            file_data (bytes): Вміст, який сервер віддає на завантаження файлів.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.file_data = file_data
+        self.calls: Counter = Counter()
+        self.requests = 0
+        self._message_id = 0
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        """
+        Повертає base_url для ApplicationBuilder (токен додається в кінець).
+        """
+        return f"http://{self.host}:{self.port}/bot"
+
+    @property
+    def base_file_url(self) -> str:
+        """
+        Повертає base_file_url для ApplicationBuilder.
+        """
+        return f"http://{self.host}:{self.port}/file/bot"
+
+    async def start(self) -> None:
+        """
+        Запускає сервер.
+        """
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("FakeTelegramServer слухає %s", self.base_url)
+
+    async def stop(self) -> None:
+        """
+        Зупиняє сервер.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @staticmethod
+    def parse_params(content_type: str, body: bytes) -> Dict[str, str]:
+        """
+        Розбирає параметри методу Bot API з тіла запиту.
+
+        Параметри:
+            content_type (str): Заголовок Content-Type.
+            body (bytes): Тіло запиту.
+        Повертає:
+            Dict[str, str]: Параметри (складні значення – JSON-рядки).
+        """
+        if not body:
+            return {}
+        if content_type.startswith("application/json"):
+            return {
+                key: value if isinstance(value, str) else json.dumps(value)
+                for key, value in json.loads(body).items()
+            }
+        if content_type.startswith("multipart/form-data"):
+            boundary = content_type.partition("boundary=")[2].strip('"').encode()
+            params = {}
+            for part in body.split(b"--" + boundary):
+                head, _, value = part.partition(b"\r\n\r\n")
+                match = _FIELD_NAME.search(head)
+                if match and b"filename=" not in head:
+                    params[match.group(1).decode()] = value[:-2].decode()
+            return params
+        return dict(parse_qsl(body.decode()))
+
+    def result_for(self, method: str, params: Dict[str, str]) -> Any:
+        """
+        Формує поле result відповіді Bot API.
+
+        Параметри:
+            method (str): Назва методу.
+            params (Dict[str, str]): Параметри запиту.
+        Повертає:
+            Any: Результат методу.
+        """
+        if method == "getMe":
+            return {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "Fake",
+                "username": "fake_bot",
+                "can_join_groups": True,
+                "can_read_all_group_messages": False,
+                "supports_inline_queries": False,
+            }
+        if method == "getFile":
+            file_id = params.get("file_id", "file")
+            return {
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "file_size": len(self.file_data),
+                "file_path": f"voice/{file_id}.oga",
+            }
+        if method not in _MESSAGE_METHODS:
+            return True
+        self._message_id += 1
+        chat_id = int(params.get("chat_id", 0))
+        message: Dict[str, Any] = {
+            "message_id": int(params.get("message_id", self._message_id)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Fake"},
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        if method == "sendPhoto":
+            message["photo"] = [
+                {
+                    "file_id": f"photo-{self._message_id}",
+                    "file_unique_id": f"photo-{self._message_id}",
+                    "width": 640,
+                    "height": 480,
+                }
+            ]
+        elif method == "sendVoice":
+            message["voice"] = {
+                "file_id": f"voice-{self._message_id}",
+                "file_unique_id": f"voice-{self._message_id}",
+                "duration": 1,
+            }
+        return message
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Обробляє зʼєднання (кілька запитів поспіль завдяки keep-alive).
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+                path = unquote(request_line.decode("latin-1").split(" ")[1])
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+                if path.startswith("/file/"):
+                    self.calls["<download>"] += 1
+                    self._write(writer, "application/octet-stream", self.file_data)
+                else:
+                    method = path.rstrip("/").rsplit("/", 1)[-1]
+                    self.calls[method] += 1
+                    params = self.parse_params(headers.get("content-type", ""), body)
+                    payload = {"ok": True, "result": self.result_for(method, params)}
+                    self._write(
+                        writer, "application/json", json.dumps(payload).encode()
+                    )
+                await writer.drain()
+        except (
+            asyncio.IncompleteReadError,
+            ConnectionResetError,
+            asyncio.CancelledError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, content_type: str, data: bytes) -> None:
+        """
+        Записує успішну відповідь.
+        """
+        writer.write(
+            "HTTP/1.1 200 OK\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: keep-alive\r\n\r\n".encode() + data
+        )
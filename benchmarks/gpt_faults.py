@@ -0,0 +1,86 @@
+"""
+Перевірка стійкості запитів до OpenAI проти локального фейкового сервера зі збоями.
+
+Запуск (з кореня проєкту):
+    python -m benchmarks.gpt_faults
+
+Прогоняє сценарії (429 з Retry-After, 5xx, повільна відповідь, тривала
+недоступність API) і для кожного виводить результат, кількість запитів до
+сервера та час виконання.
+"""
+
+import asyncio
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from src.gpt import ChatGptService, create_http_client
+from src.limits import AdmissionController
+from src.resilience import CircuitBreaker, ResilientCaller
+
+
+async def run_scenario(
+    server: FakeOpenAIServer, service: ChatGptService, name: str, calls: int = 1
+) -> None:
+    """
+    Виконує calls запитів і виводить результат кожного.
+
+    Параметри:
+        server (FakeOpenAIServer): Фейковий сервер.
+        service (ChatGptService): Сервіс, що тестується.
+        name (str): Назва сценарію.
+        calls (int): Кількість запитів.
+    """
+    for i in range(calls):
+        requests = server.requests
+        started = time.perf_counter()
+        try:
+            result = await service.complete("system", f"{name} {i}")
+        except Exception as e:
+            result = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started
+        print(f"{name:<24} {server.requests - requests:>8} {elapsed:>8.2f}  {result}")
+
+
+async def main() -> None:
+    server = FakeOpenAIServer(latency=0.01)
+    await server.start()
+    service = ChatGptService(
+        "sk-test",
+        http_client=create_http_client(proxy=None),
+        base_url=server.base_url,
+        limiter=AdmissionController(),
+        resilience=ResilientCaller(
+            deadline=2.0,
+            max_attempts=3,
+            backoff_base=0.1,
+            breaker=CircuitBreaker(failure_threshold=3, reset_timeout=1.0),
+        ),
+    )
+    try:
+        print(f"{'scenario':<24} {'requests':>8} {'seconds':>8}  result")
+        await run_scenario(server, service, "ok")
+
+        server.inject(429, retry_after=0.5)
+        await run_scenario(server, service, "429 retry-after 0.5")
+
+        server.inject(503, count=2)
+        await run_scenario(server, service, "503 x2")
+
+        server.inject(400)
+        await run_scenario(server, service, "400 (no retry)")
+
+        server.inject(200, delay=5.0)
+        await run_scenario(server, service, "slow response")
+
+        server.inject(500, count=10)
+        await run_scenario(server, service, "outage", calls=3)
+        await asyncio.sleep(1.0)
+        server.faults.clear()
+        await run_scenario(server, service, "recovered")
+    finally:
+        await service.aclose()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Навантажувальний тест ChatGptService проти локального фейкового сервера.
+
+Запуск (з кореня проєкту):
+    python -m benchmarks.gpt_load --latency 0.2 --requests 64
+
+Для кожного рівня паралельності виводить пропускну здатність (запитів/с).
+При неблокуючому клієнті вона зростає приблизно пропорційно паралельності,
+доки не впреться у розмір пулу зʼєднань.
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from src.gpt import ChatGptService, create_http_client
+from src.limits import AdmissionController
+
+
+async def run_level(service: ChatGptService, concurrency: int, total: int) -> float:
+    """
+    Виконує total запитів з заданою паралельністю.
+
+    Параметри:
+        service (ChatGptService): Сервіс, що тестується.
+        concurrency (int): Кількість одночасних чатів (кожен запит – окремий chat_id).
+        total (int): Загальна кількість запитів.
+    Повертає:
+        float: Пропускна здатність, запитів/с.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            await service.add_message(i, f"ping {i}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", type=str, default="1,4,16,64")
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--max-concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(latency=args.latency)
+    await server.start()
+    service = ChatGptService(
+        "sk-test",
+        http_client=create_http_client(
+            proxy=None, max_connections=args.max_connections
+        ),
+        base_url=server.base_url,
+        limiter=AdmissionController(
+            max_concurrency=args.max_concurrency, max_queue=args.requests
+        ),
+    )
+    try:
+        print(f"{'concurrency':>12} {'req/s':>10}")
+        for level in (int(x) for x in args.levels.split(",")):
+            throughput = await run_level(service, level, args.requests)
+            print(f"{level:>12} {throughput:>10.1f}")
+    finally:
+        await service.aclose()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
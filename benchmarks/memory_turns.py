@@ -0,0 +1,85 @@
+"""
+Вимірювання памʼяті на одну збережену репліку розмови.
+
+Запуск (з кореня проєкту):
+    python -m benchmarks.memory_turns --turns 100000
+
+Порівнює попередні представлення репліки (словник, обʼєкт
+ChatCompletionMessage, кортеж) з MessageRecord та виводить, скільки байтів
+займає одна репліка без урахування самого тексту (тексти створюються
+заздалегідь і спільні для всіх варіантів).
+"""
+
+import argparse
+import gc
+import tracemalloc
+from typing import Callable, List
+
+from openai.types.chat import ChatCompletionMessage
+
+from src.history import HistoryPolicy
+from src.messages import MessageRecord
+from src.session import SessionManager
+
+
+def measure(build: Callable[[], object], turns: int) -> float:
+    """
+    Повертає кількість байтів на репліку для структури, яку створює build.
+
+    Параметри:
+        build (Callable[[], object]): Функція, що створює turns реплік.
+        turns (int): Кількість реплік.
+    Повертає:
+        float: Байтів на репліку.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    data = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del data
+    return (after - before) / turns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=100_000)
+    parser.add_argument("--chats", type=int, default=1000)
+    args = parser.parse_args()
+
+    roles = ["user", "assistant"]
+    texts: List[str] = [f"повідомлення номер {i}" for i in range(args.turns)]
+    pairs = [(roles[i % 2], text) for i, text in enumerate(texts)]
+
+    variants = {
+        "dict": lambda: [{"role": role, "content": text} for role, text in pairs],
+        "ChatCompletionMessage": lambda: [
+            ChatCompletionMessage(role="assistant", content=text) for _, text in pairs
+        ],
+        "tuple": lambda: [(role, text, 10) for role, text in pairs],
+        "MessageRecord": lambda: [
+            MessageRecord(role, text, 10) for role, text in pairs
+        ],
+    }
+    print(f"{'representation':<24} {'bytes/turn':>10}")
+    for name, build in variants.items():
+        print(f"{name:<24} {measure(build, args.turns):>10.1f}")
+
+    per_chat = args.turns // args.chats
+
+    def sessions() -> SessionManager:
+        manager = SessionManager(
+            max_turns=per_chat,
+            max_total_chars=10**12,
+            policy=HistoryPolicy(max_tokens=10**9),
+        )
+        for i, (role, text) in enumerate(pairs):
+            manager.append(i % args.chats, role, text)
+        return manager
+
+    print(f"{'SessionManager':<24} {measure(sessions, args.turns):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,61 @@
 import warnings
 import logging
 
+from openai import APIError
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
+from src import config, metrics
+from src.cache import TranslationCache
 from src.gpt import ChatGptService
+from src.limits import AdmissionError, FloodRateLimiter
+from src.modes import ModeRegistry
+from src.resilience import CircuitOpenError, DeadlineExceededError
+from src.prefetch import (
+    FACT_BATCH_SCHEMA,
+    QUIZ_ITEM_SCHEMA,
+    FactReservoir,
+    QuizItem,
+    QuizPool,
+    parse_fact_batch,
+    parse_quiz_item,
+)
+from src.shards import ShardDispatcher
+from src.storage import StorePersistence, create_state_store
+from src.updates import ChatOrderedUpdateProcessor
+from src.voice import VoiceBusyError, VoicePipeline, VoiceProcessingError
 from src.util import (
     load_message,
     send_text,
     send_image,
     show_main_menu,
     send_text_buttons,
+    send_streaming_text_buttons,
+    build_keyboard,
     load_prompt,
     is_correct_answer,
     dialog_user_info_to_str,
+    resource_registry,
     Dialog,
+    MenuState,
 )
 from src.credentials import CHATGPT_TOKEN, BOT_TOKEN
 
-import os
-import tempfile
-import subprocess
-import uuid
+from typing import Any, Dict, List, Optional, Set
+
+import asyncio
+import secrets
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
@@ -52,48 +78,71 @@ logger = logging.getLogger(__name__)
     VOICE_CHAT,
 ) = range(10)
 
-dialog = Dialog()
-chat_gpt = ChatGptService(CHATGPT_TOKEN)
+state_store = create_state_store()
+dialog = Dialog(state_store)
+main_menu = MenuState(
+    state_store,
+    {
+        "start": "Головне меню",
+        "random": "Дізнатися випадковий факт 🧠",
+        "gpt": "Задати питання чату GPT 🤖",
+        "talk": "Поговорити з відомою особистістю 👤",
+        "quiz": "Взяти участь у квізі ❓",
+        "translater": "Перекладач 🌐",
+        "voicechat": "Голосовий чат з GPT 🎙️",
+        "cancel": "Завершити діалог з chat-bot",
+    },
+)
+chat_gpt = ChatGptService(CHATGPT_TOKEN, summary_prompt=load_prompt("summary"))
+voice_pipeline = VoicePipeline()
+translation_cache = TranslationCache()
 
 
-def get_personalities() -> dict:
-    """
-    Повертає словник доступних особистостей для режиму |Діалог з відомою особистістю|
-    """
-    return {
-        "talk_cobain": "Курт Кобейн",
-        "talk_hawking": "Стівен Хокінг",
-        "talk_nietzsche": "Фрідріх Ніцше",
-        "talk_queen": "Єлизавета II",
-        "talk_tolkien": "Джон Толкін",
-        "end_btn": "До головного меню",
-    }
+# Особистості, теми квізу та мови перекладу (resources/modes.json)
+mode_registry = ModeRegistry()
+
+# Незмінні клавіатури створюються один раз
+END_KEYBOARD = build_keyboard({"end_btn": "Закінчити"})
+RANDOM_KEYBOARD = build_keyboard({"more_btn": "Хочу ще факт", "end_btn": "Закінчити"})
+TALK_KEYBOARD = build_keyboard({"talk": "Інша особистість", "end_btn": "Закінчити"})
+QUIZ_KEYBOARD = build_keyboard(
+    {"quiz_more": "Ще питання", "quiz": "Обрати іншу тему", "end_btn": "Закінчити"}
+)
+TRANSLATION_KEYBOARD = build_keyboard(
+    {"translater": "Змінити мову", "end_btn": "Головне меню"}
+)
 
 
-def get_quiz_themes() -> dict:
+async def send_busy_text(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, error: AdmissionError
+) -> None:
     """
-    Повертає словник тем для режиму |Квіз|
+    Швидко повідомляє користувача, що запит до GPT відхилено через перевантаження.
     """
-    return {
-        "quiz_prog": "Програмування мовою Python",
-        "quiz_math": "Математичні теорії",
-        "quiz_biology": "Біологія",
-        "end_btn": "До головного меню",
-    }
+    logger.warning("Запит чату %d відхилено: %s", update.effective_chat.id, error)
+    await send_text(
+        update,
+        context,
+        f"Зараз забагато запитів, спробуйте через {max(1, round(error.retry_after))} с.",
+    )
 
 
-def get_translation_languages() -> dict:
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
-    Повертає словник мов для перекладу.
+    Обробляє помилки обробників: на відхилений запит до GPT відповідає
+    повідомленням про перевантаження, на недоступність OpenAI API –
+    проханням спробувати пізніше. Решту помилок записує в лог.
     """
-    return {
-        "to_en": "Англійська",
-        "to_uk": "Українська",
-        "to_cs": "Чеська",
-        "to_es": "Іспанська",
-        "to_fr": "Французька",
-        "end_btn": "До головного меню",
-    }
+    error = context.error
+    chat = update.effective_chat if isinstance(update, Update) else None
+    if isinstance(error, AdmissionError) and chat:
+        await send_busy_text(update, context, error)
+        return
+    logger.error("Помилка обробки оновлення: %s", error, exc_info=error)
+    if isinstance(error, (APIError, CircuitOpenError, DeadlineExceededError)) and chat:
+        await send_text(
+            update, context, "Сервіс GPT зараз недоступний, спробуйте пізніше."
+        )
 
 
 async def answer_callback(update: Update) -> None:
@@ -124,21 +173,12 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     logger.info("Запуск головного меню.")
     context.user_data.clear()
     text = load_message("main")
-    await send_image(update, context, "main")
-    await send_text(update, context, text)
-    await show_main_menu(
-        update,
-        context,
-        {
-            "start": "Головне меню",
-            "random": "Дізнатися випадковий факт 🧠",
-            "gpt": "Задати питання чату GPT 🤖",
-            "talk": "Поговорити з відомою особистістю 👤",
-            "quiz": "Взяти участь у квізі ❓",
-            "translater": "Перекладач 🌐",
-            "voicechat": "Голосовий чат з GPT 🎙️",
-            "cancel": "Завершити діалог з chat-bot",
-        },
+    # Скидання меню чату не залежить від повідомлення, тож виконується одночасно
+    await asyncio.gather(
+        send_image(
+            update, context, "main", caption=text, parse_mode=ParseMode.MARKDOWN
+        ),
+        show_main_menu(update, context, main_menu),
     )
     return MAIN
 
@@ -151,36 +191,49 @@ async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     logger.info(f"Головне меню: вибрано команду '%s'.", query)
     await answer_callback(update)
 
-    if query == "random":
-        return await random_start(update, context)
-    elif query == "gpt":
-        return await gpt_start(update, context)
-    elif query == "talk":
-        return await talk_start(update, context)
-    elif query == "quiz":
-        return await quiz_start(update, context)
-    elif query == "translater":
-        return await translator_start(update, context)
-    elif query == "voicechat":
-        return await voice_chat_start(update, context)
-    else:
+    route = MAIN_MENU_ROUTES.get(query)
+    if route is None:
         return await unknown_command(update, context, MAIN)
+    return await route(update, context)
 
 
 # === Режим |Дізнатись випадковий факт| ===
+async def generate_fact_batch() -> List[str]:
+    """
+    Генерує пакет випадкових фактів одним структурованим запитом.
+    Якщо структурована відповідь недоступна, генерує один факт.
+    Використовується для фонового заповнення резервуару фактів.
+    """
+    request_text = load_prompt("random_batch").format(count=config.RANDOM_FACTS_BATCH)
+    data = await chat_gpt.complete_structured(
+        load_prompt("random"), request_text, "fact_batch", FACT_BATCH_SCHEMA
+    )
+    facts = parse_fact_batch(data)
+    if facts:
+        return facts
+    content = await chat_gpt.complete(load_prompt("random"), "")
+    return [content.strip()] if content.strip() else []
+
+
+fact_reservoir = FactReservoir(generate_fact_batch)
+
+
 async def random_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     Запускає режим |Дізнатись випадковий факт|
     """
     logger.info('Режим "Дізнатись випадковий факт" запущено.')
     text = load_message("random")
-    await send_image(update, context, "random")
-    await send_text(update, context, text)
-    prompt = load_prompt("random")
-    content = await chat_gpt.add_message(prompt)
-    await send_text_buttons(
-        update, context, content, {"more_btn": "Хочу ще факт", "end_btn": "Закінчити"}
+    # Факт отримується, поки надсилається зображення
+    _, content = await asyncio.gather(
+        send_image(
+            update, context, "random", caption=text, parse_mode=ParseMode.MARKDOWN
+        ),
+        fact_reservoir.get(),
     )
+    if content is None:
+        content = "Не вдалося дізнатися факт, спробуйте ще раз."
+    await send_text_buttons(update, context, content, RANDOM_KEYBOARD)
     return RANDOM
 
 
@@ -209,10 +262,11 @@ async def gpt_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     dialog.clear_history(update.effective_chat.id)
     prompt = load_prompt("gpt")
     dialog.add_message(update.effective_chat.id, "system", prompt)
-    await send_image(update, context, "gpt")
     text = load_message("gpt")
-    content = await chat_gpt.send_question(prompt, text)
-    await send_text_buttons(update, context, content, {"end_btn": "Закінчити"})
+    content = await chat_gpt.send_question(
+        update.effective_chat.id, prompt, text, cached=True
+    )
+    await send_image(update, context, "gpt", caption=content, buttons=END_KEYBOARD)
     return GPT
 
 
@@ -226,9 +280,11 @@ async def gpt_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     logger.info("GPT-чат: отримано повідомлення: %s", user_message)
     dialog.add_message(update.effective_chat.id, "user", user_message)
     try:
-        content = await chat_gpt.add_message(user_message)
+        chunks = chat_gpt.stream_message(update.effective_chat.id, user_message)
+        await send_streaming_text_buttons(update, context, chunks, END_KEYBOARD)
         logger.debug("GPT-чат: отримано відповідь від моделі.")
-        await send_text_buttons(update, context, content, {"end_btn": "Закінчити"})
+    except AdmissionError as e:
+        await send_busy_text(update, context, e)
     except Exception as e:
         logger.error("Помилка в GPT-чат: %s", e)
         await send_text(update, context, f"Сталася помилка: {e}")
@@ -254,10 +310,14 @@ async def talk_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     logger.info('Режим "Поговорити з відомою особистістю" запущено.')
     context.user_data["mode"] = "talk"
-    await send_image(update, context, "talk")
     text = load_message("talk")
-    personalities = get_personalities()
-    await send_text_buttons(update, context, text, personalities)
+    await send_image(
+        update,
+        context,
+        "talk",
+        caption=text,
+        buttons=mode_registry.personalities.keyboard,
+    )
     return TALK_CHOICE
 
 
@@ -272,30 +332,20 @@ async def talk_choice_callback(
     await answer_callback(update)
     if query == "end_btn":
         return await start(update, context)
-    if query.startswith("talk_"):
-        personality_data = {
-            "talk_cobain": ("talk_cobain", "Курт Кобейн"),
-            "talk_hawking": ("talk_hawking", "Стівен Хокінг"),
-            "talk_nietzsche": ("talk_nietzsche", "Фрідріх Ніцше"),
-            "talk_queen": ("talk_queen", "Єлизавета II"),
-            "talk_tolkien": ("talk_tolkien", "Джон Толкін"),
-        }
-        if query in personality_data:
-            file_name, display_name = personality_data[query]
-            logger.info("Обрано особистість: %s", display_name)
-            await send_image(update, context, file_name)
-            prompt = load_prompt(file_name)
-            dialog.clear_history(update.effective_chat.id)
-            dialog.add_message(update.effective_chat.id, "system", prompt)
-            content = await chat_gpt.send_question(prompt, "")
-            await send_text_buttons(
-                update,
-                context,
-                content,
-                {"talk": "Інша особистість", "end_btn": "Закінчити"},
-            )
-            return TALK_CHAT
-    return await unknown_command(update, context, TALK_CHOICE)
+    personality = mode_registry.personalities.get(query)
+    if personality is None:
+        return await unknown_command(update, context, TALK_CHOICE)
+    logger.info("Обрано особистість: %s", personality.name)
+    prompt = load_prompt(personality.prompt)
+    dialog.clear_history(update.effective_chat.id)
+    dialog.add_message(update.effective_chat.id, "system", prompt)
+    content = await chat_gpt.send_question(
+        update.effective_chat.id, prompt, "", cached=True
+    )
+    await send_image(
+        update, context, personality.image, caption=content, buttons=TALK_KEYBOARD
+    )
+    return TALK_CHAT
 
 
 async def talk_chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -310,13 +360,15 @@ async def talk_chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE)
     )
     dialog.add_message(update.effective_chat.id, "user", user_message)
     try:
-        content = await chat_gpt.add_message(user_message)
-        await send_text_buttons(
+        chunks = chat_gpt.stream_message(update.effective_chat.id, user_message)
+        await send_streaming_text_buttons(
             update,
             context,
-            content,
-            {"talk": "Інша особистість", "end_btn": "Закінчити"},
+            chunks,
+            TALK_KEYBOARD,
         )
+    except AdmissionError as e:
+        await send_busy_text(update, context, e)
     except Exception as e:
         logger.error('Помилка в режимі "Поговорити з відомою особистістю": %s', e)
         await send_text(update, context, f"Сталася помилка: {e}")
@@ -345,13 +397,68 @@ async def quiz_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     logger.info('Режим "Квіз" запущено.')
     context.user_data["mode"] = "quiz"
     dialog.clear_history(update.effective_chat.id)
-    quiz_themes = get_quiz_themes()
-    await send_image(update, context, "quiz")
     text = load_message("quiz")
-    await send_text_buttons(update, context, text, quiz_themes)
+    await send_image(
+        update,
+        context,
+        "quiz",
+        caption=text,
+        buttons=mode_registry.quiz_themes.keyboard,
+    )
     return QUIZ_THEME
 
 
+async def generate_quiz_item(
+    theme: str, chat_id: Optional[int] = None
+) -> Optional[QuizItem]:
+    """
+    Генерує питання квізу для теми разом зі списком правильних відповідей
+    одним структурованим запитом. Якщо структурована відповідь недоступна
+    або некоректна, використовує два окремі запити.
+    Використовується для фонового заповнення буфера питань (chat_id=None)
+    та для прямої генерації, коли буфер порожній (від імені чату, з його
+    лімітом запитів).
+    """
+    data = await chat_gpt.complete_structured(
+        load_prompt(mode_registry.quiz_themes.get(theme).prompt),
+        load_prompt("quiz_json"),
+        "quiz_item",
+        QUIZ_ITEM_SCHEMA,
+        chat_id=chat_id,
+    )
+    item = parse_quiz_item(data)
+    if item is not None:
+        return item
+    logger.info('Режим "Квіз": структурована відповідь некоректна, два запити.')
+    return await generate_quiz_item_fallback(theme, chat_id)
+
+
+async def generate_quiz_item_fallback(
+    theme: str, chat_id: Optional[int] = None
+) -> Optional[QuizItem]:
+    """
+    Генерує питання квізу та список правильних відповідей двома запитами.
+    """
+    content = await chat_gpt.complete(
+        load_prompt(mode_registry.quiz_themes.get(theme).prompt), "", chat_id=chat_id
+    )
+    question_text = content.strip()
+    if not question_text:
+        return None
+    expected_prompt = (
+        f"Питання: {question_text}\n"
+        "Які відповіді вважаються правильними для цього питання? "
+        "Ти повинен мати список можливих правильних відповідей через кому. "
+        "Всі відповіді мають бути короткими, не більше 2-х слів."
+    )
+    expected_response = await chat_gpt.complete(expected_prompt, "", chat_id=chat_id)
+    expected_answers = [ans.strip().lower() for ans in expected_response.split(",")]
+    return QuizItem(question_text, expected_answers)
+
+
+quiz_pool = QuizPool(generate_quiz_item)
+
+
 async def quiz_theme_callback(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -361,64 +468,61 @@ async def quiz_theme_callback(
     query = update.callback_query.data
     logger.info("Режим \"Квіз\": вибір теми або команда '%s'", query)
     await answer_callback(update)
-    quiz_data = {
-        "quiz_prog": ("quiz_prog", "Програмування мовою Python"),
-        "quiz_math": ("quiz_math", "Математичні теорії"),
-        "quiz_biology": ("quiz_biology", "Біологія"),
-    }
     if query == "end_btn":
         return await start(update, context)
     elif query == "quiz":
         return await quiz_start(update, context)
-    elif query in quiz_data or query == "quiz_more":
-        if query in quiz_data:
+    elif query in mode_registry.quiz_themes or query == "quiz_more":
+        if query in mode_registry.quiz_themes:
             # Вибір теми вперше
-            file_name, display_name = quiz_data[query]
+            theme = mode_registry.quiz_themes.get(query)
             context.user_data["theme"] = query
             dialog.clear_history(update.effective_chat.id)
-            logger.info("Режим \"Квіз\": обрана тема '%s'", display_name)
+            logger.info("Режим \"Квіз\": обрана тема '%s'", theme.name)
         else:
             # При "quiz_more" тема вже збережена
-            current_theme = context.user_data.get("theme")
-            if not current_theme or current_theme not in quiz_data:
+            theme = mode_registry.quiz_themes.get(context.user_data.get("theme"))
+            if theme is None:
                 await send_text(update, context, "Оберіть тему вікторини спочатку.")
                 return QUIZ_THEME
-            file_name, display_name = quiz_data[current_theme]
-            logger.info("Режим \"Квіз\": продовження теми '%s'", display_name)
-        await send_image(update, context, file_name)
-        base_prompt = load_prompt(file_name)
+            logger.info("Режим \"Квіз\": продовження теми '%s'", theme.name)
+        base_prompt = load_prompt(theme.prompt)
         dialog.add_message(update.effective_chat.id, "system", base_prompt)
-        content = await chat_gpt.send_question(base_prompt, "")
-        question_text = content.strip()
-        while dialog.has_question_been_asked(update.effective_chat.id, question_text):
-            new_q = await chat_gpt.send_question(
-                f"Згенеруй нове питання для теми {display_name}", ""
+
+        def asked(item: QuizItem) -> bool:
+            return dialog.has_question_been_asked(
+                update.effective_chat.id, item.question
             )
-            question_text = new_q.strip()
-            logger.debug('Режим "Квіз": згенеровано нове питання.')
-        dialog.add_quiz_question(update.effective_chat.id, question_text)
 
-        expected_prompt = (
-            f"Питання: {question_text}\n"
-            "Які відповіді вважаються правильними для цього питання? "
-            "Ти повинен мати список можливих правильних відповідей через кому. "
-            "Всі відповіді мають бути короткими, не більше 2-х слів."
+        item = await quiz_pool.get(
+            theme.key, exclude=asked, chat_id=update.effective_chat.id
         )
-        chat_gpt.message_list = []
-        expected_response = await chat_gpt.send_question(expected_prompt, "")
-        expected_answers = [ans.strip().lower() for ans in expected_response.split(",")]
-        context.user_data["expected_answers"] = expected_answers
+        retries = 0
+        while item is not None and asked(item):
+            if retries >= config.QUIZ_MAX_RETRIES:
+                logger.warning('Режим "Квіз": вичерпано спроби, питання повторюється.')
+                break
+            retries += 1
+            item = await quiz_pool.get(
+                theme.key, exclude=asked, chat_id=update.effective_chat.id
+            )
+            logger.debug('Режим "Квіз": згенеровано нове питання.')
+        if item is None:
+            await send_text(
+                update, context, "Не вдалося згенерувати питання, спробуйте ще раз."
+            )
+            return QUIZ_THEME
+        question_text = item.question
+        dialog.add_quiz_question(update.effective_chat.id, question_text)
+        context.user_data["expected_answers"] = item.answers
         logger.info('Режим "Квіз": збережено очікувані відповіді.')
 
-        await send_text_buttons(
+        await send_image(
             update,
             context,
-            question_text,
-            {
-                "quiz_more": "Ще питання",
-                "quiz": "Обрати іншу тему",
-                "end_btn": "Закінчити",
-            },
+            theme.image,
+            caption=question_text,
+            buttons=QUIZ_KEYBOARD,
         )
         return QUIZ_ANSWER
     else:
@@ -454,11 +558,7 @@ async def quiz_answer_handler(
             update,
             context,
             f"Ваша відповідь правильна! 🎉 Кількість правильних відповідей: {correct_count}",
-            {
-                "quiz_more": "Ще питання",
-                "quiz": "Обрати іншу тему",
-                "end_btn": "Закінчити",
-            },
+            QUIZ_KEYBOARD,
         )
     else:
         logger.info(
@@ -469,11 +569,7 @@ async def quiz_answer_handler(
             update,
             context,
             f"Неправильно. Правильна відповідь: {', '.join(expected_answers)}",
-            {
-                "quiz_more": "Ще питання",
-                "quiz": "Обрати іншу тему",
-                "end_btn": "Закінчити",
-            },
+            QUIZ_KEYBOARD,
         )
     return QUIZ_THEME
 
@@ -485,10 +581,14 @@ async def translator_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     """
     logger.info("Запуск режиму Перекладач.")
     context.user_data["mode"] = "translater"
-    await send_image(update, context, "translater")
     text = "Оберіть мову, на яку потрібно перекласти текст:"
-    languages = get_translation_languages()
-    await send_text_buttons(update, context, text, languages)
+    await send_image(
+        update,
+        context,
+        "translater",
+        caption=text,
+        buttons=mode_registry.languages.keyboard,
+    )
     return TRANSLATE_CHOICE
 
 
@@ -506,9 +606,9 @@ async def translator_choice_callback(
     elif query == "translater":
         return await translator_start(update, context)
 
-    languages = get_translation_languages()
+    language = mode_registry.languages.get(query)
     context.user_data["language_to_cmd"] = query
-    context.user_data["language_to"] = languages.get(query, query)
+    context.user_data["language_to"] = language.name if language else query
 
     await send_text(update, context, "Надішліть текст, який потрібно перекласти:")
     return TRANSLATE_INPUT
@@ -531,8 +631,24 @@ async def translator_input_message(
     original_prompt = load_prompt("translater")
     target_language = context.user_data.get("language_to", "Англійська")
     prompt_text = original_prompt.format(target_language=target_language)
-    logger.info("Перекладач: формування запиту з prompt: %s", prompt_text)
-    translation = await chat_gpt.send_question(prompt_text, original_text)
+    language_code = context.user_data.get("language_to_cmd", "to_en")
+    translation = await translation_cache.get(original_text, language_code, prompt_text)
+    if translation is None:
+        logger.info("Перекладач: формування запиту з prompt: %s", prompt_text)
+        try:
+            translation = await chat_gpt.complete(
+                prompt_text, original_text, chat_id=update.effective_chat.id
+            )
+            translation_cache.put(
+                original_text, language_code, prompt_text, translation
+            )
+        except AdmissionError:
+            raise
+        except Exception as e:
+            logger.error("Перекладач: помилка перекладу: %s", e)
+            translation = f"Помилка під час виконання: {e}"
+    else:
+        logger.info("Перекладач: переклад з кешу %s", translation_cache.stats())
 
     # Формуються дані діалогу для відображення
     translation_info = {
@@ -548,7 +664,7 @@ async def translator_input_message(
         update,
         context,
         result_text,
-        {"translater": "Змінити мову", "end_btn": "Головне меню"},
+        TRANSLATION_KEYBOARD,
     )
     return TRANSLATE_CHOICE
 
@@ -559,20 +675,16 @@ async def voice_chat_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     Запускає режим голосового чату з GPT.
     """
     logger.info("Режим голосового чату запущено.")
-    chat_gpt.message_list.clear()
-    await send_text(
-        update,
-        context,
-        "Давайте розпочнемо наш голосовий чат. Чекаю на ваше голосове повідомлення.",
-    )
-    await send_image(update, context, "voice_chat")
-    await send_text_buttons(
+    chat_gpt.clear_history(update.effective_chat.id)
+    await send_image(
         update,
         context,
-        "Якщо хочеш завершити наш діалог та повернутись в головне меню, тисни на кнопку нижче",
-        {
-            "end_btn": "Закінчити",
-        },
+        "voice_chat",
+        caption=(
+            "Давайте розпочнемо наш голосовий чат. Чекаю на ваше голосове повідомлення.\n\n"
+            "Якщо хочеш завершити наш діалог та повернутись в головне меню, тисни на кнопку нижче"
+        ),
+        buttons=END_KEYBOARD,
     )
 
     return VOICE_CHAT
@@ -600,77 +712,71 @@ async def voice_message_handler(
     """
     Обробляє голосові повідомлення у режимі голосового чату.
 
-    1. Завантажує голосове повідомлення з Telegram і тимчасово зберігає у форматі OGG.
-    2. Конвертує OGG → WAV за допомогою ffmpeg.
-    3. Використовує SpeechRecognition для розпізнавання мовлення (Google API, українська мова).
+    1. Завантажує голосове повідомлення з Telegram у памʼять (OGG).
+    2. Декодує OGG → PCM за допомогою ffmpeg (асинхронний підпроцес, stdin/stdout).
+    3. Використовує SpeechRecognition для розпізнавання мовлення (Google API, українська мова) у пулі потоків.
     4. Відправляє текст (перетворене голосове повідомлення) до ChatGPT і отримує відповідь у текстовій формі.
-    5. Перетворює текст ChatGPT у голос (gTTS) та конвертує у формат OGG, щоб надіслати голосове повідомлення користувачеві.
-    6. Видаляє тимчасові файли, щоб не засмічувати файлову систему.
-    7. Повертає стан VOICE_CHAT, дозволяючи користувачеві продовжити відправку голосових повідомлень або завершити діалог.
+    5. Перетворює текст ChatGPT у голос (gTTS) та кодує у формат OGG/Opus у памʼяті, щоб надіслати голосове повідомлення користувачеві.
+    6. Повертає стан VOICE_CHAT, дозволяючи користувачеві продовжити відправку голосових повідомлень або завершити діалог.
     """
     logger.info("Отримано голосове повідомлення.")
-    from speech_recognition import Recognizer, AudioFile, UnknownValueError
-    from gtts import gTTS
-
     voice = update.message.voice
     file_id = voice.file_id
     new_file = await context.bot.get_file(file_id)
-
-    with tempfile.NamedTemporaryFile(suffix=".ogg", delete=False) as temp_ogg:
-        ogg_path = temp_ogg.name
-    await new_file.download_to_drive(ogg_path)
-
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav:
-        wav_path = temp_wav.name
-
-    subprocess.run(["ffmpeg", "-y", "-i", ogg_path, wav_path], check=True)
-
-    recognizer = Recognizer()
-
-    with AudioFile(wav_path) as source:
-        audio_data = recognizer.record(source)
+    ogg_data = bytes(await new_file.download_as_bytearray())
 
     try:
-        user_text = recognizer.recognize_google(audio_data, language="uk-UA")  # type: ignore
+        async with voice_pipeline.slot():
+            pcm_data = await voice_pipeline.to_pcm(ogg_data)
+            user_text = await voice_pipeline.recognize(pcm_data, language="uk-UA")
+        if user_text is None:
+            await send_text(
+                update, context, "Вибачте, не вдалося розпізнати голосове повідомлення."
+            )
+            return VOICE_CHAT
         logger.info(f"Розпізнаний текст: {user_text}")
-    except UnknownValueError:
+
+        gpt_response = await chat_gpt.add_message(update.effective_chat.id, user_text)
+
+        async with voice_pipeline.slot():
+            mp3_data = await voice_pipeline.synthesize(gpt_response, lang="uk")
+            reply_data = await voice_pipeline.to_opus(mp3_data)
+    except VoiceBusyError:
+        logger.warning(
+            "Голосовий чат: черга переповнена (%d).", voice_pipeline.queue_depth
+        )
         await send_text(
-            update, context, "Вибачте, не вдалося розпізнати голосове повідомлення."
+            update, context, "Зараз забагато голосових повідомлень, спробуйте пізніше."
+        )
+        return VOICE_CHAT
+    except VoiceProcessingError as e:
+        logger.error("Голосовий чат: помилка обробки голосу: %s", e)
+        await send_text(
+            update, context, "Вибачте, не вдалося обробити голосове повідомлення."
         )
-
-        for path in [ogg_path, wav_path]:
-            if os.path.exists(path):
-                os.remove(path)
         return VOICE_CHAT
 
-    gpt_response = await chat_gpt.add_message(user_text)
-
-    tts = gTTS(text=gpt_response, lang="uk")
-    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_mp3:
-        mp3_path = temp_mp3.name
-    tts.save(mp3_path)
-
-    ogg_filename = f"gpt_reply_{uuid.uuid4().hex}.ogg"
-    subprocess.run(
-        ["ffmpeg", "-y", "-i", mp3_path, "-c:a", "libopus", ogg_filename], check=True
+    # Голосова відповідь і кнопка надсилаються одним повідомленням
+    await context.bot.send_voice(
+        chat_id=update.effective_chat.id,
+        voice=reply_data,
+        caption="Надсилай нове голосове повідомлення, або тисни кнопку, щоб завершити діалог.",
+        reply_markup=END_KEYBOARD,
     )
 
-    with open(ogg_filename, "rb") as ogg_file:
-        await context.bot.send_voice(chat_id=update.effective_chat.id, voice=ogg_file)
+    return VOICE_CHAT
 
-    for path in [ogg_path, wav_path, mp3_path, ogg_filename]:
-        if os.path.exists(path):
-            os.remove(path)
 
-    buttons = {"end_btn": "Закінчити"}
-    await send_text_buttons(
-        update,
-        context,
-        "Надсилай нове голосове повідомлення, або тисни кнопку, щоб завершити діалог.",
-        buttons,
-    )
-
-    return VOICE_CHAT
+# === Стан чату ===
+async def preload_chat_state(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    """
+    Завантажує стан чату зі сховища до обробки оновлення основними
+    обробниками (для SQLite – поза циклом подій).
+    """
+    if update.effective_chat is not None:
+        await dialog.preload(update.effective_chat.id)
 
 
 # === Фолбек ===
@@ -683,6 +789,16 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return ConversationHandler.END
 
 
+# Маршрути кнопок головного меню: callback_data → обробник
+MAIN_MENU_ROUTES = {
+    "random": random_start,
+    "gpt": gpt_start,
+    "talk": talk_start,
+    "quiz": quiz_start,
+    "translater": translator_start,
+    "voicechat": voice_chat_start,
+}
+
 conv_handler = ConversationHandler(
     entry_points=[
         CommandHandler("start", start),
@@ -722,10 +838,194 @@ conv_handler = ConversationHandler(
     fallbacks=[CommandHandler("cancel", cancel)],
     per_chat=True,
     allow_reentry=True,
+    name="main",
+    persistent=True,
 )
 
-app = ApplicationBuilder().token(BOT_TOKEN).build()
-app.add_handler(conv_handler)
+# Режим бота для кожного стану діалогу (мітка метрик обробників)
+STATE_MODES = {
+    MAIN: "menu",
+    RANDOM: "random",
+    GPT: "gpt",
+    TALK_CHOICE: "talk",
+    TALK_CHAT: "talk",
+    QUIZ_THEME: "quiz",
+    QUIZ_ANSWER: "quiz",
+    TRANSLATE_CHOICE: "translater",
+    TRANSLATE_INPUT: "translater",
+    VOICE_CHAT: "voicechat",
+}
+
+
+def instrument_handlers(handler: ConversationHandler) -> None:
+    """
+    Додає до обробників діалогу вимірювання тривалості за режимами бота
+    (лише якщо метрики увімкнено). Команди вимірюються в режимі, який вони
+    запускають, /start та /cancel – як "menu".
+
+    Параметри:
+        handler (ConversationHandler): Обробник діалогу.
+    """
+    if not config.METRICS_ENABLED:
+        return
+    for command in (*handler.entry_points, *handler.fallbacks):
+        name = next(iter(command.commands))
+        mode = "menu" if name in ("start", "cancel") else name
+        command.callback = metrics.timed_handler(mode, command.callback)
+    for state, handlers in handler.states.items():
+        for state_handler in handlers:
+            state_handler.callback = metrics.timed_handler(
+                STATE_MODES[state], state_handler.callback
+            )
+
+
+instrument_handlers(conv_handler)
+
+
+background_tasks: Set[asyncio.Task] = set()
+metrics_servers: List[asyncio.AbstractServer] = []
+
+
+def register_gauges(application: Application) -> None:
+    """
+    Реєструє показники черг і пулів бота для ендпоінта метрик.
+    """
+    limiter = chat_gpt.limiter
+    processor = application.update_processor
+    metrics.register_gauge(
+        "gpt_requests_active", "Запити до GPT, що виконуються.", lambda: limiter.active
+    )
+    metrics.register_gauge(
+        "gpt_requests_waiting", "Запити до GPT у черзі.", lambda: limiter.waiting
+    )
+    metrics.register_gauge(
+        "updates_active",
+        "Оновлення Telegram, що обробляються.",
+        lambda: getattr(processor, "active", 0),
+    )
+    metrics.register_gauge(
+        "voice_active",
+        "Голосові задачі, що виконуються.",
+        lambda: voice_pipeline.active,
+    )
+    metrics.register_gauge(
+        "voice_waiting",
+        "Голосові задачі в черзі.",
+        lambda: voice_pipeline.queue_depth,
+    )
+
+
+async def on_startup(application) -> None:
+    """
+    Реєструє меню команд (якщо воно змінилося) та запускає фонові задачі
+    бота: заповнення буфера питань квізу, резервуару випадкових фактів,
+    періодичний запис стану чатів, відстеження змін у папці resources та
+    сервер метрик (якщо увімкнено).
+    """
+    try:
+        await main_menu.register(application.bot)
+    except Exception as e:
+        logger.error("Не вдалося зареєструвати меню команд: %s", e)
+    if config.METRICS_ENABLED:
+        register_gauges(application)
+        metrics_servers.append(await metrics.serve())
+    quiz_pool.warm(mode_registry.quiz_themes.keys())
+    fact_reservoir.warm()
+    background_tasks.add(asyncio.create_task(state_store.run_flusher()))
+    if config.RESOURCES_WATCH:
+        background_tasks.add(asyncio.create_task(resource_registry.watch()))
+
+
+async def on_shutdown(application) -> None:
+    """
+    Звільняє ресурси при зупинці бота: зупиняє фонові задачі, пул обробки
+    голосу, поповнення буфера квізу і резервуару фактів, записує стан чатів
+    та закриває пул зʼєднань до OpenAI.
+    """
+    for task in background_tasks:
+        task.cancel()
+    for server in metrics_servers:
+        server.close()
+    voice_pipeline.shutdown()
+    await quiz_pool.aclose()
+    await fact_reservoir.aclose()
+    logger.info("Кеш перекладів: %s", translation_cache.stats())
+    if isinstance(application.bot.rate_limiter, FloodRateLimiter):
+        logger.info("Ліміти Telegram: %s", application.bot.rate_limiter.stats())
+    if chat_gpt.response_cache is not None:
+        logger.info("Кеш відповідей: %s", chat_gpt.response_cache.stats())
+    translation_cache.close()
+    state_store.close()
+    await chat_gpt.aclose()
+
+
+def build_application() -> Application:
+    """
+    Створює застосунок бота з обробниками. Оновлення різних чатів
+    обробляються паралельно, а одного чату – по черзі.
+    """
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(ChatOrderedUpdateProcessor())
+        .rate_limiter(FloodRateLimiter())
+        .persistence(StorePersistence(state_store))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if config.TELEGRAM_BASE_URL:
+        builder = builder.base_url(config.TELEGRAM_BASE_URL)
+    if config.TELEGRAM_BASE_FILE_URL:
+        builder = builder.base_file_url(config.TELEGRAM_BASE_FILE_URL)
+    application = builder.build()
+    application.add_handler(TypeHandler(Update, preload_chat_state), group=-1)
+    application.add_handler(conv_handler)
+    application.add_error_handler(error_handler)
+    return application
+
+
+def webhook_settings() -> Dict[str, Any]:
+    """
+    Повертає параметри вебхука з налаштувань config.
+    """
+    if not config.WEBHOOK_URL:
+        raise ValueError("Для BOT_MODE=webhook необхідно вказати WEBHOOK_URL")
+    secret_token = config.WEBHOOK_SECRET
+    if not secret_token:
+        secret_token = secrets.token_urlsafe(32)
+        logger.warning(
+            "WEBHOOK_SECRET не задано, згенеровано тимчасовий секрет. "
+            "Для кількох екземплярів бота задайте спільний WEBHOOK_SECRET."
+        )
+    return {
+        "listen": config.WEBHOOK_LISTEN,
+        "port": config.WEBHOOK_PORT,
+        "url_path": config.WEBHOOK_PATH,
+        "webhook_url": f"{config.WEBHOOK_URL}/{config.WEBHOOK_PATH}",
+        "secret_token": secret_token,
+        "allowed_updates": Update.ALL_TYPES,
+    }
+
+
+def main() -> None:
+    """
+    Запускає бота в режимі long polling або вебхука (BOT_MODE), в одному
+    процесі або в BOT_WORKERS процесах-шардах.
+    """
+    webhook = webhook_settings() if config.BOT_MODE == "webhook" else None
+    mode = "webhook" if webhook else "polling"
+    if config.BOT_WORKERS > 1:
+        logger.info("Чат-бот запущено (%s, шардів: %d).", mode, config.BOT_WORKERS)
+        ShardDispatcher(build_application, BOT_TOKEN).run(webhook)
+        return
+
+    application = build_application()
+    logger.info("Чат-бот запущено (%s).", mode)
+    if webhook is None:
+        application.run_polling()
+    else:
+        application.run_webhook(**webhook)
+
 
-logger.info("Чат-бот запущено.")
-app.run_polling()
+if __name__ == "__main__":
+    main()
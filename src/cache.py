@@ -0,0 +1,420 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import unicodedata
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Кеш у памʼяті з витісненням найдавніше використаних записів (LRU)
+    та обмеженим часом життя записів (TTL). Веде лічильники влучань і промахів.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        """
+        Параметри:
+            max_size (int): Максимальна кількість записів.
+            ttl (float): Час життя запису, с.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Повертає значення з кешу або None, якщо запису немає чи він застарів.
+
+        Параметри:
+            key (K): Ключ.
+        Повертає:
+            Optional[V]: Значення або None.
+        """
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: K, value: V, expires: Optional[float] = None) -> None:
+        """
+        Додає або оновлює запис.
+
+        Параметри:
+            key (K): Ключ.
+            value (V): Значення.
+            expires (Optional[float]): Час закінчення дії (unix time);
+                за замовчуванням – зараз + ttl.
+        """
+        self._data[key] = (expires or time.time() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Повертає лічильники кешу.
+        """
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SQLiteCacheStore:
+    """
+    Дискове сховище записів кешу в SQLite, щоб влучання переживали перезапуск.
+    Режим WAL та busy_timeout дозволяють кільком процесам-шардам
+    користуватися одним файлом.
+
+    Запити до бази виконуються в окремому потоці, а нові записи
+    накопичуються і записуються пакетом однією транзакцією, поки
+    попередній пакет записується.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Параметри:
+            path (str): Шлях до файлу бази даних.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.writes = 0
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._writing: Dict[str, Tuple[str, float]] = {}
+        self._writer: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="cache-store")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._conn.commit()
+        logger.info("SQLiteCacheStore: відкрито %s", path)
+
+    def _select(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Читає запис з бази (виконується в потоці сховища).
+        """
+        row = self._conn.execute(
+            "SELECT value, expires FROM cache WHERE key = ? AND expires >= ?",
+            (key, time.time()),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Повертає значення та час закінчення дії запису, якщо він не застарів.
+
+        Параметри:
+            key (str): Ключ.
+        Повертає:
+            Optional[Tuple[str, float]]: (значення, expires) або None.
+        """
+        row = self._pending.get(key) or self._writing.get(key)
+        if row is not None:
+            return row if row[1] >= time.time() else None
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._select, key
+        )
+
+    def put(self, key: str, value: str, expires: float) -> None:
+        """
+        Додає запис до черги запису; черга записується у фоні пакетами.
+
+        Параметри:
+            key (str): Ключ.
+            value (str): Значення.
+            expires (float): Час закінчення дії (unix time).
+        """
+        self._pending[key] = (value, expires)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_pending())
+
+    def _write(self, rows: Dict[str, Tuple[str, float]]) -> None:
+        """
+        Записує пакет однією транзакцією (виконується в потоці сховища).
+        """
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                [(key, value, expires) for key, (value, expires) in rows.items()],
+            )
+
+    async def _write_pending(self) -> None:
+        """
+        Записує накопичені записи, доки черга не спорожніє.
+        """
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            self._writing, self._pending = self._pending, {}
+            try:
+                await loop.run_in_executor(self._executor, self._write, self._writing)
+                self.writes += 1
+            except Exception as e:
+                logger.error("SQLiteCacheStore: помилка запису: %s", e)
+            finally:
+                self._writing = {}
+
+    def purge(self) -> int:
+        """
+        Видаляє застарілі записи.
+
+        Повертає:
+            int: Кількість видалених записів.
+        """
+
+        def delete() -> int:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache WHERE expires < ?", (time.time(),)
+                )
+            return cursor.rowcount
+
+        return self._executor.submit(delete).result()
+
+    def close(self) -> None:
+        """
+        Записує накопичені записи та закриває зʼєднання з базою даних.
+        """
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
+        rows = {**self._writing, **self._pending}
+        self._pending, self._writing = {}, {}
+        if rows:
+            self._executor.submit(self._write, rows).result()
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Нормалізує текст для ключа кешу: Unicode NFC та єдині прогалини.
+
+    Параметри:
+        text (str): Початковий текст.
+    Повертає:
+        str: Нормалізований текст.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    """
+    Обчислює короткий хеш тексту (для ключів та версій prompt).
+
+    Параметри:
+        text (str): Текст.
+    Повертає:
+        str: Хеш у шістнадцятковому вигляді.
+    """
+    return hashlib.blake2b(text.encode("utf8"), digest_size=16).hexdigest()
+
+
+class TranslationCache:
+    """
+    Кеш перекладів. Ключ складається з нормалізованого тексту, коду цільової
+    мови та хешу версії prompt, тож зміна prompt автоматично робить старі
+    переклади недійсними. За бажанням записи дублюються в SQLite.
+    """
+
+    def __init__(
+        self,
+        max_size: int = config.TRANSLATION_CACHE_SIZE,
+        ttl: float = config.TRANSLATION_CACHE_TTL,
+        path: Optional[str] = config.TRANSLATION_CACHE_PATH,
+    ) -> None:
+        """
+        Параметри:
+            max_size (int): Максимальна кількість перекладів у памʼяті.
+            ttl (float): Час життя перекладу, с.
+            path (Optional[str]): Шлях до SQLite-файлу (None – лише памʼять).
+        """
+        self.memory: TTLCache[str, str] = TTLCache(max_size, ttl)
+        self.store = SQLiteCacheStore(path) if path else None
+        self.disk_hits = 0
+
+    @staticmethod
+    def key(text: str, language_code: str, prompt: str) -> str:
+        """
+        Формує ключ кешу перекладу.
+
+        Параметри:
+            text (str): Текст для перекладу.
+            language_code (str): Код цільової мови (наприклад, "to_en").
+            prompt (str): Шаблон prompt перекладача.
+        Повертає:
+            str: Ключ кешу.
+        """
+        return f"{language_code}:{text_hash(prompt)[:12]}:{text_hash(normalize_text(text))}"
+
+    async def get(self, text: str, language_code: str, prompt: str) -> Optional[str]:
+        """
+        Повертає збережений переклад або None (з диска – не блокуючи цикл
+        подій).
+
+        Параметри:
+            text (str): Текст для перекладу.
+            language_code (str): Код цільової мови.
+            prompt (str): Шаблон prompt перекладача.
+        Повертає:
+            Optional[str]: Переклад або None.
+        """
+        key = self.key(text, language_code, prompt)
+        translation = self.memory.get(key)
+        if translation is not None or self.store is None:
+            return translation
+        row = await self.store.get(key)
+        if row is None:
+            return None
+        self.disk_hits += 1
+        self.memory.put(key, row[0], expires=row[1])
+        return row[0]
+
+    def put(self, text: str, language_code: str, prompt: str, translation: str) -> None:
+        """
+        Зберігає переклад.
+
+        Параметри:
+            text (str): Текст для перекладу.
+            language_code (str): Код цільової мови.
+            prompt (str): Шаблон prompt перекладача.
+            translation (str): Переклад.
+        """
+        key = self.key(text, language_code, prompt)
+        expires = time.time() + self.memory.ttl
+        self.memory.put(key, translation, expires=expires)
+        if self.store is not None:
+            self.store.put(key, translation, expires)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Повертає лічильники кешу: розмір, влучання (у т.ч. з диска) та промахи.
+        """
+        stats = self.memory.stats()
+        stats["hits"] += self.disk_hits
+        stats["misses"] -= self.disk_hits
+        stats["disk_hits"] = self.disk_hits
+        return stats
+
+    def close(self) -> None:
+        """
+        Закриває дискове сховище.
+        """
+        if self.store is not None:
+            self.store.close()
+
+
+class _Variants:
+    """
+    Збережені варіанти відповіді на один запит та індекс наступного для видачі.
+    """
+
+    __slots__ = ("items", "next")
+
+    def __init__(self) -> None:
+        self.items: List[str] = []
+        self.next = 0
+
+
+class ResponseCache:
+    """
+    Кеш відповідей моделі на ідемпотентні запити (однакові модель,
+    повідомлення та параметри), наприклад привітання режимів.
+
+    Щоб відповіді не були однаковими, для кожного запиту зберігається до
+    variants різних відповідей: поки їх менше, запит виконується, а потім
+    збережені варіанти видаються по черзі без звернень до API.
+    """
+
+    def __init__(
+        self,
+        max_size: int = config.RESPONSE_CACHE_SIZE,
+        ttl: float = config.RESPONSE_CACHE_TTL,
+        variants: int = config.RESPONSE_CACHE_VARIANTS,
+    ) -> None:
+        """
+        Параметри:
+            max_size (int): Максимальна кількість запитів у кеші.
+            ttl (float): Час життя відповідей запиту, с.
+            variants (int): Кількість варіантів відповіді на запит.
+        """
+        self.variants = variants
+        self.memory: TTLCache[str, _Variants] = TTLCache(max_size, ttl)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(request: Dict[str, Any]) -> str:
+        """
+        Формує ключ кешу для запиту.
+
+        Параметри:
+            request (Dict[str, Any]): Параметри chat.completions (модель,
+                повідомлення, temperature тощо).
+        Повертає:
+            str: Ключ кешу.
+        """
+        return text_hash(json.dumps(request, sort_keys=True, ensure_ascii=False))
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Повертає наступний збережений варіант відповіді або None, якщо
+        варіантів ще недостатньо і потрібно звернутися до моделі.
+
+        Параметри:
+            key (str): Ключ запиту.
+        Повертає:
+            Optional[str]: Відповідь або None.
+        """
+        entry = self.memory.get(key)
+        if entry is None or len(entry.items) < self.variants:
+            self.misses += 1
+            return None
+        self.hits += 1
+        content = entry.items[entry.next]
+        entry.next = (entry.next + 1) % len(entry.items)
+        return content
+
+    def put(self, key: str, content: str) -> None:
+        """
+        Зберігає ще один варіант відповіді на запит.
+
+        Параметри:
+            key (str): Ключ запиту.
+            content (str): Відповідь моделі.
+        """
+        entry = self.memory.get(key)
+        if entry is None:
+            entry = _Variants()
+            self.memory.put(key, entry)
+        if len(entry.items) < self.variants:
+            entry.items.append(content)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Повертає лічильники кешу: кількість запитів, влучання та промахи.
+        """
+        return {"size": len(self.memory), "hits": self.hits, "misses": self.misses}
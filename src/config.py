@@ -0,0 +1,201 @@
+import os
+import logging
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Завантаження змінних із файлу .env (якщо він існує)
+env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
+if os.path.exists(env_path):
+    load_dotenv(dotenv_path=env_path)
+
+
+def _get_int(name: str, default: int) -> int:
+    """
+    Зчитує цілочисельне значення змінної середовища.
+
+    Параметри:
+        name (str): Назва змінної.
+        default (int): Значення за замовчуванням.
+    Повертає:
+        int: Значення змінної або default, якщо змінна відсутня чи некоректна.
+    """
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(
+            "Некоректне значення %s=%s, використано %s", name, value, default
+        )
+        return default
+
+
+def _get_float(name: str, default: float) -> float:
+    """
+    Зчитує дробове значення змінної середовища.
+
+    Параметри:
+        name (str): Назва змінної.
+        default (float): Значення за замовчуванням.
+    Повертає:
+        float: Значення змінної або default, якщо змінна відсутня чи некоректна.
+    """
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(
+            "Некоректне значення %s=%s, використано %s", name, value, default
+        )
+        return default
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    """
+    Зчитує логічне значення змінної середовища ("1", "true", "yes", "on").
+
+    Параметри:
+        name (str): Назва змінної.
+        default (bool): Значення за замовчуванням.
+    Повертає:
+        bool: Значення змінної або default, якщо змінна відсутня.
+    """
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
+# Папка для даних, що зберігаються між перезапусками (кеші, стан)
+DATA_DIR = os.getenv("DATA_DIR", "").strip() or os.path.join(
+    os.path.dirname(__file__), "..", "data"
+)
+
+# === Отримання оновлень Telegram ===
+# Адреса Bot API (порожньо – офіційний api.telegram.org), наприклад для
+# локального Bot API сервера або фейкового сервера в бенчмарках
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL", "").strip()
+TELEGRAM_BASE_FILE_URL = os.getenv("TELEGRAM_BASE_FILE_URL", "").strip()
+# "polling" – long polling, "webhook" – HTTP-сервер, що приймає оновлення від Telegram
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower() or "polling"
+# Публічна HTTPS-адреса вебхука без шляху (наприклад, https://bot.example.com)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").strip().rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram").strip().strip("/")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0").strip()
+WEBHOOK_PORT = _get_int("WEBHOOK_PORT", 8443)
+# Секрет, який Telegram передає в заголовку X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "").strip()
+# Кількість процесів-обробників (шардів); 1 – усе в одному процесі
+BOT_WORKERS = _get_int("BOT_WORKERS", 1)
+SHARD_QUEUE_SIZE = _get_int("SHARD_QUEUE_SIZE", 1000)
+UPDATES_CONCURRENCY = _get_int("UPDATES_CONCURRENCY", 64)
+UPDATES_SHUTDOWN_TIMEOUT = _get_float("UPDATES_SHUTDOWN_TIMEOUT", 30.0)
+
+# === OpenAI HTTP-клієнт ===
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "").strip() or None
+OPENAI_PROXY = os.getenv("OPENAI_PROXY", "http://18.199.183.77:49232").strip() or None
+OPENAI_MAX_CONNECTIONS = _get_int("OPENAI_MAX_CONNECTIONS", 100)
+OPENAI_MAX_KEEPALIVE = _get_int("OPENAI_MAX_KEEPALIVE", 20)
+OPENAI_KEEPALIVE_EXPIRY = _get_float("OPENAI_KEEPALIVE_EXPIRY", 30.0)
+OPENAI_CONNECT_TIMEOUT = _get_float("OPENAI_CONNECT_TIMEOUT", 10.0)
+OPENAI_READ_TIMEOUT = _get_float("OPENAI_READ_TIMEOUT", 60.0)
+OPENAI_POOL_TIMEOUT = _get_float("OPENAI_POOL_TIMEOUT", 30.0)
+
+# === Стійкість запитів до OpenAI ===
+OPENAI_DEADLINE = _get_float("OPENAI_DEADLINE", 90.0)
+OPENAI_MAX_ATTEMPTS = _get_int("OPENAI_MAX_ATTEMPTS", 3)
+OPENAI_BACKOFF_BASE = _get_float("OPENAI_BACKOFF_BASE", 0.5)
+OPENAI_BACKOFF_MAX = _get_float("OPENAI_BACKOFF_MAX", 10.0)
+OPENAI_BREAKER_THRESHOLD = _get_int("OPENAI_BREAKER_THRESHOLD", 5)
+OPENAI_BREAKER_RESET = _get_float("OPENAI_BREAKER_RESET", 30.0)
+
+# === Сховище стану чатів ===
+# "memory" – лише в памʼяті, "sqlite" – у файлі STATE_DB_PATH
+STATE_STORE = os.getenv("STATE_STORE", "memory").strip().lower() or "memory"
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "").strip() or os.path.join(
+    DATA_DIR, "state.db"
+)
+STATE_FLUSH_INTERVAL = _get_float("STATE_FLUSH_INTERVAL", 5.0)
+STATE_BATCH_SIZE = _get_int("STATE_BATCH_SIZE", 100)
+STATE_MEMORY_TTL = _get_float("STATE_MEMORY_TTL", 86400.0)
+STATE_RESTORE_WINDOW = _get_float("STATE_RESTORE_WINDOW", 86400.0)
+DIALOG_IDLE_TTL = _get_float("DIALOG_IDLE_TTL", 3600.0)
+DIALOG_MAX_MESSAGES = _get_int("DIALOG_MAX_MESSAGES", 50)
+
+# === Допуск запитів до GPT ===
+GPT_MAX_CONCURRENCY = _get_int("GPT_MAX_CONCURRENCY", 16)
+GPT_MAX_QUEUE = _get_int("GPT_MAX_QUEUE", 64)
+GPT_MAX_WAIT = _get_float("GPT_MAX_WAIT", 30.0)
+GPT_CHAT_RATE = _get_float("GPT_CHAT_RATE", 0.2)
+GPT_CHAT_BURST = _get_int("GPT_CHAT_BURST", 5)
+
+# === Ліміти вихідних повідомлень Telegram ===
+TELEGRAM_GLOBAL_RATE = _get_float("TELEGRAM_GLOBAL_RATE", 30.0)
+TELEGRAM_CHAT_RATE = _get_float("TELEGRAM_CHAT_RATE", 1.0)
+TELEGRAM_GROUP_RATE = _get_float("TELEGRAM_GROUP_RATE", 20 / 60)
+TELEGRAM_CHAT_BURST = _get_int("TELEGRAM_CHAT_BURST", 3)
+TELEGRAM_MAX_RETRIES = _get_int("TELEGRAM_MAX_RETRIES", 2)
+
+# === Сесії розмов ===
+SESSION_MAX_TURNS = _get_int("SESSION_MAX_TURNS", 20)
+SESSION_IDLE_TTL = _get_float("SESSION_IDLE_TTL", 3600.0)
+SESSION_MAX_TOTAL_CHARS = _get_int("SESSION_MAX_TOTAL_CHARS", 50_000_000)
+
+# === Бюджет токенів історії ===
+HISTORY_MAX_TOKENS = _get_int("HISTORY_MAX_TOKENS", 3000)
+HISTORY_SUMMARIZE = _get_bool("HISTORY_SUMMARIZE", False)
+HISTORY_SUMMARY_TRIGGER_TOKENS = _get_int("HISTORY_SUMMARY_TRIGGER_TOKENS", 500)
+HISTORY_SUMMARY_MAX_TOKENS = _get_int("HISTORY_SUMMARY_MAX_TOKENS", 300)
+HISTORY_PENDING_MAX_TOKENS = _get_int("HISTORY_PENDING_MAX_TOKENS", 4000)
+
+# === Streaming-відповіді ===
+STREAM_EDIT_INTERVAL = _get_float("STREAM_EDIT_INTERVAL", 1.0)
+
+# === Ресурси ===
+RESOURCES_WATCH = _get_bool("RESOURCES_WATCH", False)
+RESOURCES_WATCH_INTERVAL = _get_float("RESOURCES_WATCH_INTERVAL", 5.0)
+
+# === Кеш file_id зображень ===
+FILE_ID_CACHE_PATH = os.getenv("FILE_ID_CACHE_PATH", "").strip() or os.path.join(
+    DATA_DIR, "file_ids.json"
+)
+
+# === Голосовий чат ===
+VOICE_MAX_CONCURRENCY = _get_int("VOICE_MAX_CONCURRENCY", 4)
+VOICE_MAX_QUEUE = _get_int("VOICE_MAX_QUEUE", 32)
+
+# === Квіз: буфер питань та захист від повторів ===
+QUIZ_POOL_SIZE = _get_int("QUIZ_POOL_SIZE", 3)
+QUIZ_POOL_MAX_AGE = _get_float("QUIZ_POOL_MAX_AGE", 3600.0)
+QUIZ_MAX_RETRIES = _get_int("QUIZ_MAX_RETRIES", 3)
+QUIZ_HISTORY_LIMIT = _get_int("QUIZ_HISTORY_LIMIT", 500)
+QUIZ_NEAR_DUPLICATES = _get_bool("QUIZ_NEAR_DUPLICATES", False)
+QUIZ_NEAR_DUPLICATE_THRESHOLD = _get_float("QUIZ_NEAR_DUPLICATE_THRESHOLD", 0.8)
+
+# === Кеш перекладів ===
+TRANSLATION_CACHE_SIZE = _get_int("TRANSLATION_CACHE_SIZE", 10000)
+TRANSLATION_CACHE_TTL = _get_float("TRANSLATION_CACHE_TTL", 7 * 24 * 3600.0)
+# Шлях до SQLite-файлу кешу; порожнє значення – кеш лише в памʼяті
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "").strip() or None
+
+# === Кеш відповідей на незмінні запити (привітання режимів) ===
+# Кількість різних відповідей, що зберігаються для кожного запиту; 0 – вимкнено
+RESPONSE_CACHE_VARIANTS = _get_int("RESPONSE_CACHE_VARIANTS", 3)
+RESPONSE_CACHE_SIZE = _get_int("RESPONSE_CACHE_SIZE", 1000)
+RESPONSE_CACHE_TTL = _get_float("RESPONSE_CACHE_TTL", 24 * 3600.0)
+
+# === Резервуар випадкових фактів ===
+RANDOM_FACTS_BATCH = _get_int("RANDOM_FACTS_BATCH", 5)
+RANDOM_FACTS_CAPACITY = _get_int("RANDOM_FACTS_CAPACITY", 20)
+RANDOM_FACTS_LOW_WATERMARK = _get_int("RANDOM_FACTS_LOW_WATERMARK", 5)
+RANDOM_FACTS_SEEN_LIMIT = _get_int("RANDOM_FACTS_SEEN_LIMIT", 5000)
+
+# === Метрики ===
+# Порт HTTP-сервера метрик у форматі Prometheus; 0 – метрики вимкнено
+METRICS_PORT = _get_int("METRICS_PORT", 0)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1").strip() or "127.0.0.1"
+METRICS_ENABLED = METRICS_PORT > 0
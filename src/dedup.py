@@ -0,0 +1,95 @@
+from typing import List, Set, Tuple
+
+import hashlib
+import random
+import re
+
+# Кількість хеш-функцій MinHash та розмір шинглу (символів)
+MINHASH_PERMUTATIONS = 32
+SHINGLE_SIZE = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240229)
+_PERMUTATIONS: List[Tuple[int, int]] = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+MinHashSignature = Tuple[int, ...]
+
+
+def normalize_question(text: str) -> str:
+    """
+    Нормалізує текст питання: нижній регістр, без пунктуації та зайвих прогалин.
+
+    Параметри:
+        text (str): Текст питання.
+    Повертає:
+        str: Нормалізований текст.
+    """
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def question_fingerprint(text: str) -> bytes:
+    """
+    Обчислює компактний відбиток (8 байт) нормалізованого питання.
+
+    Параметри:
+        text (str): Текст питання.
+    Повертає:
+        bytes: Відбиток питання.
+    """
+    normalized = normalize_question(text)
+    return hashlib.blake2b(normalized.encode("utf8"), digest_size=8).digest()
+
+
+def _shingles(text: str) -> Set[int]:
+    """
+    Розбиває нормалізований текст на символьні шингли та хешує їх у 64-бітні числа.
+    """
+    normalized = normalize_question(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        pieces = {normalized}
+    else:
+        pieces = {
+            normalized[i : i + SHINGLE_SIZE]
+            for i in range(len(normalized) - SHINGLE_SIZE + 1)
+        }
+    return {
+        int.from_bytes(
+            hashlib.blake2b(piece.encode("utf8"), digest_size=8).digest(), "big"
+        )
+        for piece in pieces
+    }
+
+
+def minhash_signature(text: str) -> MinHashSignature:
+    """
+    Обчислює MinHash-сигнатуру питання для пошуку майже однакових питань.
+
+    Параметри:
+        text (str): Текст питання.
+    Повертає:
+        MinHashSignature: Сигнатура з MINHASH_PERMUTATIONS значень.
+    """
+    shingles = _shingles(text)
+    return tuple(
+        min((a * shingle + b) % _MERSENNE_PRIME for shingle in shingles)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(first: MinHashSignature, second: MinHashSignature) -> float:
+    """
+    Оцінює схожість Жаккара двох питань за їхніми MinHash-сигнатурами.
+
+    Параметри:
+        first (MinHashSignature): Перша сигнатура.
+        second (MinHashSignature): Друга сигнатура.
+    Повертає:
+        float: Оцінка схожості від 0 до 1.
+    """
+    matches = sum(1 for a, b in zip(first, second) if a == b)
+    return matches / MINHASH_PERMUTATIONS
@@ -1,93 +1,510 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, BadRequestError
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+import asyncio
 import httpx
+import json
 import logging
 
+from src import config, metrics
+from src.cache import ResponseCache
+from src.limits import AdmissionController
+from src.resilience import DeadlineExceededError, ResilientCaller
+from src.session import ChatSession, SessionManager, Turn
+
 logger = logging.getLogger(__name__)
 
+# Параметри запитів у розмовах з історією чату
+CHAT_PARAMS: Dict[str, Any] = {
+    "model": "gpt-4o-mini",
+    "max_tokens": 3000,
+    "temperature": 0.9,
+}
+
+# Позначка завершення потоку відповіді в черзі частин
+_STREAM_END = object()
+
+
+def create_http_client(
+    proxy: Optional[str] = config.OPENAI_PROXY,
+    max_connections: int = config.OPENAI_MAX_CONNECTIONS,
+    max_keepalive_connections: int = config.OPENAI_MAX_KEEPALIVE,
+    keepalive_expiry: float = config.OPENAI_KEEPALIVE_EXPIRY,
+    connect_timeout: float = config.OPENAI_CONNECT_TIMEOUT,
+    read_timeout: float = config.OPENAI_READ_TIMEOUT,
+    pool_timeout: float = config.OPENAI_POOL_TIMEOUT,
+) -> httpx.AsyncClient:
+    """
+    Створює спільний асинхронний HTTP-клієнт з пулом зʼєднань для OpenAI API.
+
+    Параметри:
+        proxy (Optional[str]): Адреса проксі або None.
+        max_connections (int): Максимальна кількість одночасних зʼєднань.
+        max_keepalive_connections (int): Кількість зʼєднань, що тримаються відкритими.
+        keepalive_expiry (float): Час життя неактивного зʼєднання, с.
+        connect_timeout (float): Таймаут встановлення зʼєднання, с.
+        read_timeout (float): Таймаут читання/запису відповіді, с.
+        pool_timeout (float): Таймаут очікування вільного зʼєднання в пулі, с.
+    Повертає:
+        httpx.AsyncClient: Налаштований клієнт.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    timeout = httpx.Timeout(
+        connect=connect_timeout,
+        read=read_timeout,
+        write=read_timeout,
+        pool=pool_timeout,
+    )
+    return httpx.AsyncClient(proxy=proxy, limits=limits, timeout=timeout)
+
 
 class ChatGptService:
     """
     Сервіс для спілкування з ChatGPT через OpenAI API.
     """
 
-    client: OpenAI = None
-    message_list: list = None
+    client: AsyncOpenAI = None
+    http_client: httpx.AsyncClient = None
+    sessions: SessionManager = None
+    limiter: AdmissionController = None
+    resilience: ResilientCaller = None
+    response_cache: Optional[ResponseCache] = None
 
-    def __init__(self, token):
+    def __init__(
+        self,
+        token,
+        http_client: Optional[httpx.AsyncClient] = None,
+        base_url: Optional[str] = config.OPENAI_BASE_URL,
+        sessions: Optional[SessionManager] = None,
+        summary_prompt: str = "",
+        limiter: Optional[AdmissionController] = None,
+        resilience: Optional[ResilientCaller] = None,
+        response_cache: Optional[ResponseCache] = None,
+    ):
         """
-        Ініціалізує клієнта OpenAI та очищує історію повідомлень.
+        Ініціалізує асинхронного клієнта OpenAI та менеджер сесій розмов.
 
         Параметри:
             token (str): API-ключ. Якщо починається з "gpt:", перетворюється.
+            http_client (Optional[httpx.AsyncClient]): Спільний HTTP-клієнт з пулом
+                зʼєднань. Якщо не передано, створюється з налаштувань config.
+            base_url (Optional[str]): Адреса OpenAI-сумісного API (None – офіційний).
+            sessions (Optional[SessionManager]): Менеджер історій чатів.
+            summary_prompt (str): Системний prompt для згортання витісненої
+                історії у підсумок (використовується, якщо це дозволяє політика).
+            limiter (Optional[AdmissionController]): Допуск запитів – ліміти чатів
+                та глобальна черга запитів до GPT.
+            resilience (Optional[ResilientCaller]): Граничний час, повтори та
+                запобіжник для запитів до OpenAI.
+            response_cache (Optional[ResponseCache]): Кеш відповідей на незмінні
+                запити (див. send_question). Якщо не передано, створюється з
+                налаштувань config (None, якщо RESPONSE_CACHE_VARIANTS=0).
         """
 
         token = "sk-proj-" + token[:3:-1] if token.startswith("gpt:") else token
         logger.info("Ініціалізація ChatGptService з токеном %s", token[:10] + "...")
-        self.client = OpenAI(
-            http_client=httpx.Client(proxy="http://18.199.183.77:49232"),
+        self.http_client = http_client or create_http_client()
+        self.client = AsyncOpenAI(
+            http_client=self.http_client,
             api_key=token,
+            base_url=base_url,
+            # Повтори виконує ResilientCaller з урахуванням граничного часу
+            max_retries=0,
         )
-        self.message_list = []
+        self.sessions = sessions if sessions is not None else SessionManager()
+        self.limiter = limiter if limiter is not None else AdmissionController()
+        self.resilience = resilience if resilience is not None else ResilientCaller()
+        if response_cache is None and config.RESPONSE_CACHE_VARIANTS > 0:
+            response_cache = ResponseCache()
+        self.response_cache = response_cache
+        self.summary_prompt = summary_prompt
+        self._summary_tasks: Set[asyncio.Task] = set()
+        self._summarizing: Set[int] = set()
+
+    async def aclose(self) -> None:
+        """
+        Закриває HTTP-клієнт та всі зʼєднання пулу.
+        """
+        for task in list(self._summary_tasks):
+            task.cancel()
+        await self.client.close()
+        logger.info("ChatGptService: HTTP-клієнт закрито.")
 
-    async def send_message_list(self) -> str:
+    async def _create(self, **request) -> Any:
         """
-        Надсилає список повідомлень у модель та повертає відповідь.
+        Виконує chat.completions.create з граничним часом, повторами
+        тимчасових помилок та запобіжником.
 
+        Параметри:
+            **request: Параметри chat.completions.create.
         Повертає:
-           str: Зміст відповіді моделі.
+            Any: Відповідь (або потік частин, якщо stream=True).
+        """
+        with metrics.stage("openai_request"):
+            response = await self.resilience.call(
+                lambda: self.client.chat.completions.create(**request)
+            )
+        if not request.get("stream"):
+            metrics.record_usage(response.usage)
+        return response
+
+    def _schedule_summary(self, chat_id: int) -> None:
+        """
+        Запускає у фоні згортання витісненої історії чату у підсумок, якщо
+        його вимагає політика і воно ще не виконується для цього чату.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+        """
+        if chat_id in self._summarizing:
+            return
+        pending = self.sessions.take_pending(chat_id)
+        if pending is None:
+            return
+        self._summarizing.add(chat_id)
+        task = asyncio.create_task(self._summarize(chat_id, *pending))
+        self._summary_tasks.add(task)
+        task.add_done_callback(self._summary_tasks.discard)
+
+    async def _summarize(
+        self,
+        chat_id: int,
+        session: ChatSession,
+        summary: Optional[str],
+        turns: List[Turn],
+    ) -> None:
+        """
+        Згортає попередній підсумок та витіснені репліки у новий підсумок.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+            session (ChatSession): Сесія, для якої готується підсумок.
+            summary (Optional[str]): Поточний підсумок.
+            turns (List[Turn]): Витіснені репліки.
+        """
+        dialogue = "\n".join(f"{turn.role}: {turn.content}" for turn in turns)
+        if summary:
+            dialogue = f"Попередній підсумок: {summary}\n\n{dialogue}"
+        try:
+            async with self.limiter.slot():
+                completion = await self._create(
+                    messages=[
+                        {"role": "system", "content": self.summary_prompt},
+                        {"role": "user", "content": dialogue},
+                    ],
+                    **{
+                        **CHAT_PARAMS,
+                        "max_tokens": self.sessions.policy.summary_max_tokens,
+                        "temperature": 0.3,
+                    },
+                )
+            new_summary = (completion.choices[0].message.content or "").strip()
+            self.sessions.set_summary(chat_id, session, new_summary, turns)
+            logger.info("Історію чату %d згорнуто у підсумок.", chat_id)
+        except Exception as e:
+            logger.error("Помилка згортання історії чату %d: %s", chat_id, e)
+        finally:
+            self._summarizing.discard(chat_id)
+
+    async def complete(
+        self,
+        prompt_text: str,
+        message_text: str,
+        chat_id: Optional[int] = None,
+        **params,
+    ) -> str:
+        """
+        Виконує одноразовий запит без історії чату (для фонових задач).
+
+        Параметри:
+            prompt_text (str): Текст системного prompt.
+            message_text (str): Повідомлення користувача.
+            chat_id (Optional[int]): Чат, від імені якого виконується запит
+                (для ліміту чату); None – фоновий запит.
+            **params: Параметри chat.completions, що замінюють або доповнюють
+                CHAT_PARAMS (temperature, response_format тощо).
+        Повертає:
+            str: Зміст відповіді моделі.
+        Викликає:
+            AdmissionError: Якщо ліміт чату вичерпано або черга переповнена.
+        """
+        request = {**CHAT_PARAMS, **params}
+        async with self.limiter.slot(chat_id):
+            completion = await self._create(
+                messages=[
+                    {"role": "system", "content": prompt_text},
+                    {"role": "user", "content": message_text},
+                ],
+                **request,
+            )
+        return completion.choices[0].message.content or ""
+
+    async def complete_structured(
+        self,
+        prompt_text: str,
+        message_text: str,
+        schema_name: str,
+        schema: Dict[str, Any],
+        chat_id: Optional[int] = None,
+        **params,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Виконує одноразовий запит зі структурованою відповіддю (JSON schema).
+
+        Параметри:
+            prompt_text (str): Текст системного prompt.
+            message_text (str): Повідомлення користувача.
+            schema_name (str): Назва схеми.
+            schema (Dict[str, Any]): JSON schema очікуваної відповіді.
+            chat_id (Optional[int]): Чат, від імені якого виконується запит.
+            **params: Додаткові параметри chat.completions.
+        Повертає:
+            Optional[Dict[str, Any]]: Розібраний JSON-обʼєкт або None, якщо модель
+                не підтримує структуровані відповіді чи повернула некоректний JSON.
         """
+        response_format = {
+            "type": "json_schema",
+            "json_schema": {"name": schema_name, "schema": schema, "strict": True},
+        }
         try:
-            logger.debug("Відправка повідомлень: %s", self.message_list)
-            completion = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=self.message_list,
-                max_tokens=3000,
-                temperature=0.9,
+            content = await self.complete(
+                prompt_text,
+                message_text,
+                chat_id=chat_id,
+                response_format=response_format,
+                **params,
             )
-            message = completion.choices[0].message
-            self.message_list.append(message)
-            logger.info("Отримано відповідь від ChatGPT.")
-            return message.content
+        except BadRequestError as e:
+            logger.warning("Структурована відповідь недоступна: %s", e)
+            return None
+        try:
+            data = json.loads(content)
+        except ValueError:
+            logger.warning("Модель повернула некоректний JSON: %s", content)
+            return None
+        return data if isinstance(data, dict) else None
+
+    async def send_message_list(
+        self, chat_id: int, message_text: Optional[str] = None
+    ) -> str:
+        """
+        Надсилає історію повідомлень чату в модель та повертає відповідь.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+            message_text (Optional[str]): Нове повідомлення користувача; додається
+                до історії лише після допуску запиту.
+        Повертає:
+           str: Зміст відповіді моделі.
+        Викликає:
+            AdmissionError: Якщо ліміт чату вичерпано або черга переповнена.
+            CircuitOpenError: Якщо OpenAI API тимчасово недоступний.
+            Exception: Помилка запиту, якщо повтори не допомогли.
+        """
+        async with self.limiter.slot(chat_id):
+            if message_text is not None:
+                self.sessions.append(chat_id, "user", message_text)
+            messages = self.sessions.messages(chat_id)
+            logger.debug("Відправка повідомлень для чату %d: %s", chat_id, messages)
+            try:
+                completion = await self._create(messages=messages, **CHAT_PARAMS)
+            except Exception as e:
+                logger.error("Помилка відправки повідомлень: %s", e)
+                raise
+        content = completion.choices[0].message.content or ""
+        self.sessions.append(chat_id, "assistant", content)
+        self._schedule_summary(chat_id)
+        logger.info("Отримано відповідь від ChatGPT.")
+        return content
+
+    async def stream_message_list(
+        self, chat_id: int, message_text: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Надсилає історію повідомлень чату в модель у режимі streaming
+        та повертає частини відповіді в міру їх генерування.
+
+        Повідомлення користувача та повна відповідь додаються до історії чату
+        разом лише після завершення генерування: якщо потік перервано помилкою
+        або споживач зупинився раніше, історія не змінюється.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+            message_text (Optional[str]): Нове повідомлення користувача.
+        Повертає:
+            AsyncIterator[str]: Асинхронний генератор частин (delta) відповіді.
+        Викликає:
+            AdmissionError: Якщо ліміт чату вичерпано або черга переповнена
+                (до отримання першої частини).
+            CircuitOpenError: Якщо OpenAI API тимчасово недоступний.
+            DeadlineExceededError: Якщо запит разом із читанням потоку не
+                вклався у граничний час.
+            Exception: Помилка запиту, якщо повтори не допомогли.
+        """
+        # Потік OpenAI читається в окремій задачі у чергу, тож місце в
+        # AdmissionController звільняється, щойно модель завершила відповідь,
+        # а не коли споживач (редагування повідомлень Telegram) її обробив
+        queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        reader = asyncio.create_task(self._read_stream(chat_id, message_text, queue))
+        parts = []
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                parts.append(item)
+                yield item
+        finally:
+            if not reader.done():
+                reader.cancel()
+        if message_text is not None:
+            self.sessions.append(chat_id, "user", message_text)
+        self.sessions.append(chat_id, "assistant", "".join(parts))
+        self._schedule_summary(chat_id)
+        logger.info("Отримано streaming-відповідь від ChatGPT.")
+
+    async def _read_stream(
+        self, chat_id: int, message_text: Optional[str], queue: asyncio.Queue
+    ) -> None:
+        """
+        Займає місце в AdmissionController, читає streaming-відповідь і
+        передає частини (delta) у чергу; наприкінці кладе _STREAM_END або
+        виняток. Запит разом із читанням потоку обмежено граничним часом
+        ResilientCaller, а потік закривається й тоді, коли задачу скасовано.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+            message_text (Optional[str]): Нове повідомлення користувача.
+            queue (asyncio.Queue): Черга частин відповіді.
+        """
+        try:
+            async with self.limiter.slot(chat_id):
+                messages = self.sessions.messages(chat_id)
+                if message_text is not None:
+                    messages.append({"role": "user", "content": message_text})
+                logger.debug("Streaming повідомлень для чату %d: %s", chat_id, messages)
+                deadline = self.resilience.deadline
+                try:
+                    async with asyncio.timeout(deadline):
+                        with metrics.stage("openai_stream"):
+                            stream = await self._create(
+                                messages=messages,
+                                stream=True,
+                                stream_options={"include_usage": True},
+                                **CHAT_PARAMS,
+                            )
+                            async with stream:
+                                async for chunk in stream:
+                                    if chunk.usage is not None:
+                                        metrics.record_usage(chunk.usage)
+                                    if not chunk.choices:
+                                        continue
+                                    delta = chunk.choices[0].delta.content
+                                    if delta:
+                                        queue.put_nowait(delta)
+                except TimeoutError:
+                    logger.error("Streaming-запит не вклався у %s с.", deadline)
+                    raise DeadlineExceededError(
+                        f"Запит не вклався у {deadline} с."
+                    ) from None
+                except Exception as e:
+                    logger.error("Помилка streaming-запиту: %s", e)
+                    raise
         except Exception as e:
-            logger.error("Помилка відправки повідомлень: %s", e)
-            return f"Помилка під час виконання: {e}"
+            queue.put_nowait(e)
+            return
+        queue.put_nowait(_STREAM_END)
 
-    def set_prompt(self, prompt_text: str) -> None:
+    def set_prompt(self, chat_id: int, prompt_text: str) -> None:
         """
-        Встановлює системний prompt, очищуючи історію повідомлень.
+        Встановлює системний prompt, очищуючи історію повідомлень чату.
 
         Параметри:
+            chat_id (int): Ідентифікатор чату.
             prompt_text (str): Текст prompt(у).
         """
-        logger.info("Встановлення prompt: %s", prompt_text)
-        self.message_list.clear()
-        self.message_list.append({"role": "system", "content": prompt_text})
+        logger.info("Встановлення prompt для чату %d: %s", chat_id, prompt_text)
+        self.sessions.set_prompt(chat_id, prompt_text)
 
-    async def add_message(self, message_text: str) -> str:
+    def clear_history(self, chat_id: int) -> None:
         """
-        Додає повідомлення користувача до історії та надсилає запит.
+        Очищає історію повідомлень чату.
 
         Параметри:
+            chat_id (int): Ідентифікатор чату.
+        """
+        self.sessions.clear(chat_id)
+
+    async def add_message(self, chat_id: int, message_text: str) -> str:
+        """
+        Додає повідомлення користувача до історії чату та надсилає запит.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
             message_text (str): Повідомлення користувача.
         Повертає:
             str: Відповідь моделі.
         """
         logger.info("Додається повідомлення користувача: %s", message_text)
-        self.message_list.append({"role": "user", "content": message_text})
-        return await self.send_message_list()
+        return await self.send_message_list(chat_id, message_text)
 
-    async def send_question(self, prompt_text: str, message_text: str) -> str:
+    async def stream_message(
+        self, chat_id: int, message_text: str
+    ) -> AsyncIterator[str]:
         """
-        Очищає історію повідомлень, встановлює системний prompt та надсилає повідомлення користувача.
+        Додає повідомлення користувача до історії чату та повертає відповідь
+        частинами (streaming).
 
         Параметри:
+            chat_id (int): Ідентифікатор чату.
+            message_text (str): Повідомлення користувача.
+        Повертає:
+            AsyncIterator[str]: Асинхронний генератор частин відповіді.
+        """
+        logger.info("Додається повідомлення користувача (stream): %s", message_text)
+        async for delta in self.stream_message_list(chat_id, message_text):
+            yield delta
+
+    async def send_question(
+        self, chat_id: int, prompt_text: str, message_text: str, cached: bool = False
+    ) -> str:
+        """
+        Очищає історію повідомлень чату, встановлює системний prompt та надсилає повідомлення користувача.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
             prompt_text (str): Текст системного prompt.
             message_text (str): Повідомлення користувача.
+            cached (bool): Запит незмінний (наприклад, привітання режиму) – після
+                накопичення кількох варіантів відповіді вони видаються з кешу
+                по черзі, без звернення до моделі.
         Повертає:
             str: Відповідь моделі.
         """
         logger.info("Надсилання запиту з prompt: %s", prompt_text)
-        self.message_list.clear()
-        self.message_list.append({"role": "system", "content": prompt_text})
-        self.message_list.append({"role": "user", "content": message_text})
-        return await self.send_message_list()
+        self.sessions.set_prompt(chat_id, prompt_text)
+        if not cached or self.response_cache is None:
+            return await self.send_message_list(chat_id, message_text)
+        key = self.response_cache.key(
+            {
+                "messages": [
+                    {"role": "system", "content": prompt_text},
+                    {"role": "user", "content": message_text},
+                ],
+                **CHAT_PARAMS,
+            }
+        )
+        content = self.response_cache.get(key)
+        if content is None:
+            content = await self.send_message_list(chat_id, message_text)
+            self.response_cache.put(key, content)
+            return content
+        logger.info("Відповідь з кешу: %s", self.response_cache.stats())
+        self.sessions.append(chat_id, "user", message_text)
+        self.sessions.append(chat_id, "assistant", content)
+        return content
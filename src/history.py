@@ -0,0 +1,117 @@
+from typing import Callable, Optional
+
+import logging
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# Службові токени, що додаються до кожного повідомлення у chat.completions
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _load_tokenizer() -> Callable[[str], int]:
+    """
+    Повертає функцію підрахунку токенів. Якщо встановлено tiktoken, використовує
+    його; інакше – наближену оцінку (≈4 символи на токен).
+
+    Повертає:
+        Callable[[str], int]: Функція, що повертає кількість токенів у тексті.
+    """
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        logger.info("Підрахунок токенів: tiktoken (o200k_base).")
+        return lambda text: len(encoding.encode(text))
+    except Exception:
+        logger.info("Підрахунок токенів: наближена оцінка (tiktoken недоступний).")
+        return lambda text: len(text) // 4 + 1
+
+
+_count = _load_tokenizer()
+
+
+def count_tokens(text: str) -> int:
+    """
+    Підраховує кількість токенів одного повідомлення разом зі службовими.
+
+    Параметри:
+        text (str): Текст повідомлення.
+    Повертає:
+        int: Кількість токенів.
+    """
+    return _count(text or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+class HistoryPolicy:
+    """
+    Політика обрізання історії розмови за бюджетом токенів.
+
+    Системний prompt (і підсумок, якщо є) зберігаються завжди, а з реплік
+    залишається ковзне вікно найновіших, що вміщуються у max_tokens.
+    Витіснені репліки за бажанням згортаються у підсумок розмови; поки
+    підсумок не вдається оновити (наприклад, OpenAI недоступний), вони
+    накопичуються не більше ніж на pending_max_tokens, а найстаріші
+    відкидаються.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = config.HISTORY_MAX_TOKENS,
+        summarize: bool = config.HISTORY_SUMMARIZE,
+        summary_trigger_tokens: int = config.HISTORY_SUMMARY_TRIGGER_TOKENS,
+        summary_max_tokens: int = config.HISTORY_SUMMARY_MAX_TOKENS,
+        pending_max_tokens: int = config.HISTORY_PENDING_MAX_TOKENS,
+    ) -> None:
+        """
+        Параметри:
+            max_tokens (int): Бюджет токенів на prompt, підсумок та репліки.
+            summarize (bool): Чи згортати витіснені репліки у підсумок.
+            summary_trigger_tokens (int): Обсяг витіснених реплік (у токенах),
+                після якого оновлюється підсумок.
+            summary_max_tokens (int): Максимальна довжина підсумку, токенів.
+            pending_max_tokens (int): Максимум витіснених, ще не згорнутих
+                реплік, токенів (не менше summary_trigger_tokens).
+        """
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.summary_trigger_tokens = summary_trigger_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.pending_max_tokens = max(pending_max_tokens, summary_trigger_tokens)
+
+    def turn_budget(self, fixed_tokens: int) -> int:
+        """
+        Обчислює, скільки токенів доступно для реплік.
+
+        Параметри:
+            fixed_tokens (int): Токени системного prompt та підсумку.
+        Повертає:
+            int: Доступний бюджет для реплік.
+        """
+        return max(self.max_tokens - fixed_tokens, 0)
+
+    def should_summarize(self, pending_tokens: int) -> bool:
+        """
+        Перевіряє, чи настав час згорнути витіснені репліки у підсумок.
+
+        Параметри:
+            pending_tokens (int): Токени витіснених, ще не згорнутих реплік.
+        Повертає:
+            bool: True, якщо підсумок потрібно оновити.
+        """
+        return self.summarize and pending_tokens >= self.summary_trigger_tokens
+
+    @staticmethod
+    def summary_message(summary: Optional[str]) -> Optional[str]:
+        """
+        Формує текст системного повідомлення з підсумком розмови.
+
+        Параметри:
+            summary (Optional[str]): Підсумок.
+        Повертає:
+            Optional[str]: Текст повідомлення або None.
+        """
+        if not summary:
+            return None
+        return f"Короткий зміст попередньої розмови: {summary}"
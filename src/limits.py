@@ -0,0 +1,374 @@
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Hashable, Optional
+
+import asyncio
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# Черга фонових запитів (без чату), що обслуговується нарівні з чатами
+BACKGROUND = "background"
+
+# Методи Bot API, на які поширюються ліміти Telegram на повідомлення
+MESSAGE_METHODS = ("send", "edit", "copy", "forward")
+
+
+class AdmissionError(Exception):
+    """
+    Запит до GPT відхилено: ліміт чату вичерпано або черга переповнена.
+    """
+
+    def __init__(self, message: str, retry_after: float = 0.0) -> None:
+        """
+        Параметри:
+            message (str): Опис причини.
+            retry_after (float): Через скільки секунд варто повторити запит.
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitExceededError(AdmissionError):
+    """
+    Чат надсилає запити частіше, ніж дозволяє його ліміт.
+    """
+
+
+class QueueFullError(AdmissionError):
+    """
+    Черга очікування запитів до GPT переповнена.
+    """
+
+
+class TokenBucket:
+    """
+    Маркерний кошик: до capacity запитів поспіль, далі – rate запитів за секунду.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Параметри:
+            rate (float): Швидкість поповнення, маркерів/с.
+            capacity (float): Місткість кошика (допустимий сплеск запитів).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, now: Optional[float] = None) -> float:
+        """
+        Забирає один маркер, якщо він є.
+
+        Параметри:
+            now (Optional[float]): Поточний час (time.monotonic()).
+        Повертає:
+            float: 0, якщо маркер отримано, інакше – час до появи маркера, с.
+        """
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        """
+        Забирає маркер, навіть якщо його ще немає (у борг), тож одночасні
+        запити отримують маркери по черзі.
+
+        Параметри:
+            now (Optional[float]): Поточний час (time.monotonic()).
+        Повертає:
+            float: Скільки чекати до появи цього маркера, с (0 – одразу).
+        """
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate if self.rate > 0 else float("inf")
+
+    def is_full(self, now: float) -> bool:
+        """
+        Перевіряє, чи кошик вже повністю поповнився (і його можна не зберігати).
+        """
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class AdmissionController:
+    """
+    Допуск запитів до GPT.
+
+    Кожен чат має власний маркерний кошик, тож один користувач не може
+    вичерпати квоту OpenAI. Одночасно виконується не більше max_concurrency
+    запитів, решта чекає в обмеженій черзі. Вільне місце віддається чатам по
+    черзі (round-robin), тож чат з багатьма запитами не блокує інших. Коли
+    черга переповнена або очікування триває довше за max_wait, запит
+    відхиляється з AdmissionError.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = config.GPT_MAX_CONCURRENCY,
+        max_queue: int = config.GPT_MAX_QUEUE,
+        max_wait: float = config.GPT_MAX_WAIT,
+        chat_rate: float = config.GPT_CHAT_RATE,
+        chat_burst: int = config.GPT_CHAT_BURST,
+    ) -> None:
+        """
+        Параметри:
+            max_concurrency (int): Максимум одночасних запитів до GPT.
+            max_queue (int): Максимум запитів, що очікують на вільне місце.
+            max_wait (float): Максимальний час очікування в черзі, с.
+            chat_rate (float): Сталий ліміт запитів одного чату, запитів/с.
+            chat_burst (int): Кількість запитів чату, дозволених поспіль.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self._queues: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+
+    def check_rate(self, chat_id: Hashable) -> None:
+        """
+        Списує запит з ліміту чату.
+
+        Параметри:
+            chat_id (Hashable): Ідентифікатор чату.
+        Викликає:
+            RateLimitExceededError: Якщо ліміт чату вичерпано.
+        """
+        now = time.monotonic()
+        # Повністю поповнені кошики не відрізняються від нових – видаляємо їх
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if not oldest.is_full(now):
+                break
+            self._buckets.popitem(last=False)
+        bucket = self._buckets.pop(chat_id, None) or TokenBucket(
+            self.chat_rate, self.chat_burst
+        )
+        self._buckets[chat_id] = bucket
+        retry_after = bucket.try_acquire(now)
+        if retry_after:
+            self.rejected += 1
+            logger.warning("AdmissionController: ліміт чату %s вичерпано", chat_id)
+            raise RateLimitExceededError(
+                "Забагато запитів від чату.", retry_after=retry_after
+            )
+
+    @asynccontextmanager
+    async def slot(self, chat_id: Optional[Hashable] = None) -> AsyncIterator[None]:
+        """
+        Займає місце для запиту до GPT на час блоку.
+
+        Параметри:
+            chat_id (Optional[Hashable]): Ідентифікатор чату; None – фоновий
+                запит, для якого ліміт чату не застосовується.
+        Викликає:
+            AdmissionError: Якщо ліміт чату вичерпано або черга переповнена.
+        """
+        if chat_id is not None:
+            self.check_rate(chat_id)
+        await self._acquire(BACKGROUND if chat_id is None else chat_id)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Повертає лічильники: активні запити, черга та відхилені запити.
+        """
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+    async def _acquire(self, key: Hashable) -> None:
+        """
+        Чекає на вільне місце у черзі чату key.
+        """
+        if self.active < self.max_concurrency and not self.waiting:
+            self.active += 1
+            return
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            logger.warning("AdmissionController: черга переповнена (%d)", self.waiting)
+            raise QueueFullError(
+                "Черга запитів переповнена.", retry_after=self.max_wait
+            )
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(future)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Місце вже передано цьому запиту – повертаємо його наступному
+                self._release()
+            else:
+                future.cancel()
+                self._discard(key, future)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise QueueFullError(
+                "Час очікування в черзі вичерпано.", retry_after=self.max_wait
+            ) from None
+
+    def _discard(self, key: Hashable, future: asyncio.Future) -> None:
+        """
+        Видаляє запит, що більше не очікує, з черги чату.
+        """
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+            self.waiting -= 1
+        except ValueError:
+            return
+        if not queue:
+            del self._queues[key]
+
+    def _release(self) -> None:
+        """
+        Передає звільнене місце першому запиту наступного за чергою чату.
+        """
+        while self._queues:
+            key, queue = self._queues.popitem(last=False)
+            future = queue.popleft()
+            self.waiting -= 1
+            if queue:
+                # Чат з іншими запитами стає в кінець черги чатів
+                self._queues[key] = queue
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class FloodRateLimiter(BaseRateLimiter):
+    """
+    Обмежувач вихідних запитів Bot API за лімітами Telegram: загальний ліміт
+    повідомлень бота та окремий ліміт кожного чату (для груп – нижчий).
+    Запити, що перевищують ліміт, не відхиляються, а чекають на свій маркер.
+    Якщо Telegram все ж відповів RetryAfter, запит повторюється після паузи.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = config.TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = config.TELEGRAM_CHAT_RATE,
+        group_rate: float = config.TELEGRAM_GROUP_RATE,
+        chat_burst: int = config.TELEGRAM_CHAT_BURST,
+        max_retries: int = config.TELEGRAM_MAX_RETRIES,
+    ) -> None:
+        """
+        Параметри:
+            global_rate (float): Повідомлень за секунду для всього бота.
+            chat_rate (float): Повідомлень за секунду в особистий чат.
+            group_rate (float): Повідомлень за секунду в групу чи канал.
+            chat_burst (int): Кількість повідомлень у чат, дозволених поспіль.
+            max_retries (int): Максимум повторів після RetryAfter.
+        """
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.delayed = 0
+        self.retried = 0
+        self._global = TokenBucket(global_rate, global_rate)
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _chat_bucket(self, chat_id: Hashable, now: float) -> TokenBucket:
+        """
+        Повертає кошик чату, видаляючи повністю поповнені кошики інших чатів.
+        """
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if not oldest.is_full(now):
+                break
+            self._buckets.popitem(last=False)
+        bucket = self._buckets.pop(chat_id, None)
+        if bucket is None:
+            is_group = not str(chat_id).lstrip("-").isdigit() or int(chat_id) < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = TokenBucket(rate, self.chat_burst)
+        self._buckets[chat_id] = bucket
+        return bucket
+
+    async def _wait(self, chat_id: Optional[Hashable]) -> None:
+        """
+        Чекає, доки загальний ліміт і ліміт чату дозволять надіслати повідомлення.
+        """
+        now = time.monotonic()
+        delay = self._global.reserve(now)
+        if chat_id is not None:
+            delay = max(delay, self._chat_bucket(chat_id, now).reserve(now))
+        if delay:
+            self.delayed += 1
+            logger.debug("FloodRateLimiter: чат %s чекає %.2f с", chat_id, delay)
+            await asyncio.sleep(delay)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Any],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Any],
+    ) -> Any:
+        limited = endpoint.startswith(MESSAGE_METHODS)
+        chat_id = data.get("chat_id")
+        attempt = 0
+        while True:
+            if limited:
+                await self._wait(chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retried += 1
+                logger.warning(
+                    "FloodRateLimiter: %s для чату %s, повтор через %s с",
+                    endpoint,
+                    chat_id,
+                    e.retry_after,
+                )
+                await asyncio.sleep(e.retry_after)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Повертає лічильники: відкладені запити та повтори після RetryAfter.
+        """
+        return {"delayed": self.delayed, "retried": self.retried}
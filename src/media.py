@@ -0,0 +1,142 @@
+from typing import Dict, Optional
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(data: bytes) -> str:
+    """
+    Обчислює SHA-256 вмісту файлу.
+
+    Параметри:
+        data (bytes): Вміст файлу.
+    Повертає:
+        str: Хеш у шістнадцятковому вигляді.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class FileIdCache:
+    """
+    Постійний кеш file_id, які Telegram повертає після першого завантаження
+    зображення. Запис привʼязаний до боту, імені та хешу вмісту файлу;
+    якщо файл змінився, запис стає недійсним.
+
+    Кеш зберігається у JSON-файлі, тож переживає перезапуск бота. У
+    багатопроцесному режимі шарди пишуть той самий файл: кожен запис
+    атомарний, а втрачений через одночасний запис file_id означає лише
+    повторне завантаження зображення.
+    """
+
+    def __init__(self, path: str = config.FILE_ID_CACHE_PATH) -> None:
+        """
+        Параметри:
+            path (str): Шлях до JSON-файлу кешу.
+        """
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        try:
+            with open(path, "r", encoding="utf8") as file:
+                self._entries = json.load(file)
+            logger.info("FileIdCache: завантажено %d записів.", len(self._entries))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error("FileIdCache: помилка читання %s: %s", path, e)
+
+    @staticmethod
+    def _key(bot_id: int, name: str) -> str:
+        return f"{bot_id}:{name}"
+
+    def lookup(self, bot_id: int, name: str, image_path: str) -> Optional[str]:
+        """
+        Повертає file_id для зображення, якщо файл не змінився з моменту
+        завантаження. Хеш перераховується лише тоді, коли змінились mtime
+        чи розмір файлу.
+
+        Параметри:
+            bot_id (int): Ідентифікатор бота (file_id дійсні лише для нього).
+            name (str): Назва зображення.
+            image_path (str): Шлях до файлу зображення.
+        Повертає:
+            Optional[str]: file_id або None.
+        """
+        entry = self._entries.get(self._key(bot_id, name))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["file_id"]
+        with open(image_path, "rb") as image:
+            sha256 = file_sha256(image.read())
+        if sha256 != entry["sha256"]:
+            logger.info("FileIdCache: зображення %s змінилось.", name)
+            self.invalidate(bot_id, name)
+            return None
+        entry["mtime_ns"], entry["size"] = stat.st_mtime_ns, stat.st_size
+        self._save()
+        return entry["file_id"]
+
+    def store(
+        self, bot_id: int, name: str, image_path: str, data: bytes, file_id: str
+    ) -> None:
+        """
+        Зберігає file_id завантаженого зображення.
+
+        Параметри:
+            bot_id (int): Ідентифікатор бота.
+            name (str): Назва зображення.
+            image_path (str): Шлях до файлу зображення.
+            data (bytes): Завантажений вміст файлу.
+            file_id (str): file_id, повернутий Telegram.
+        """
+        stat = os.stat(image_path)
+        self._entries[self._key(bot_id, name)] = {
+            "sha256": file_sha256(data),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "file_id": file_id,
+        }
+        self._save()
+        logger.debug("FileIdCache: збережено file_id для %s", name)
+
+    def invalidate(self, bot_id: int, name: str) -> None:
+        """
+        Видаляє запис про зображення.
+
+        Параметри:
+            bot_id (int): Ідентифікатор бота.
+            name (str): Назва зображення.
+        """
+        if self._entries.pop(self._key(bot_id, name), None) is not None:
+            self._save()
+
+    def _save(self) -> None:
+        """
+        Атомарно записує кеш на диск через тимчасовий файл з унікальним
+        іменем, тож одночасні записи кількох процесів не псують один одного.
+        """
+        directory = os.path.dirname(self.path) or "."
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=directory, prefix=f"{os.path.basename(self.path)}.", suffix=".tmp"
+            )
+            with os.fdopen(fd, "w", encoding="utf8") as file:
+                json.dump(self._entries, file, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error("FileIdCache: помилка запису %s: %s", self.path, e)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
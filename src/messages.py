@@ -0,0 +1,42 @@
+from typing import Dict, Tuple
+
+# Ролі повідомлень; у записах зберігається лише індекс ролі
+ROLES: Tuple[str, ...] = ("system", "user", "assistant")
+_ROLE_CODES: Dict[str, int] = {role: code for code, role in enumerate(ROLES)}
+
+
+class MessageRecord:
+    """
+    Компактний запис повідомлення розмови: код ролі, текст та кількість
+    токенів. Займає менше памʼяті, ніж словник {"role": ..., "content": ...},
+    і перетворюється у формат OpenAI API лише під час запиту (to_wire).
+    """
+
+    __slots__ = ("role_code", "content", "tokens")
+
+    def __init__(self, role: str, content: str, tokens: int = 0) -> None:
+        """
+        Параметри:
+            role (str): Роль ("system", "user" або "assistant").
+            content (str): Текст повідомлення.
+            tokens (int): Кількість токенів (0, якщо не рахується).
+        """
+        self.role_code = _ROLE_CODES[role]
+        self.content = content
+        self.tokens = tokens
+
+    @property
+    def role(self) -> str:
+        """
+        Роль відправника повідомлення.
+        """
+        return ROLES[self.role_code]
+
+    def to_wire(self) -> Dict[str, str]:
+        """
+        Повертає повідомлення у форматі OpenAI API.
+        """
+        return {"role": ROLES[self.role_code], "content": self.content}
+
+    def __repr__(self) -> str:
+        return f"MessageRecord({self.role!r}, {self.content!r}, {self.tokens})"
@@ -0,0 +1,369 @@
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import asyncio
+import functools
+import logging
+import time
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+# Межі кошиків гістограм затримок, с
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# Зсув порту метрик (у багатопроцесному режимі – номер шарда)
+port_offset = 0
+
+_NULL_CONTEXT = nullcontext()
+
+
+def _labels(name: str, value: str) -> str:
+    """
+    Форматує мітку у форматі Prometheus.
+    """
+    value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'{name}="{value}"'
+
+
+class Counter:
+    """
+    Лічильник, що лише зростає, з однією міткою.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, label: str) -> None:
+        """
+        Параметри:
+            name (str): Назва метрики.
+            description (str): Опис метрики.
+            label (str): Назва мітки.
+        """
+        self.name = name
+        self.description = description
+        self.label = label
+        self.values: Dict[str, float] = {}
+
+    def inc(self, value: str, amount: float = 1.0) -> None:
+        """
+        Збільшує лічильник для значення мітки value.
+        """
+        self.values[value] = self.values.get(value, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{{{_labels(self.label, value)}}} {amount:g}"
+            for value, amount in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    """
+    Поточне значення (наприклад, кількість операцій, що виконуються).
+    """
+
+    kind = "gauge"
+
+    def dec(self, value: str, amount: float = 1.0) -> None:
+        """
+        Зменшує значення для мітки value.
+        """
+        self.values[value] = self.values.get(value, 0.0) - amount
+
+
+class CallbackGauge:
+    """
+    Показник без міток, значення якого обчислюється під час збору метрик.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, read: Callable[[], float]) -> None:
+        """
+        Параметри:
+            name (str): Назва метрики.
+            description (str): Опис метрики.
+            read (Callable[[], float]): Функція, що повертає поточне значення.
+        """
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [f"{self.name} {self.read():g}"]
+
+
+class Histogram:
+    """
+    Гістограма значень (затримок) з однією міткою: лічильники кошиків,
+    сума та кількість спостережень.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label: str,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        """
+        Параметри:
+            name (str): Назва метрики.
+            description (str): Опис метрики.
+            label (str): Назва мітки.
+            buckets (Tuple[float, ...]): Верхні межі кошиків за зростанням.
+        """
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        # значення мітки → [кількості по кошиках (+Inf останній), сума]
+        self.series: Dict[str, List[Any]] = {}
+
+    def observe(self, value: str, amount: float) -> None:
+        """
+        Додає спостереження amount для значення мітки value.
+        """
+        series = self.series.get(value)
+        if series is None:
+            series = self.series[value] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, amount)] += 1
+        series[1] += amount
+
+    def render(self) -> List[str]:
+        lines = []
+        for value, (counts, total) in self.series.items():
+            label = _labels(self.label, value)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else f"{bound:g}"
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total:g}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Набір метрик, що віддаються у текстовому форматі Prometheus.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Any] = {}
+
+    def register(self, metric: Any) -> Any:
+        """
+        Додає (або замінює) метрику з такою ж назвою та повертає її.
+        """
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Повертає всі метрики у текстовому форматі Prometheus.
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram("bot_stage_seconds", "Тривалість етапів обробки, с.", "stage")
+)
+STAGE_IN_FLIGHT = REGISTRY.register(
+    Gauge("bot_stage_in_flight", "Етапи обробки, що виконуються зараз.", "stage")
+)
+HANDLER_SECONDS = REGISTRY.register(
+    Histogram("bot_handler_seconds", "Тривалість обробки оновлення, с.", "mode")
+)
+HANDLER_IN_FLIGHT = REGISTRY.register(
+    Gauge("bot_handler_in_flight", "Оновлення, що обробляються зараз.", "mode")
+)
+OPENAI_TOKENS = REGISTRY.register(
+    Counter("openai_tokens_total", "Токени OpenAI за полем usage.", "kind")
+)
+
+
+class _Timer:
+    """
+    Вимірює тривалість блоку та кількість одночасних виконань.
+    """
+
+    __slots__ = ("histogram", "gauge", "value", "started")
+
+    def __init__(self, histogram: Histogram, gauge: Gauge, value: str) -> None:
+        self.histogram = histogram
+        self.gauge = gauge
+        self.value = value
+
+    def __enter__(self) -> "_Timer":
+        self.gauge.inc(self.value)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.histogram.observe(self.value, time.perf_counter() - self.started)
+        self.gauge.dec(self.value)
+
+
+def stage(name: str) -> ContextManager[Any]:
+    """
+    Контекстний менеджер, що вимірює етап обробки name (без метрик – нічого
+    не робить).
+
+    Параметри:
+        name (str): Назва етапу.
+    Повертає:
+        ContextManager[Any]: Контекстний менеджер.
+    """
+    if not config.METRICS_ENABLED:
+        return _NULL_CONTEXT
+    return _Timer(STAGE_SECONDS, STAGE_IN_FLIGHT, name)
+
+
+def _instrument(function: F, histogram: Histogram, gauge: Gauge, value: str) -> F:
+    """
+    Обгортає асинхронну функцію вимірюванням тривалості та одночасних викликів.
+    Без метрик повертає функцію без змін.
+    """
+    if not config.METRICS_ENABLED:
+        return function
+
+    @functools.wraps(function)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with _Timer(histogram, gauge, value):
+            return await function(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """
+    Декоратор асинхронної функції, що вимірює її як етап обробки name.
+
+    Параметри:
+        name (str): Назва етапу.
+    Повертає:
+        Callable[[F], F]: Декоратор.
+    """
+    return lambda function: _instrument(function, STAGE_SECONDS, STAGE_IN_FLIGHT, name)
+
+
+def timed_handler(mode: str, callback: F) -> F:
+    """
+    Обгортає обробник оновлень вимірюванням у режимі mode.
+
+    Параметри:
+        mode (str): Режим бота (random, gpt, ...).
+        callback (F): Обробник.
+    Повертає:
+        F: Обробник з вимірюванням (або без змін, якщо метрики вимкнено).
+    """
+    return _instrument(callback, HANDLER_SECONDS, HANDLER_IN_FLIGHT, mode)
+
+
+def record_usage(usage: Optional[Any]) -> None:
+    """
+    Додає кількість токенів з поля usage відповіді OpenAI до лічильників.
+
+    Параметри:
+        usage (Optional[Any]): Обʼєкт CompletionUsage або None.
+    """
+    if not config.METRICS_ENABLED or usage is None:
+        return
+    OPENAI_TOKENS.inc("prompt", usage.prompt_tokens or 0)
+    OPENAI_TOKENS.inc("completion", usage.completion_tokens or 0)
+
+
+def register_gauge(name: str, description: str, read: Callable[[], float]) -> None:
+    """
+    Реєструє показник, значення якого читається під час збору метрик
+    (наприклад, довжина черги).
+
+    Параметри:
+        name (str): Назва метрики.
+        description (str): Опис метрики.
+        read (Callable[[], float]): Функція, що повертає поточне значення.
+    """
+    REGISTRY.register(CallbackGauge(name, description, read))
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Відповідає на HTTP-запит метриками (будь-який шлях) і закриває зʼєднання.
+    """
+    try:
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        try:
+            status, body = "200 OK", REGISTRY.render().encode()
+        except Exception as e:
+            logger.error("Помилка збору метрик: %s", e)
+            status, body = "500 Internal Server Error", b""
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except ConnectionResetError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(
+    host: str = config.METRICS_HOST, port: Optional[int] = None
+) -> asyncio.AbstractServer:
+    """
+    Запускає HTTP-сервер метрик.
+
+    Параметри:
+        host (str): Адреса для прослуховування.
+        port (Optional[int]): Порт; None – METRICS_PORT плюс зсув шарда.
+    Повертає:
+        asyncio.AbstractServer: Запущений сервер.
+    """
+    if port is None:
+        port = config.METRICS_PORT + port_offset
+    server = await asyncio.start_server(_handle, host, port)
+    logger.info("Метрики доступні на http://%s:%d/metrics", host, port)
+    return server
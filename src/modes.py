@@ -0,0 +1,114 @@
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+
+import json
+import logging
+import os
+
+from telegram import InlineKeyboardMarkup
+
+from src.resources import RESOURCES_DIR
+from src.util import build_keyboard
+
+logger = logging.getLogger(__name__)
+
+MODES_PATH = os.path.join(RESOURCES_DIR, "modes.json")
+
+
+class ModeOption(NamedTuple):
+    """
+    Варіант вибору в режимі бота (особистість, тема квізу, мова перекладу).
+
+    prompt та image – імена файлів у resources/prompts та resources/images
+    (без розширення); за замовчуванням збігаються з key.
+    """
+
+    key: str
+    name: str
+    prompt: str
+    image: str
+
+
+class ModeGroup:
+    """
+    Група варіантів одного режиму з готовою клавіатурою вибору: пошук
+    варіанта за callback_data – один запит до словника, а клавіатура
+    створюється один раз при завантаженні.
+    """
+
+    def __init__(self, options: Tuple[ModeOption, ...], buttons: Dict[str, str]):
+        """
+        Параметри:
+            options (Tuple[ModeOption, ...]): Варіанти в порядку відображення.
+            buttons (Dict[str, str]): Додаткові кнопки під варіантами
+                (callback_data → текст).
+        """
+        self.options: Mapping[str, ModeOption] = MappingProxyType(
+            {option.key: option for option in options}
+        )
+        self.keyboard: InlineKeyboardMarkup = build_keyboard(
+            {**{option.key: option.name for option in options}, **buttons}
+        )
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.options
+
+    def get(self, key: Optional[str]) -> Optional[ModeOption]:
+        """
+        Повертає варіант за callback_data або None.
+        """
+        return self.options.get(key) if key is not None else None
+
+    def keys(self) -> Tuple[str, ...]:
+        """
+        Повертає ключі варіантів у порядку відображення.
+        """
+        return tuple(self.options)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ModeGroup":
+        """
+        Створює групу з опису в modes.json.
+
+        Параметри:
+            data (Dict[str, Any]): {"options": [...], "buttons": {...}}.
+        Повертає:
+            ModeGroup: Група варіантів.
+        """
+        options = tuple(
+            ModeOption(
+                key=item["key"],
+                name=item["name"],
+                prompt=item.get("prompt", item["key"]),
+                image=item.get("image", item["key"]),
+            )
+            for item in data.get("options", [])
+        )
+        return cls(options, dict(data.get("buttons", {})))
+
+
+class ModeRegistry:
+    """
+    Реєстр варіантів режимів, завантажений один раз з resources/modes.json.
+    Щоб додати особистість, тему квізу чи мову, достатньо додати запис у
+    modes.json (та, за потреби, prompt і зображення до resources).
+    """
+
+    def __init__(self, path: str = MODES_PATH) -> None:
+        """
+        Параметри:
+            path (str): Шлях до файлу опису режимів.
+        Викликає:
+            OSError, ValueError, KeyError: Якщо файл відсутній або некоректний.
+        """
+        with open(path, "r", encoding="utf8") as file:
+            data = json.load(file)
+        self.personalities = ModeGroup.from_dict(data["personalities"])
+        self.quiz_themes = ModeGroup.from_dict(data["quiz_themes"])
+        self.languages = ModeGroup.from_dict(data["languages"])
+        logger.info(
+            "ModeRegistry: особистостей %d, тем квізу %d, мов %d",
+            len(self.personalities.options),
+            len(self.quiz_themes.options),
+            len(self.languages.options),
+        )
@@ -0,0 +1,353 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List
+from typing import NamedTuple, Optional, Set, Tuple
+
+import asyncio
+import logging
+import time
+
+from src import config
+from src.dedup import question_fingerprint
+from src.limits import AdmissionError
+
+logger = logging.getLogger(__name__)
+
+
+class QuizItem(NamedTuple):
+    """
+    Готове питання квізу разом зі списком правильних відповідей.
+    """
+
+    question: str
+    answers: List[str]
+
+
+# Генератор питання: (тема, чат, для якого питання генерується напряму, або
+# None для фонового поповнення)
+QuizProducer = Callable[[str, Optional[int]], Awaitable[Optional[QuizItem]]]
+
+# JSON schema структурованої відповіді з питанням і правильними відповідями
+QUIZ_ITEM_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "question": {"type": "string"},
+        "answers": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["question", "answers"],
+    "additionalProperties": False,
+}
+
+
+def parse_quiz_item(data: Optional[Dict[str, Any]]) -> Optional[QuizItem]:
+    """
+    Перевіряє та нормалізує структуровану відповідь моделі.
+
+    Параметри:
+        data (Optional[Dict[str, Any]]): JSON-обʼєкт відповідно до QUIZ_ITEM_SCHEMA.
+    Повертає:
+        Optional[QuizItem]: Питання з відповідями або None, якщо дані некоректні.
+    """
+    if not data:
+        return None
+    question = data.get("question")
+    answers = data.get("answers")
+    if not isinstance(question, str) or not isinstance(answers, list):
+        return None
+    answers = [
+        answer.strip().lower()
+        for answer in answers
+        if isinstance(answer, str) and answer.strip()
+    ]
+    if not question.strip() or not answers:
+        return None
+    return QuizItem(question.strip(), answers)
+
+
+class QuizPool:
+    """
+    Невеликий буфер готових питань квізу для кожної теми.
+
+    Буфер поповнюється у фоні, тож наступне питання видається користувачу
+    одразу, без очікування GPT. Питання, старші за max_age, відкидаються.
+    Якщо буфер порожній, питання генерується безпосередньо від імені чату,
+    тож на нього поширюється ліміт запитів чату.
+    """
+
+    def __init__(
+        self,
+        producer: QuizProducer,
+        pool_size: int = config.QUIZ_POOL_SIZE,
+        max_age: float = config.QUIZ_POOL_MAX_AGE,
+    ) -> None:
+        """
+        Параметри:
+            producer (QuizProducer): Корутина, що генерує питання для теми.
+            pool_size (int): Кількість готових питань у буфері теми.
+            max_age (float): Максимальний вік питання в буфері, с.
+        """
+        self.producer = producer
+        self.pool_size = pool_size
+        self.max_age = max_age
+        self._buffers: Dict[str, Deque[Tuple[float, QuizItem]]] = {}
+        self._refills: Dict[str, asyncio.Task] = {}
+
+    def size(self, theme: str) -> int:
+        """
+        Повертає кількість готових питань у буфері теми.
+        """
+        return len(self._buffers.get(theme, ()))
+
+    def warm(self, themes: Iterable[str]) -> None:
+        """
+        Запускає фонове заповнення буферів для переліку тем.
+
+        Параметри:
+            themes (Iterable[str]): Теми квізу.
+        """
+        for theme in themes:
+            self._schedule_refill(theme)
+
+    async def get(
+        self,
+        theme: str,
+        exclude: Callable[[QuizItem], bool] = lambda item: False,
+        chat_id: Optional[int] = None,
+    ) -> Optional[QuizItem]:
+        """
+        Видає готове питання з буфера теми та запускає його поповнення.
+
+        Параметри:
+            theme (str): Тема квізу.
+            exclude (Callable[[QuizItem], bool]): Фільтр питань, які не можна
+                видати (наприклад, вже поставлені цьому чату). Такі питання
+                залишаються в буфері для інших чатів.
+            chat_id (Optional[int]): Чат, для якого питання генерується напряму,
+                якщо буфер порожній (для ліміту запитів чату).
+        Повертає:
+            Optional[QuizItem]: Питання або None, якщо його не вдалося згенерувати.
+        Викликає:
+            AdmissionError: Якщо ліміт запитів чату вичерпано або черга переповнена.
+        """
+        buffer = self._buffers.setdefault(theme, deque())
+        deadline = time.monotonic() - self.max_age
+        while buffer and buffer[0][0] < deadline:
+            buffer.popleft()
+        item = None
+        for index, (_, candidate) in enumerate(buffer):
+            if not exclude(candidate):
+                item = candidate
+                del buffer[index]
+                break
+        self._schedule_refill(theme)
+        if item is not None:
+            logger.debug("QuizPool: питання теми %s з буфера", theme)
+            return item
+        logger.debug("QuizPool: буфер теми %s порожній, пряма генерація", theme)
+        return await self._produce(theme, chat_id)
+
+    async def aclose(self) -> None:
+        """
+        Зупиняє фонові задачі поповнення.
+        """
+        for task in self._refills.values():
+            task.cancel()
+        self._refills.clear()
+
+    async def _produce(
+        self, theme: str, chat_id: Optional[int] = None
+    ) -> Optional[QuizItem]:
+        """
+        Генерує одне питання, перехоплюючи помилки генератора (крім відмови
+        в допуску запиту чату, про яку має дізнатися користувач).
+        """
+        try:
+            return await self.producer(theme, chat_id)
+        except Exception as e:
+            if chat_id is not None and isinstance(e, AdmissionError):
+                raise
+            logger.error("QuizPool: помилка генерації питання теми %s: %s", theme, e)
+            return None
+
+    def _schedule_refill(self, theme: str) -> None:
+        """
+        Запускає фонове поповнення буфера теми, якщо воно ще не виконується.
+        """
+        if self.size(theme) >= self.pool_size or theme in self._refills:
+            return
+        task = asyncio.create_task(self._refill(theme))
+        self._refills[theme] = task
+        task.add_done_callback(lambda _: self._refills.pop(theme, None))
+
+    async def _refill(self, theme: str) -> None:
+        """
+        Поповнює буфер теми до pool_size питань.
+        """
+        buffer = self._buffers.setdefault(theme, deque())
+        while len(buffer) < self.pool_size:
+            item = await self._produce(theme)
+            if item is None:
+                break
+            buffer.append((time.monotonic(), item))
+        logger.debug("QuizPool: буфер теми %s поповнено (%d)", theme, len(buffer))
+
+
+FactProducer = Callable[[], Awaitable[List[str]]]
+
+# JSON schema структурованої відповіді з кількома фактами
+FACT_BATCH_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {"facts": {"type": "array", "items": {"type": "string"}}},
+    "required": ["facts"],
+    "additionalProperties": False,
+}
+
+
+def parse_fact_batch(data: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Перевіряє структуровану відповідь з фактами.
+
+    Параметри:
+        data (Optional[Dict[str, Any]]): JSON-обʼєкт відповідно до FACT_BATCH_SCHEMA.
+    Повертає:
+        List[str]: Непорожні факти (порожній список, якщо дані некоректні).
+    """
+    facts = data.get("facts") if data else None
+    if not isinstance(facts, list):
+        return []
+    return [fact.strip() for fact in facts if isinstance(fact, str) and fact.strip()]
+
+
+class FactReservoir:
+    """
+    Резервуар готових випадкових фактів.
+
+    Фонові задачі поповнюють резервуар пакетами (кілька фактів за один
+    запит), щойно кількість фактів опускається нижче low_watermark; кожна
+    задача генерує один пакет і після успіху запускає наступну, доки
+    резервуар не заповниться до capacity. Повтори відкидаються за відбитком
+    тексту. Факт видається за O(1).
+
+    Якщо резервуар порожній (холодний старт або сплеск запитів), запит
+    чекає лише на найближчий пакет, а для кількох запитів, що чекають,
+    пакети генеруються паралельно (не більше capacity / batch_size).
+    """
+
+    def __init__(
+        self,
+        producer: FactProducer,
+        capacity: int = config.RANDOM_FACTS_CAPACITY,
+        low_watermark: int = config.RANDOM_FACTS_LOW_WATERMARK,
+        seen_limit: int = config.RANDOM_FACTS_SEEN_LIMIT,
+        batch_size: int = config.RANDOM_FACTS_BATCH,
+    ) -> None:
+        """
+        Параметри:
+            producer (FactProducer): Корутина, що генерує пакет фактів.
+            capacity (int): Максимальна кількість фактів у резервуарі.
+            low_watermark (int): Поріг, нижче якого запускається поповнення.
+            seen_limit (int): Скільки відбитків фактів памʼятати для відсіювання повторів.
+            batch_size (int): Очікувана кількість фактів в одному пакеті.
+        """
+        self.producer = producer
+        self.capacity = capacity
+        self.low_watermark = low_watermark
+        self.seen_limit = seen_limit
+        self.batch_size = max(1, batch_size)
+        self.max_batches = max(1, -(-capacity // self.batch_size))
+        self._facts: Deque[str] = deque()
+        self._seen: Dict[bytes, None] = {}
+        self._batches: Set[asyncio.Task] = set()
+        self._waiting = 0
+        # Сигнал про завершення генерації пакета
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    def warm(self) -> None:
+        """
+        Запускає фонове заповнення резервуару.
+        """
+        self._schedule_refill()
+
+    async def get(self) -> Optional[str]:
+        """
+        Видає факт із резервуару та за потреби запускає поповнення.
+        Якщо резервуар порожній, чекає на найближчий пакет фактів.
+
+        Повертає:
+            Optional[str]: Факт або None, якщо його не вдалося згенерувати.
+        """
+        if not self._facts:
+            self._waiting += 1
+            try:
+                self._schedule_refill()
+                while not self._facts and self._batches:
+                    await self._changed.wait()
+            finally:
+                self._waiting -= 1
+        fact = self._facts.popleft() if self._facts else None
+        if len(self._facts) < self.low_watermark:
+            self._schedule_refill()
+        return fact
+
+    async def aclose(self) -> None:
+        """
+        Зупиняє фонові задачі поповнення.
+        """
+        for task in list(self._batches):
+            task.cancel()
+        self._batches.clear()
+
+    def _schedule_refill(self) -> None:
+        """
+        Запускає генерацію пакетів: один – для фонового поповнення, більше –
+        якщо на факти чекають кілька запитів.
+        """
+        if len(self._facts) >= self.capacity and not self._waiting:
+            return
+        wanted = min(self.max_batches, max(1, -(-self._waiting // self.batch_size)))
+        while len(self._batches) < wanted:
+            task = asyncio.create_task(self._fill())
+            self._batches.add(task)
+            task.add_done_callback(self._on_batch_done)
+
+    def _on_batch_done(self, task: asyncio.Task) -> None:
+        """
+        Будить запити, що чекають на факти, та продовжує поповнення, якщо
+        пакет був успішним.
+        """
+        self._batches.discard(task)
+        self._changed.set()
+        self._changed.clear()
+        if not task.cancelled() and task.result() and len(self._facts) < self.capacity:
+            self._schedule_refill()
+
+    def _add(self, fact: str) -> bool:
+        """
+        Додає факт, якщо такого ще не було.
+        """
+        fingerprint = question_fingerprint(fact)
+        if fingerprint in self._seen:
+            return False
+        self._seen[fingerprint] = None
+        while len(self._seen) > self.seen_limit:
+            del self._seen[next(iter(self._seen))]
+        self._facts.append(fact)
+        return True
+
+    async def _fill(self) -> int:
+        """
+        Генерує один пакет фактів і додає його до резервуару.
+
+        Повертає:
+            int: Кількість доданих фактів (0 – помилка або лише повтори).
+        """
+        try:
+            batch = await self.producer()
+        except Exception as e:
+            logger.error("FactReservoir: помилка генерації фактів: %s", e)
+            return 0
+        added = sum(1 for fact in batch if self._add(fact))
+        logger.debug("FactReservoir: у резервуарі %d фактів", len(self._facts))
+        return added
@@ -0,0 +1,269 @@
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import asyncio
+import email.utils
+import logging
+import random
+import time
+
+import httpx
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """
+    Запит не виконано: OpenAI API зараз вважається недоступним.
+    """
+
+    def __init__(self, message: str, retry_after: float = 0.0) -> None:
+        """
+        Параметри:
+            message (str): Опис причини.
+            retry_after (float): Через скільки секунд буде дозволено пробний запит.
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(asyncio.TimeoutError):
+    """
+    Запит (разом з повторними спробами) не вклався у відведений час.
+    """
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Визначає, чи є сенс повторити запит після помилки: 408/409/429, 5xx,
+    помилки зʼєднання та таймаути.
+
+    Параметри:
+        error (BaseException): Помилка запиту.
+    Повертає:
+        bool: True, якщо помилка тимчасова.
+    """
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(
+        error, (APIConnectionError, APITimeoutError, asyncio.TimeoutError)
+    )
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Зчитує з відповіді сервера рекомендовану паузу перед повтором
+    (заголовки retry-after-ms та Retry-After у секундах або як HTTP-дата).
+
+    Параметри:
+        error (BaseException): Помилка запиту.
+    Повертає:
+        Optional[float]: Пауза, с, або None, якщо сервер її не вказав.
+    """
+    response: Optional[httpx.Response] = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            date = email.utils.parsedate_to_datetime(value)
+            return max(0.0, date.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Запобіжник: після failure_threshold тимчасових помилок поспіль
+    "розмикається" і протягом reset_timeout секунд відхиляє запити одразу,
+    не чекаючи на деградований API. Потім пропускає один пробний запит:
+    успіх замикає запобіжник, помилка – знову розмикає.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        failure_threshold: int = config.OPENAI_BREAKER_THRESHOLD,
+        reset_timeout: float = config.OPENAI_BREAKER_RESET,
+    ) -> None:
+        """
+        Параметри:
+            failure_threshold (int): Кількість помилок поспіль до розмикання.
+            reset_timeout (float): Час у розімкненому стані до пробного запиту, с.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def before_call(self) -> None:
+        """
+        Перевіряє, чи можна виконати запит.
+
+        Викликає:
+            CircuitOpenError: Якщо запобіжник розімкнений або пробний запит
+                вже виконується.
+        """
+        if self.state == self.CLOSED:
+            return
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if self.state == self.OPEN and remaining <= 0:
+            self.state = self.HALF_OPEN
+            logger.info("CircuitBreaker: пробний запит після паузи")
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        raise CircuitOpenError(
+            "OpenAI API тимчасово недоступний.", retry_after=max(0.0, remaining)
+        )
+
+    def record_success(self) -> None:
+        """
+        Фіксує успішний запит.
+        """
+        if self.state != self.CLOSED:
+            logger.info("CircuitBreaker: API знову доступний")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """
+        Фіксує тимчасову помилку запиту.
+        """
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    "CircuitBreaker: розімкнено після %d помилок", self.failures
+                )
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_ignored(self) -> None:
+        """
+        Фіксує завершення запиту, помилка якого не свідчить про стан API
+        (наприклад, некоректний запит або скасування).
+        """
+        self._probing = False
+
+
+class ResilientCaller:
+    """
+    Виконує запити до OpenAI з обмеженням часу, повторами та запобіжником.
+
+    Тимчасові помилки (429, 5xx, помилки зʼєднання, таймаути) повторюються
+    до max_attempts разів з експоненційною затримкою та випадковим
+    розкидом (full jitter); якщо сервер вказав Retry-After, чекаємо
+    щонайменше стільки. Усі спроби разом мають вкластися у deadline.
+    """
+
+    def __init__(
+        self,
+        deadline: float = config.OPENAI_DEADLINE,
+        max_attempts: int = config.OPENAI_MAX_ATTEMPTS,
+        backoff_base: float = config.OPENAI_BACKOFF_BASE,
+        backoff_max: float = config.OPENAI_BACKOFF_MAX,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        """
+        Параметри:
+            deadline (float): Граничний час запиту разом з повторами, с.
+            max_attempts (int): Максимальна кількість спроб.
+            backoff_base (float): Базова затримка перед повтором, с.
+            backoff_max (float): Максимальна затримка перед повтором, с.
+            breaker (Optional[CircuitBreaker]): Запобіжник (за замовчуванням – новий).
+        """
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.retries = 0
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """
+        Обчислює затримку перед наступною спробою.
+
+        Параметри:
+            attempt (int): Номер спроби, що завершилась помилкою (з 1).
+            error (BaseException): Помилка спроби.
+        Повертає:
+            float: Затримка, с.
+        """
+        delay = random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        )
+        hint = retry_after(error)
+        return max(delay, hint) if hint is not None else delay
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        deadline: Optional[float] = None,
+    ) -> T:
+        """
+        Виконує запит з повторами.
+
+        Параметри:
+            request (Callable[[], Awaitable[T]]): Функція, що створює нову спробу запиту.
+            deadline (Optional[float]): Граничний час, с (за замовчуванням – self.deadline).
+        Повертає:
+            T: Результат запиту.
+        Викликає:
+            CircuitOpenError: Якщо запобіжник розімкнений.
+            DeadlineExceededError: Якщо запит не вклався у граничний час.
+            Exception: Остання помилка запиту, якщо вона не тимчасова або
+                спроби вичерпано.
+        """
+        budget = self.deadline if deadline is None else deadline
+        until = time.monotonic() + budget
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            remaining = until - time.monotonic()
+            try:
+                result = await asyncio.wait_for(request(), remaining)
+            except asyncio.TimeoutError:
+                self.breaker.record_failure()
+                raise DeadlineExceededError(f"Запит не вклався у {budget} с.") from None
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_ignored()
+                    raise
+                self.breaker.record_failure()
+                delay = self.backoff(attempt, e)
+                if attempt >= self.max_attempts or time.monotonic() + delay >= until:
+                    raise
+                self.retries += 1
+                logger.warning(
+                    "Спроба %d запиту до OpenAI невдала (%s), повтор через %.1f с",
+                    attempt,
+                    e,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.record_ignored()
+                raise
+            self.breaker.record_success()
+            return result
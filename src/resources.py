@@ -0,0 +1,126 @@
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+import asyncio
+import logging
+import os
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+RESOURCES_DIR = os.path.join(os.path.dirname(__file__), "..", "resources")
+
+# Типи текстових ресурсів, що завантажуються у памʼять
+TEXT_KINDS = ("prompts", "messages")
+
+
+class ResourceRegistry:
+    """
+    Реєстр текстових ресурсів (prompts та messages), завантажених у памʼять.
+
+    Усі файли читаються один раз при створенні. Вміст зберігається у
+    незмінних словниках; при перезавантаженні будується новий знімок,
+    який атомарно підміняє попередній, тож читачі ніколи не бачать
+    частково оновлених даних.
+    """
+
+    def __init__(self, base_dir: str = RESOURCES_DIR) -> None:
+        """
+        Параметри:
+            base_dir (str): Шлях до папки resources.
+        """
+        self.base_dir = base_dir
+        self._snapshot: Mapping[str, Mapping[str, str]] = MappingProxyType({})
+        self._stamps: Dict[str, Tuple[int, int]] = {}
+        self.reload()
+
+    def get(self, kind: str, name: str) -> Optional[str]:
+        """
+        Повертає вміст ресурсу з памʼяті.
+
+        Параметри:
+            kind (str): Тип ресурсу ("prompts" або "messages").
+            name (str): Ім'я файлу (без розширення).
+        Повертає:
+            Optional[str]: Вміст файлу або None, якщо ресурс не знайдено.
+        """
+        return self._snapshot.get(kind, {}).get(name)
+
+    def names(self, kind: str) -> Tuple[str, ...]:
+        """
+        Повертає імена всіх завантажених ресурсів заданого типу.
+
+        Параметри:
+            kind (str): Тип ресурсу.
+        Повертає:
+            Tuple[str, ...]: Відсортовані імена ресурсів.
+        """
+        return tuple(sorted(self._snapshot.get(kind, {})))
+
+    def reload(self) -> bool:
+        """
+        Перечитує змінені, нові та видалені файли і атомарно публікує новий
+        знімок. Незмінені файли (за mtime та розміром) повторно не читаються.
+
+        Повертає:
+            bool: True, якщо вміст реєстру змінився.
+        """
+        snapshot: Dict[str, Mapping[str, str]] = {}
+        stamps: Dict[str, Tuple[int, int]] = {}
+        changed = False
+        for kind in TEXT_KINDS:
+            previous = self._snapshot.get(kind, {})
+            contents: Dict[str, str] = {}
+            directory = os.path.join(self.base_dir, kind)
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                logger.error("Помилка читання папки %s: %s", directory, e)
+                entries = []
+            for entry in entries:
+                name, ext = os.path.splitext(entry.name)
+                if ext != ".txt" or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                stamp = (stat.st_mtime_ns, stat.st_size)
+                stamps[entry.path] = stamp
+                if self._stamps.get(entry.path) == stamp and name in previous:
+                    contents[name] = previous[name]
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf8") as file:
+                        contents[name] = file.read()
+                except OSError as e:
+                    logger.error("Помилка завантаження ресурсу %s: %s", entry.path, e)
+                    continue
+                changed = True
+                logger.debug("ResourceRegistry: завантажено %s/%s", kind, name)
+            if contents.keys() != previous.keys():
+                changed = True
+            snapshot[kind] = MappingProxyType(contents)
+        if changed:
+            self._snapshot = MappingProxyType(snapshot)
+            logger.info(
+                "ResourceRegistry: завантажено %s",
+                {kind: len(items) for kind, items in snapshot.items()},
+            )
+        self._stamps = stamps
+        return changed
+
+    async def watch(self, interval: float = config.RESOURCES_WATCH_INTERVAL) -> None:
+        """
+        Періодично перевіряє папки ресурсів і перезавантажує змінені файли.
+        Працює, доки задачу не буде скасовано.
+
+        Параметри:
+            interval (float): Інтервал перевірки, с.
+        """
+        logger.info("ResourceRegistry: відстеження змін кожні %s с.", interval)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self.reload):
+                    logger.info("ResourceRegistry: ресурси перезавантажено.")
+            except Exception as e:
+                logger.error("ResourceRegistry: помилка перезавантаження: %s", e)
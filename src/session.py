@@ -0,0 +1,280 @@
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import logging
+import time
+
+from src import config
+from src.history import HistoryPolicy, count_tokens
+from src.messages import MessageRecord
+
+logger = logging.getLogger(__name__)
+
+# Репліка розмови: компактний запис з роллю, текстом та кількістю токенів
+Turn = MessageRecord
+
+
+class ChatSession:
+    """
+    Історія розмови одного чату: системний prompt, підсумок попередньої
+    розмови та ковзне вікно реплік.
+    """
+
+    __slots__ = (
+        "prompt",
+        "prompt_tokens",
+        "summary",
+        "summary_tokens",
+        "turns",
+        "turn_tokens",
+        "pending",
+        "pending_tokens",
+        "chars",
+        "last_access",
+    )
+
+    def __init__(self) -> None:
+        self.prompt: Optional[str] = None
+        self.prompt_tokens: int = 0
+        self.summary: Optional[str] = None
+        self.summary_tokens: int = 0
+        self.turns: Deque[Turn] = deque()
+        self.turn_tokens: int = 0
+        self.pending: List[Turn] = []
+        self.pending_tokens: int = 0
+        self.chars: int = 0
+        self.last_access: float = time.monotonic()
+
+
+class SessionManager:
+    """
+    Менеджер сесій розмов, ключем яких є chat_id.
+
+    Кожен чат має власну обмежену історію: не більше max_turns реплік, що
+    вміщуються в бюджет токенів політики історії. Кількість токенів
+    рахується один раз при додаванні репліки. Неактивні сесії видаляються
+    після idle_ttl секунд, а при перевищенні глобального ліміту символів
+    видаляються найдавніше використані сесії (LRU).
+    """
+
+    def __init__(
+        self,
+        max_turns: int = config.SESSION_MAX_TURNS,
+        idle_ttl: float = config.SESSION_IDLE_TTL,
+        max_total_chars: int = config.SESSION_MAX_TOTAL_CHARS,
+        policy: Optional[HistoryPolicy] = None,
+    ) -> None:
+        """
+        Параметри:
+            max_turns (int): Максимальна кількість реплік в одній сесії.
+            idle_ttl (float): Час неактивності, після якого сесія видаляється, с.
+            max_total_chars (int): Глобальний ліміт символів у всіх сесіях.
+            policy (Optional[HistoryPolicy]): Політика бюджету токенів історії.
+        """
+        self.policy = policy or HistoryPolicy()
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_total_chars = max_total_chars
+        self.total_chars = 0
+        self._sessions: "OrderedDict[int, ChatSession]" = OrderedDict()
+        logger.info(
+            "Ініціалізовано SessionManager: max_turns=%d, idle_ttl=%s, max_total_chars=%d",
+            max_turns,
+            idle_ttl,
+            max_total_chars,
+        )
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._sessions
+
+    def get(self, chat_id: int) -> ChatSession:
+        """
+        Повертає сесію чату, створюючи її за потреби, та оновлює час доступу.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+        Повертає:
+            ChatSession: Сесія чату.
+        """
+        now = time.monotonic()
+        session = self._sessions.get(chat_id)
+        if session is None:
+            session = ChatSession()
+            self._sessions[chat_id] = session
+        else:
+            self._sessions.move_to_end(chat_id)
+        session.last_access = now
+        self._evict_idle(now)
+        return session
+
+    def set_prompt(self, chat_id: int, prompt_text: str) -> None:
+        """
+        Очищає історію чату та встановлює системний prompt.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+            prompt_text (str): Текст prompt(у).
+        """
+        self.clear(chat_id)
+        session = self.get(chat_id)
+        session.prompt = prompt_text
+        session.prompt_tokens = count_tokens(prompt_text)
+        self._grow(session, len(prompt_text))
+
+    def append(self, chat_id: int, role: str, content: str) -> None:
+        """
+        Додає репліку до історії чату. Найстаріші репліки витісняються, доки
+        історія не вміститься у max_turns та бюджет токенів.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+            role (str): Роль ("user" або "assistant").
+            content (str): Текст репліки.
+        """
+        session = self.get(chat_id)
+        content = content or ""
+        tokens = count_tokens(content)
+        session.turns.append(MessageRecord(role, content, tokens))
+        session.turn_tokens += tokens
+        self._grow(session, len(content))
+        self._trim(session)
+
+    def messages(self, chat_id: int) -> List[Dict[str, str]]:
+        """
+        Формує список повідомлень чату у форматі OpenAI API.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+        Повертає:
+            List[Dict[str, str]]: Повідомлення для chat.completions.
+        """
+        session = self.get(chat_id)
+        result = []
+        if session.prompt is not None:
+            result.append({"role": "system", "content": session.prompt})
+        summary = self.policy.summary_message(session.summary)
+        if summary is not None:
+            result.append({"role": "system", "content": summary})
+        result.extend(turn.to_wire() for turn in session.turns)
+        return result
+
+    def prompt_tokens(self, chat_id: int) -> int:
+        """
+        Повертає розмір запиту чату в токенах (prompt, підсумок та репліки).
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+        Повертає:
+            int: Кількість токенів.
+        """
+        session = self.get(chat_id)
+        return session.prompt_tokens + session.summary_tokens + session.turn_tokens
+
+    def take_pending(
+        self, chat_id: int
+    ) -> Optional[Tuple[ChatSession, Optional[str], List[Turn]]]:
+        """
+        Повертає витіснені репліки для згортання у підсумок, якщо їх
+        накопичилось достатньо згідно з політикою.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+        Повертає:
+            Optional[Tuple[ChatSession, Optional[str], List[Turn]]]: Сесія,
+                поточний підсумок та витіснені репліки або None.
+        """
+        session = self._sessions.get(chat_id)
+        if session is None or not self.policy.should_summarize(session.pending_tokens):
+            return None
+        return session, session.summary, list(session.pending)
+
+    def set_summary(
+        self, chat_id: int, session: ChatSession, summary: str, folded: List[Turn]
+    ) -> None:
+        """
+        Зберігає новий підсумок та видаляє згорнуті витіснені репліки.
+        Якщо за час згортання сесію було скинуто, нічого не робить.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+            session (ChatSession): Сесія, для якої готувався підсумок.
+            summary (str): Текст підсумку.
+            folded (List[Turn]): Витіснені репліки, що увійшли в підсумок
+                (частину з них за цей час могло бути відкинуто через ліміт).
+        """
+        if self._sessions.get(chat_id) is not session:
+            return
+        folded_ids = {id(turn) for turn in folded}
+        folded_turns = [turn for turn in session.pending if id(turn) in folded_ids]
+        session.pending = [
+            turn for turn in session.pending if id(turn) not in folded_ids
+        ]
+        session.pending_tokens -= sum(turn.tokens for turn in folded_turns)
+        delta = len(summary) - len(session.summary or "")
+        delta -= sum(len(turn.content) for turn in folded_turns)
+        session.summary = summary
+        session.summary_tokens = count_tokens(summary)
+        self._grow(session, delta)
+        self._trim(session)
+
+    def _trim(self, session: ChatSession) -> None:
+        """
+        Витісняє найстаріші репліки, доки історія не вміститься у max_turns
+        та бюджет токенів. Остання репліка зберігається завжди.
+        """
+        budget = self.policy.turn_budget(session.prompt_tokens + session.summary_tokens)
+        while len(session.turns) > 1 and (
+            len(session.turns) > self.max_turns or session.turn_tokens > budget
+        ):
+            turn = session.turns.popleft()
+            session.turn_tokens -= turn.tokens
+            if self.policy.summarize:
+                session.pending.append(turn)
+                session.pending_tokens += turn.tokens
+            else:
+                self._grow(session, -len(turn.content))
+        # Якщо підсумок довго не вдається оновити, найстаріші витіснені
+        # репліки відкидаються без згортання
+        while session.pending_tokens > self.policy.pending_max_tokens:
+            turn = session.pending.pop(0)
+            session.pending_tokens -= turn.tokens
+            self._grow(session, -len(turn.content))
+
+    def clear(self, chat_id: int) -> None:
+        """
+        Видаляє сесію чату.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+        """
+        session = self._sessions.pop(chat_id, None)
+        if session is not None:
+            self.total_chars -= session.chars
+
+    def _grow(self, session: ChatSession, delta: int) -> None:
+        """
+        Оновлює облік розміру сесії та за потреби витісняє найдавніші сесії.
+        """
+        session.chars += delta
+        self.total_chars += delta
+        while self.total_chars > self.max_total_chars and len(self._sessions) > 1:
+            chat_id, oldest = next(iter(self._sessions.items()))
+            if oldest is session:
+                break
+            self.clear(chat_id)
+            logger.info("Сесію чату %d витіснено через ліміт памʼяті.", chat_id)
+
+    def _evict_idle(self, now: float) -> None:
+        """
+        Видаляє сесії, неактивні довше idle_ttl. Сесії впорядковані за часом
+        доступу, тож перевіряються лише найстаріші.
+        """
+        while self._sessions:
+            chat_id, oldest = next(iter(self._sessions.items()))
+            if now - oldest.last_access <= self.idle_ttl:
+                break
+            self.clear(chat_id)
+            logger.debug("Сесію чату %d видалено через неактивність.", chat_id)
@@ -0,0 +1,201 @@
+from typing import Any, Callable, Dict, List, Optional
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+
+from telegram import Bot, Update
+from telegram.ext import Application, Updater
+
+from src import config, metrics
+from src.updates import update_chat_key
+
+logger = logging.getLogger(__name__)
+
+ApplicationFactory = Callable[[], Application]
+
+
+def shard_for(update: object, shards: int) -> int:
+    """
+    Визначає шард для оновлення за ідентифікатором чату (або користувача).
+
+    Параметри:
+        update (object): Оновлення Telegram.
+        shards (int): Кількість шардів.
+    Повертає:
+        int: Номер шарда від 0 до shards - 1.
+    """
+    key = update_chat_key(update)
+    if key is None:
+        return 0
+    if isinstance(key, tuple):
+        key = key[-1]
+    return int(key) % shards
+
+
+def run_worker(
+    build_application: ApplicationFactory, index: int, queue: multiprocessing.Queue
+) -> None:
+    """
+    Точка входу процесу-шарда: обробляє оновлення з черги, доки не отримає None.
+
+    Параметри:
+        build_application (ApplicationFactory): Функція, що створює застосунок
+            бота з обробниками (має бути доступна для імпорту в дочірньому процесі).
+        index (int): Номер шарда.
+        queue (multiprocessing.Queue): Черга оновлень шарда (JSON-рядки).
+    """
+    # Зупинкою шардів керує диспетчер (через None у черзі)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        format=f"%(asctime)s - shard {index} - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    # Кожен шард віддає власні метрики на METRICS_PORT + номер шарда
+    metrics.port_offset = index
+    asyncio.run(_serve_shard(build_application(), index, queue))
+
+
+async def _serve_shard(
+    application: Application, index: int, queue: multiprocessing.Queue
+) -> None:
+    """
+    Запускає застосунок без власного отримання оновлень і передає йому
+    оновлення з черги шарда.
+    """
+    loop = asyncio.get_running_loop()
+    async with application:
+        if application.post_init is not None:
+            await application.post_init(application)
+        await application.start()
+        logger.info("Шард %d запущено.", index)
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            update = Update.de_json(json.loads(data), application.bot)
+            await application.update_queue.put(update)
+        await application.stop()
+        if application.post_shutdown is not None:
+            await application.post_shutdown(application)
+    logger.info("Шард %d зупинено.", index)
+
+
+class ShardDispatcher:
+    """
+    Диспетчер шардів: запускає процеси-обробники, отримує оновлення
+    (long polling або вебхук) і пересилає кожне до шарда його чату.
+
+    Кожен шард – окремий процес зі своїм застосунком, історіями чатів та
+    кешами, тож стан чату живе лише в одному шарді, а обробники різних
+    шардів виконуються на різних ядрах. Оновлення одного чату завжди
+    потрапляють до того самого шарда в порядку надходження.
+    """
+
+    def __init__(
+        self,
+        build_application: ApplicationFactory,
+        token: str,
+        workers: int = config.BOT_WORKERS,
+        queue_size: int = config.SHARD_QUEUE_SIZE,
+    ) -> None:
+        """
+        Параметри:
+            build_application (ApplicationFactory): Функція, що створює застосунок
+                бота в кожному шарді.
+            token (str): Токен Telegram-бота.
+            workers (int): Кількість процесів-шардів.
+            queue_size (int): Максимум оновлень у черзі одного шарда.
+        """
+        self.build_application = build_application
+        self.token = token
+        self.workers = workers
+        self.queue_size = queue_size
+        self.forwarded = [0] * workers
+        self._context = multiprocessing.get_context("spawn")
+        self._queues: List[multiprocessing.Queue] = []
+        self._processes: List[multiprocessing.Process] = []
+
+    def run(self, webhook: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Запускає шарди та отримання оновлень; блокує до SIGINT/SIGTERM.
+
+        Параметри:
+            webhook (Optional[Dict[str, Any]]): Параметри Updater.start_webhook
+                або None для long polling.
+        """
+        for index in range(self.workers):
+            queue = self._context.Queue(maxsize=self.queue_size)
+            process = self._context.Process(
+                target=run_worker,
+                args=(self.build_application, index, queue),
+                name=f"shard-{index}",
+            )
+            process.start()
+            self._queues.append(queue)
+            self._processes.append(process)
+        logger.info("Запущено %d шардів.", self.workers)
+        try:
+            asyncio.run(self._dispatch(webhook))
+        finally:
+            self._stop_workers()
+
+    async def _dispatch(self, webhook: Optional[Dict[str, Any]]) -> None:
+        """
+        Отримує оновлення та пересилає їх до шардів, доки не надійде сигнал зупинки.
+        """
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        update_queue: asyncio.Queue = asyncio.Queue()
+        updater = Updater(Bot(self.token), update_queue)
+        async with updater:
+            if webhook is None:
+                await updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            else:
+                await updater.start_webhook(**webhook)
+            forward = asyncio.create_task(self._forward(update_queue))
+            await stop.wait()
+            logger.info("Зупинка диспетчера шардів...")
+            await updater.stop()
+            # Пересилаємо оновлення, що вже отримані, і лише тоді зупиняємо шарди
+            await update_queue.join()
+            forward.cancel()
+        logger.info("Переслано оновлень по шардах: %s", self.forwarded)
+
+    async def _forward(self, update_queue: asyncio.Queue) -> None:
+        """
+        Пересилає оновлення до шардів по одному, тож порядок оновлень
+        кожного чату зберігається. Якщо черга шарда заповнена, чекає.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            update = await update_queue.get()
+            try:
+                index = shard_for(update, self.workers)
+                await loop.run_in_executor(
+                    None, self._queues[index].put, update.to_json()
+                )
+                self.forwarded[index] += 1
+            except Exception as e:
+                logger.error("Помилка пересилання оновлення: %s", e)
+            finally:
+                update_queue.task_done()
+
+    def _stop_workers(self) -> None:
+        """
+        Надсилає шардам сигнал завершення та чекає на них.
+        """
+        for queue in self._queues:
+            queue.put(None)
+        for process in self._processes:
+            process.join(config.UPDATES_SHUTDOWN_TIMEOUT + 10)
+            if process.is_alive():
+                logger.warning(
+                    "Шард %s не зупинився, примусове завершення.", process.name
+                )
+                process.terminate()
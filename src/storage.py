@@ -0,0 +1,597 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# Позначка видаленого запису в черзі запису
+_DELETED = object()
+
+
+def _to_json(value: Any) -> Any:
+    """
+    Перетворює обʼєкт з to_dict() на JSON-сумісне значення (для json.dumps).
+    """
+    to_dict = getattr(value, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"{type(value).__name__} не серіалізується в JSON")
+    return to_dict()
+
+
+class StateStore(ABC):
+    """
+    Інтерфейс сховища стану чатів: JSON-сумісні значення за ключем у
+    просторі імен (namespace).
+    """
+
+    @abstractmethod
+    def load(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Повертає збережене значення або None.
+
+        Параметри:
+            namespace (str): Простір імен (наприклад, "dialog").
+            key (str): Ключ (наприклад, chat_id).
+        Повертає:
+            Optional[Any]: Значення або None.
+        """
+
+    @abstractmethod
+    def load_recent(self, namespace: str, since: float) -> Dict[str, Any]:
+        """
+        Повертає значення простору імен, змінені не раніше since.
+
+        Параметри:
+            namespace (str): Простір імен.
+            since (float): Час (unix time); 0 – усі значення.
+        Повертає:
+            Dict[str, Any]: Словник ключ → значення.
+        """
+
+    @abstractmethod
+    def save(self, namespace: str, key: str, value: Any) -> None:
+        """
+        Зберігає значення. Значення може бути обʼєктом з методом to_dict():
+        тоді воно серіалізується лише під час запису, тож часті зміни одного
+        обʼєкта коштують одного присвоєння.
+
+        Параметри:
+            namespace (str): Простір імен.
+            key (str): Ключ.
+            value (Any): JSON-сумісне значення або обʼєкт з to_dict().
+        """
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        """
+        Видаляє значення.
+
+        Параметри:
+            namespace (str): Простір імен.
+            key (str): Ключ.
+        """
+
+    async def aload(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Повертає збережене значення або None, не блокуючи цикл подій
+        (для сховищ, що читають з диска).
+
+        Параметри:
+            namespace (str): Простір імен.
+            key (str): Ключ.
+        Повертає:
+            Optional[Any]: Значення або None.
+        """
+        return self.load(namespace, key)
+
+    async def aload_recent(self, namespace: str, since: float) -> Dict[str, Any]:
+        """
+        Повертає значення простору імен, змінені не раніше since, не
+        блокуючи цикл подій.
+
+        Параметри:
+            namespace (str): Простір імен.
+            since (float): Час (unix time); 0 – усі значення.
+        Повертає:
+            Dict[str, Any]: Словник ключ → значення.
+        """
+        return self.load_recent(namespace, since)
+
+    def flush(self) -> None:
+        """
+        Записує відкладені зміни.
+        """
+
+    async def aflush(self) -> None:
+        """
+        Записує відкладені зміни, не блокуючи цикл подій.
+        """
+        self.flush()
+
+    def close(self) -> None:
+        """
+        Записує відкладені зміни та звільняє ресурси.
+        """
+
+    async def run_flusher(self, interval: float = config.STATE_FLUSH_INTERVAL) -> None:
+        """
+        Періодично записує відкладені зміни (фонова задача).
+
+        Параметри:
+            interval (float): Інтервал між записами, с.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.aflush()
+            except Exception as e:
+                logger.error("StateStore: помилка запису стану: %s", e)
+
+
+class MemoryStateStore(StateStore):
+    """
+    Сховище стану в памʼяті (стан втрачається при перезапуску).
+
+    Записи, до яких не зверталися довше за idle_ttl, видаляються, тож
+    обсяг памʼяті залежить від кількості активних чатів, а не від усіх
+    чатів, що будь-коли писали боту.
+    """
+
+    def __init__(self, idle_ttl: float = config.STATE_MEMORY_TTL) -> None:
+        """
+        Параметри:
+            idle_ttl (float): Час без звернень, після якого запис видаляється, с
+                (0 – не видаляти).
+        """
+        self.idle_ttl = idle_ttl
+        self.evicted = 0
+        # (простір імен, ключ) → (час останнього звернення, значення)
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+
+    def load(self, namespace: str, key: str) -> Optional[Any]:
+        entry = self._data.get((namespace, key))
+        if entry is None:
+            return None
+        self._touch((namespace, key), entry[1])
+        return entry[1]
+
+    def load_recent(self, namespace: str, since: float) -> Dict[str, Any]:
+        return {
+            k: v
+            for (ns, k), (accessed, v) in self._data.items()
+            if ns == namespace and accessed >= since
+        }
+
+    def save(self, namespace: str, key: str, value: Any) -> None:
+        self._touch((namespace, key), value)
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._data.pop((namespace, key), None)
+
+    def _touch(self, key: Tuple[str, str], value: Any) -> None:
+        """
+        Оновлює час звернення до запису та видаляє застарілі записи.
+        """
+        now = time.time()
+        self._data[key] = (now, value)
+        self._data.move_to_end(key)
+        if self.idle_ttl <= 0:
+            return
+        deadline = now - self.idle_ttl
+        while self._data:
+            oldest, (accessed, _) = next(iter(self._data.items()))
+            if accessed >= deadline:
+                break
+            del self._data[oldest]
+            self.evicted += 1
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Сховище стану в SQLite (режим WAL) з відкладеним пакетним записом:
+    зміни накопичуються в памʼяті (кілька змін одного ключа зливаються в
+    одну) і записуються однією транзакцією – після batch_size змін або
+    періодично з run_flusher.
+
+    Усі запити до бази виконуються в окремому потоці (по одному, в порядку
+    надходження), тож запис пакета не зупиняє обробку оновлень.
+
+    У багатопроцесному режимі всі шарди відкривають той самий файл: WAL
+    дозволяє одночасне читання, записи чекають на блокування до
+    busy_timeout, а оскільки чати розподілені між шардами, шарди пишуть
+    різні ключі.
+    """
+
+    def __init__(
+        self,
+        path: str = config.STATE_DB_PATH,
+        batch_size: int = config.STATE_BATCH_SIZE,
+    ) -> None:
+        """
+        Параметри:
+            path (str): Шлях до файлу бази даних.
+            batch_size (int): Кількість відкладених змін, після якої вони записуються.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.writes = 0
+        self._pending: Dict[Tuple[str, str], Any] = {}
+        # Пакети, що записуються зараз (читання мають їх бачити)
+        self._writing: List[Dict[Tuple[str, str], Any]] = []
+        self._flushes: Set[asyncio.Task] = set()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="state-store")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (namespace TEXT NOT NULL, "
+            "key TEXT NOT NULL, value TEXT NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS state_updated ON state (namespace, updated)"
+        )
+        self._conn.commit()
+        logger.info("SQLiteStateStore: відкрито %s", path)
+
+    def _unwritten(self, namespace: str, key: str) -> Any:
+        """
+        Повертає ще не записане значення ключа, _DELETED або None.
+        """
+        value = self._pending.get((namespace, key))
+        if value is not None:
+            return value
+        for batch in reversed(self._writing):
+            value = batch.get((namespace, key))
+            if value is not None:
+                return value
+        return None
+
+    def _select(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Читає значення з бази (виконується в потоці сховища).
+        """
+        row = self._conn.execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load(self, namespace: str, key: str) -> Optional[Any]:
+        value = self._unwritten(namespace, key)
+        if value is not None:
+            return None if value is _DELETED else value
+        return self._executor.submit(self._select, namespace, key).result()
+
+    async def aload(self, namespace: str, key: str) -> Optional[Any]:
+        value = self._unwritten(namespace, key)
+        if value is not None:
+            return None if value is _DELETED else value
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._select, namespace, key
+        )
+
+    def _select_recent(self, namespace: str, since: float) -> List[Tuple[str, str]]:
+        """
+        Читає рядки простору імен, змінені не раніше since (виконується в
+        потоці сховища).
+        """
+        return self._conn.execute(
+            "SELECT key, value FROM state WHERE namespace = ? AND updated >= ?",
+            (namespace, since),
+        ).fetchall()
+
+    def load_recent(self, namespace: str, since: float) -> Dict[str, Any]:
+        rows = self._executor.submit(self._select_recent, namespace, since).result()
+        return self._merge_unwritten(namespace, rows)
+
+    async def aload_recent(self, namespace: str, since: float) -> Dict[str, Any]:
+        rows = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._select_recent, namespace, since
+        )
+        return self._merge_unwritten(namespace, rows)
+
+    def _merge_unwritten(
+        self, namespace: str, rows: List[Tuple[str, str]]
+    ) -> Dict[str, Any]:
+        """
+        Доповнює прочитані рядки ще не записаними змінами простору імен.
+        """
+        data = {key: json.loads(value) for key, value in rows}
+        for batch in (*self._writing, self._pending):
+            for (ns, key), value in batch.items():
+                if ns != namespace:
+                    continue
+                if value is _DELETED:
+                    data.pop(key, None)
+                else:
+                    data[key] = value
+        return data
+
+    def save(self, namespace: str, key: str, value: Any) -> None:
+        self._pending[(namespace, key)] = value
+        if len(self._pending) >= self.batch_size:
+            self._flush_in_background()
+
+    def delete(self, namespace: str, key: str) -> None:
+        self.save(namespace, key, _DELETED)
+
+    def _take_batch(self) -> Optional[Tuple[Dict[Tuple[str, str], Any], List, List]]:
+        """
+        Забирає відкладені зміни та готує рядки для запису.
+
+        Повертає:
+            Optional[Tuple[Dict, List, List]]: (зміни, upsert-рядки, ключі для
+                видалення) або None, якщо змін немає.
+        """
+        if not self._pending:
+            return None
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        upserts = [
+            (ns, key, json.dumps(value, ensure_ascii=False, default=_to_json), now)
+            for (ns, key), value in pending.items()
+            if value is not _DELETED
+        ]
+        deletes = [key for key, value in pending.items() if value is _DELETED]
+        self._writing.append(pending)
+        return pending, upserts, deletes
+
+    def _write(self, upserts: List, deletes: List) -> None:
+        """
+        Записує пакет однією транзакцією (виконується в потоці сховища).
+        """
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO state (namespace, key, value, updated) "
+                "VALUES (?, ?, ?, ?)",
+                upserts,
+            )
+            self._conn.executemany(
+                "DELETE FROM state WHERE namespace = ? AND key = ?", deletes
+            )
+
+    def _finish_batch(
+        self, pending: Dict[Tuple[str, str], Any], error: Optional[BaseException]
+    ) -> None:
+        """
+        Прибирає записаний пакет; якщо запис не вдався, повертає зміни, які
+        ще не перезаписані новішими, до відкладених.
+        """
+        self._writing.remove(pending)
+        if error is not None:
+            for key, value in pending.items():
+                self._pending.setdefault(key, value)
+            return
+        self.writes += 1
+        logger.debug("SQLiteStateStore: записано %d змін", len(pending))
+
+    def flush(self) -> None:
+        batch = self._take_batch()
+        if batch is None:
+            return
+        pending, upserts, deletes = batch
+        error = None
+        try:
+            self._executor.submit(self._write, upserts, deletes).result()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish_batch(pending, error)
+
+    async def aflush(self) -> None:
+        batch = self._take_batch()
+        if batch is not None:
+            await self._write_batch(*batch)
+
+    async def _write_batch(
+        self, pending: Dict[Tuple[str, str], Any], upserts: List, deletes: List
+    ) -> None:
+        """
+        Записує підготовлений пакет у потоці сховища.
+        """
+        error = None
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._write, upserts, deletes
+            )
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish_batch(pending, error)
+
+    def _flush_in_background(self) -> None:
+        """
+        Забирає відкладені зміни та записує їх у фоні (без циклу подій –
+        одразу).
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        batch = self._take_batch()
+        if batch is None:
+            return
+        task = loop.create_task(self._write_logged(*batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write_logged(
+        self, pending: Dict[Tuple[str, str], Any], upserts: List, deletes: List
+    ) -> None:
+        """
+        Записує пакет, записуючи помилку в журнал.
+        """
+        try:
+            await self._write_batch(pending, upserts, deletes)
+        except Exception as e:
+            logger.error("SQLiteStateStore: помилка запису стану: %s", e)
+
+    def close(self) -> None:
+        self.flush()
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+        logger.info("SQLiteStateStore: закрито %s", self.path)
+
+
+def create_state_store(kind: str = config.STATE_STORE) -> StateStore:
+    """
+    Створює сховище стану за назвою ("memory" або "sqlite").
+
+    Параметри:
+        kind (str): Тип сховища.
+    Повертає:
+        StateStore: Сховище.
+    """
+    if kind == "sqlite":
+        return SQLiteStateStore()
+    if kind != "memory":
+        logger.warning("Невідоме сховище стану %s, використано memory", kind)
+    return MemoryStateStore()
+
+
+class StorePersistence(BasePersistence):
+    """
+    Збереження стану ConversationHandler та context.user_data у StateStore,
+    щоб після перезапуску користувачі залишались у своїх режимах.
+
+    context.user_data завантажується ліниво – при першому оновленні
+    користувача після запуску (або після idle_ttl без оновлень). Стани розмов python-telegram-bot читає лише
+    один раз під час запуску, тож відновлюються розмови чатів, активних
+    протягом restore_window, а не всіх користувачів.
+    """
+
+    def __init__(
+        self,
+        store: StateStore,
+        update_interval: float = config.STATE_FLUSH_INTERVAL,
+        restore_window: float = config.STATE_RESTORE_WINDOW,
+        idle_ttl: float = config.DIALOG_IDLE_TTL,
+    ) -> None:
+        """
+        Параметри:
+            store (StateStore): Сховище стану.
+            update_interval (float): Інтервал, з яким застосунок викликає flush, с.
+            restore_window (float): За який час відновлюються розмови під час
+                запуску, с (0 – усі).
+            idle_ttl (float): Час без оновлень, після якого користувач
+                забувається як завантажений, с.
+        """
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, user_data=True, callback_data=False
+            ),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self.restore_window = restore_window
+        self.idle_ttl = idle_ttl
+        # Користувачі, чиї user_data вже завантажено, за часом останнього
+        # звернення (найдавніші – першими)
+        self._loaded_users: "OrderedDict[int, float]" = OrderedDict()
+
+    def _mark_loaded(self, user_id: int) -> None:
+        """
+        Запамʼятовує, що user_data користувача завантажено, та забуває
+        користувачів без оновлень довше за idle_ttl (їхні дані вже передано
+        до сховища, тож повторне завантаження нічого не змінить).
+        """
+        now = time.monotonic()
+        self._loaded_users[user_id] = now
+        self._loaded_users.move_to_end(user_id)
+        deadline = now - self.idle_ttl
+        while self._loaded_users:
+            oldest, last_access = next(iter(self._loaded_users.items()))
+            if last_access >= deadline:
+                break
+            del self._loaded_users[oldest]
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        self._mark_loaded(user_id)
+        self.store.save("user_data", str(user_id), data)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        loaded = user_id in self._loaded_users
+        self._mark_loaded(user_id)
+        if loaded:
+            return
+        stored = await self.store.aload("user_data", str(user_id))
+        if stored:
+            for key, value in stored.items():
+                user_data.setdefault(key, value)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._loaded_users.pop(user_id, None)
+        self.store.delete("user_data", str(user_id))
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, object]:
+        since = time.time() - self.restore_window if self.restore_window > 0 else 0
+        conversations = {
+            tuple(json.loads(key)): state
+            for key, state in self.store.load_recent(
+                f"conversation:{name}", since
+            ).items()
+        }
+        logger.info(
+            "StorePersistence: відновлено %d розмов %s", len(conversations), name
+        )
+        return conversations
+
+    async def update_conversation(
+        self, name: str, key: Tuple, new_state: Optional[object]
+    ) -> None:
+        namespace = f"conversation:{name}"
+        if new_state is None:
+            self.store.delete(namespace, json.dumps(list(key)))
+        else:
+            self.store.save(namespace, json.dumps(list(key)), new_state)
+
+    async def get_chat_data(self) -> Dict[int, Any]:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: Any) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Any) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def get_bot_data(self) -> Any:
+        return {}
+
+    async def update_bot_data(self, data: Any) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Any) -> None:
+        pass
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def flush(self) -> None:
+        await self.store.aflush()
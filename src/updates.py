@@ -0,0 +1,130 @@
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+
+def update_chat_key(update: object) -> Optional[Hashable]:
+    """
+    Повертає ключ, за яким упорядковуються оновлення: ідентифікатор чату
+    (або користувача, якщо чату немає).
+
+    Параметри:
+        update (object): Оновлення Telegram.
+    Повертає:
+        Optional[Hashable]: Ключ або None, якщо порядок не важливий.
+    """
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return ("user", update.effective_user.id)
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обробляє оновлення різних чатів паралельно, а оновлення одного чату –
+    строго по черзі в порядку надходження, тож стан ConversationHandler
+    залишається узгодженим. При зупинці чекає на завершення оновлень, що
+    вже обробляються.
+
+    Черга чату та ліміт одночасних оновлень реалізовані в do_process_update:
+    спершу оновлення чекає на свою чергу в чаті, і лише потім займає одне з
+    max_concurrent_updates місць, тож серія оновлень одного чату не займає
+    місця, потрібні іншим чатам. Семафор BaseUpdateProcessor, що береться ще
+    до do_process_update, тому створюється без практичного обмеження.
+    """
+
+    # Розмір семафора BaseUpdateProcessor: обмеження застосовується в
+    # do_process_update після черги чату
+    UNBOUNDED = 2**31
+
+    def __init__(
+        self,
+        max_concurrent_updates: int = config.UPDATES_CONCURRENCY,
+        shutdown_timeout: float = config.UPDATES_SHUTDOWN_TIMEOUT,
+    ) -> None:
+        """
+        Параметри:
+            max_concurrent_updates (int): Максимум оновлень, що обробляються одночасно.
+            shutdown_timeout (float): Скільки чекати на завершення обробки при зупинці, с.
+        Викликає:
+            ValueError: Якщо max_concurrent_updates менше 1.
+        """
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates має бути додатним.")
+        super().__init__(self.UNBOUNDED)
+        self.concurrency = max_concurrent_updates
+        self.shutdown_timeout = shutdown_timeout
+        self.active = 0
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._idle: Optional[asyncio.Event] = None
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+
+    async def do_process_update(
+        self, update: object, coroutine: Awaitable[Any]
+    ) -> None:
+        """
+        Обробляє оновлення, дочекавшись завершення попередніх оновлень того ж
+        чату, а потім вільного місця серед max_concurrent_updates.
+
+        Параметри:
+            update (object): Оновлення.
+            coroutine (Awaitable[Any]): Корутина обробки оновлення.
+        """
+        key = update_chat_key(update)
+        self.active += 1
+        if self._idle is not None:
+            self._idle.clear()
+        try:
+            if key is None:
+                async with self._slots:
+                    await coroutine
+                return
+            lock = self._locks.setdefault(key, asyncio.Lock())
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            try:
+                async with lock, self._slots:
+                    await coroutine
+            finally:
+                self._waiters[key] -= 1
+                if not self._waiters[key]:
+                    del self._waiters[key]
+                    del self._locks[key]
+        finally:
+            self.active -= 1
+            if not self.active and self._idle is not None:
+                self._idle.set()
+
+    async def initialize(self) -> None:
+        """
+        Готує процесор до роботи.
+        """
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def shutdown(self) -> None:
+        """
+        Чекає на завершення оновлень, що обробляються, не довше shutdown_timeout.
+        """
+        if self._idle is None or not self.active:
+            return
+        logger.info("Очікування завершення обробки %d оновлень...", self.active)
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Обробку %d оновлень не завершено за %s с",
+                self.active,
+                self.shutdown_timeout,
+            )
@@ -5,18 +5,46 @@ from telegram import (
     BotCommand,
     MenuButtonCommands,
     BotCommandScopeChat,
-    MenuButtonDefault,
 )
-from telegram import Update
+from telegram import Bot, Update
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
-from typing import Dict, Any, List
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Any, List, Optional, Set, Union
 
+import asyncio
+import hashlib
+import json
 import logging
 import os
+import time
+
+from src import config, metrics
+from src.dedup import (
+    MinHashSignature,
+    minhash_signature,
+    question_fingerprint,
+    similarity,
+)
+from src.media import FileIdCache
+from src.messages import MessageRecord
+from src.resources import ResourceRegistry
+from src.storage import MemoryStateStore, StateStore
 
 logger = logging.getLogger(__name__)
 
+# Максимальна довжина текстового повідомлення Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Максимальна довжина підпису до фото (в одиницях UTF-16)
+TELEGRAM_CAPTION_LIMIT = 1024
+
+# Prompts та messages завантажуються у памʼять один раз при старті
+resource_registry = ResourceRegistry()
+
+# file_id зображень, вже завантажених у Telegram
+file_id_cache = FileIdCache()
+
 
 def dialog_user_info_to_str(user_data: Dict[str, Any]) -> str:
     """
@@ -37,6 +65,7 @@ def dialog_user_info_to_str(user_data: Dict[str, Any]) -> str:
     return result
 
 
+@metrics.timed("send_text")
 async def send_text(
     update: Update, context: ContextTypes.DEFAULT_TYPE, text: str
 ) -> Message:
@@ -67,6 +96,7 @@ async def send_text(
     )
 
 
+@metrics.timed("send_html")
 async def send_html(
     update: Update, context: ContextTypes.DEFAULT_TYPE, text: str
 ) -> Message:
@@ -87,11 +117,46 @@ async def send_html(
     )
 
 
+def build_keyboard(buttons: Dict[str, str]) -> InlineKeyboardMarkup:
+    """
+    Створює inline-клавіатуру з однією кнопкою в рядку.
+
+    Параметри:
+        buttons (Dict[str, str]): Словник, де ключ – callback_data, значення – текст кнопки.
+    Повертає:
+        InlineKeyboardMarkup: Клавіатура для повідомлення.
+    """
+    keyboard: List[List[InlineKeyboardButton]] = []
+    for key, value in buttons.items():
+        button = InlineKeyboardButton(str(value), callback_data=str(key))
+        keyboard.append([button])
+    return InlineKeyboardMarkup(keyboard)
+
+
+# Кнопки: словник callback_data → текст або вже готова клавіатура
+Buttons = Union[Dict[str, str], InlineKeyboardMarkup]
+
+
+def as_keyboard(buttons: Buttons) -> InlineKeyboardMarkup:
+    """
+    Повертає клавіатуру: готову без змін або створену зі словника кнопок.
+
+    Параметри:
+        buttons (Buttons): Словник кнопок або InlineKeyboardMarkup.
+    Повертає:
+        InlineKeyboardMarkup: Клавіатура для повідомлення.
+    """
+    if isinstance(buttons, InlineKeyboardMarkup):
+        return buttons
+    return build_keyboard(buttons)
+
+
+@metrics.timed("send_text_buttons")
 async def send_text_buttons(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
     text: str,
-    buttons: Dict[str, str],
+    buttons: Buttons,
 ) -> Message:
     """
     Надсилає текстове повідомлення з кнопками.
@@ -100,16 +165,13 @@ async def send_text_buttons(
         update (Update): Оновлення Telegram.
         context (ContextTypes.DEFAULT_TYPE): Контекст.
         text (str): Текстове повідомлення.
-        buttons (Dict[str, str]): Словник, де ключ – callback_data, значення – текст кнопки.
+        buttons (Buttons): Словник, де ключ – callback_data, значення – текст кнопки,
+            або готова клавіатура.
     Повертає:
         Message: Надіслане повідомлення.
     """
     text = text.encode("utf16", errors="surrogatepass").decode("utf16")
-    keyboard: List[List[InlineKeyboardButton]] = []
-    for key, value in buttons.items():
-        button = InlineKeyboardButton(str(value), callback_data=str(key))
-        keyboard.append([button])
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply_markup = as_keyboard(buttons)
     logger.debug("send_text_buttons: кнопки %s", buttons)
     return await context.bot.send_message(
         update.effective_message.chat_id,
@@ -119,106 +181,304 @@ async def send_text_buttons(
     )
 
 
+async def _edit_text(
+    context: ContextTypes.DEFAULT_TYPE,
+    message: Message,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+) -> None:
+    """
+    Редагує текст повідомлення, ігноруючи помилку «message is not modified».
+    """
+    try:
+        await context.bot.edit_message_text(
+            text,
+            chat_id=message.chat_id,
+            message_id=message.message_id,
+            reply_markup=reply_markup,
+        )
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+
+
+@metrics.timed("send_streaming_text_buttons")
+async def send_streaming_text_buttons(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    chunks: AsyncIterator[str],
+    buttons: Buttons,
+    min_interval: float = config.STREAM_EDIT_INTERVAL,
+) -> Optional[Message]:
+    """
+    Надсилає відповідь, що генерується частинами: перше повідомлення
+    надсилається одразу після отримання першої частини, а далі текст
+    дописується редагуванням повідомлення не частіше, ніж раз на min_interval
+    секунд (проміжні частини обʼєднуються). Кнопки додаються після завершення.
+
+    Параметри:
+        update (Update): Оновлення Telegram.
+        context (ContextTypes.DEFAULT_TYPE): Контекст.
+        chunks (AsyncIterator[str]): Асинхронний генератор частин тексту.
+        buttons (Buttons): Словник, де ключ – callback_data, значення – текст кнопки,
+            або готова клавіатура.
+        min_interval (float): Мінімальний інтервал між редагуваннями, с.
+    Повертає:
+        Optional[Message]: Останнє надіслане повідомлення.
+    """
+    chat_id = update.effective_message.chat_id
+    thread_id = update.effective_message.message_thread_id
+    message: Optional[Message] = None
+    text = ""
+    shown = ""
+    next_edit = 0.0
+
+    async for delta in chunks:
+        text += delta.encode("utf16", errors="surrogatepass").decode("utf16")
+        while len(text) > TELEGRAM_MESSAGE_LIMIT:
+            # Поточне повідомлення заповнене – фіксуємо його та починаємо нове
+            head, text = (
+                text[:TELEGRAM_MESSAGE_LIMIT],
+                text[TELEGRAM_MESSAGE_LIMIT:],
+            )
+            if message is None:
+                await context.bot.send_message(
+                    chat_id, text=head, message_thread_id=thread_id
+                )
+            else:
+                await _edit_text(context, message, head)
+            message, shown = None, ""
+        now = time.monotonic()
+        if message is None:
+            if text.strip():
+                message = await context.bot.send_message(
+                    chat_id, text=text, message_thread_id=thread_id
+                )
+                shown, next_edit = text, now + min_interval
+            continue
+        if now >= next_edit and text != shown:
+            try:
+                await _edit_text(context, message, text)
+                shown, next_edit = text, now + min_interval
+            except RetryAfter as e:
+                next_edit = now + e.retry_after
+                logger.warning("send_streaming_text_buttons: flood control %s", e)
+
+    reply_markup = as_keyboard(buttons)
+    if message is None:
+        return await context.bot.send_message(
+            chat_id,
+            text=text or "…",
+            reply_markup=reply_markup,
+            message_thread_id=thread_id,
+        )
+    try:
+        await _edit_text(context, message, text, reply_markup)
+    except RetryAfter as e:
+        await asyncio.sleep(e.retry_after)
+        await _edit_text(context, message, text, reply_markup)
+    logger.debug("send_streaming_text_buttons: надіслано %d символів", len(text))
+    return message
+
+
+@metrics.timed("send_image")
 async def send_image(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, name: str
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    name: str,
+    caption: Optional[str] = None,
+    buttons: Optional[Buttons] = None,
+    parse_mode: Optional[str] = None,
 ) -> Message:
     """
     Надсилає зображення з папки resources/images.
+    Після першого завантаження повторно використовує file_id з кешу,
+    тож файл не передається в Telegram вдруге, доки він не зміниться.
+
+    Текст, що йде після зображення, передається як caption: зображення,
+    текст і кнопки надсилаються одним повідомленням (один запит до Bot API).
+    Якщо текст довший за ліміт підпису, він надсилається окремим повідомленням.
 
     Параметри:
         update (Update): Оновлення Telegram.
         context (ContextTypes.DEFAULT_TYPE): Контекст.
         name (str): Назва файлу зображення (без розширення).
+        caption (Optional[str]): Текст під зображенням.
+        buttons (Optional[Buttons]): Кнопки під текстом (словник або готова клавіатура).
+        parse_mode (Optional[str]): Розмітка тексту (ParseMode) або None.
     Повертає:
-        Message: Надіслане повідомлення з фото.
+        Message: Останнє надіслане повідомлення.
     """
-    logger.debug("send_image: завантаження зображення %s", name)
+    chat_id = update.effective_chat.id
+    reply_markup = as_keyboard(buttons) if buttons is not None else None
+    extra: Dict[str, Any] = {}
+    overflow = None
+    if caption is not None:
+        caption = caption.encode("utf16", errors="surrogatepass").decode("utf16")
+        if len(caption.encode("utf-16-le")) // 2 <= TELEGRAM_CAPTION_LIMIT:
+            extra = {
+                "caption": caption,
+                "parse_mode": parse_mode,
+                "reply_markup": reply_markup,
+            }
+        else:
+            overflow = caption
+
     base_dir = os.path.join(os.path.dirname(__file__), "..", "resources")
     image_path = os.path.join(base_dir, "images", f"{name}.jpg")
-    with open(image_path, "rb") as image:
-        return await context.bot.send_photo(
-            chat_id=update.effective_chat.id, photo=image
+    bot_id = context.bot.id
+    file_id = file_id_cache.lookup(bot_id, name, image_path)
+    message = None
+    if file_id is not None:
+        try:
+            logger.debug("send_image: %s з кешу file_id", name)
+            message = await context.bot.send_photo(
+                chat_id=chat_id, photo=file_id, **extra
+            )
+        except BadRequest as e:
+            logger.warning("send_image: file_id для %s недійсний: %s", name, e)
+            file_id_cache.invalidate(bot_id, name)
+
+    if message is None:
+        logger.debug("send_image: завантаження зображення %s", name)
+        with open(image_path, "rb") as image:
+            data = image.read()
+        message = await context.bot.send_photo(chat_id=chat_id, photo=data, **extra)
+        if message.photo:
+            file_id_cache.store(
+                bot_id, name, image_path, data, message.photo[-1].file_id
+            )
+    if overflow is not None:
+        message = await context.bot.send_message(
+            chat_id, text=overflow, parse_mode=parse_mode, reply_markup=reply_markup
         )
+    return message
 
 
-async def show_main_menu(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, commands: Dict[str, str]
-) -> None:
+class MenuState:
     """
-    Встановлює команди бота та відображає головне меню.
-
-    Параметри:
-        update (Update): Оновлення Telegram.
-        context (ContextTypes.DEFAULT_TYPE): Контекст.
-        commands (Dict[str, str]): Словник команд (ключ – команда, значення – опис).
+    Меню команд бота.
+
+    Команди та кнопка меню реєструються один раз глобально при старті (лише
+    якщо змінилася версія – хеш словника команд), тож чат отримує меню без
+    жодних запитів до Bot API. Попередні версії бота встановлювали меню
+    окремо для кожного чату й записували для нього версію меню; така власна
+    область команд чату перекриває глобальні команди, тож для цих чатів вона
+    одноразово видаляється.
     """
-    command_list = [BotCommand(key, value) for key, value in commands.items()]
-    await context.bot.set_my_commands(
-        command_list, scope=BotCommandScopeChat(chat_id=update.effective_chat.id)
-    )
-    await context.bot.set_chat_menu_button(
-        menu_button=MenuButtonCommands(), chat_id=update.effective_chat.id
-    )
-    logger.info("Головне меню встановлено.")
 
+    NAMESPACE = "menu"
+    GLOBAL_KEY = "*"
 
-async def hide_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    def __init__(self, store: StateStore, commands: Dict[str, str]) -> None:
+        """
+        Параметри:
+            store (StateStore): Сховище версії меню та записів про меню чатів.
+            commands (Dict[str, str]): Словник команд (ключ – команда, значення – опис).
+        """
+        self.store = store
+        self.commands = commands
+        self.version = hashlib.sha256(
+            json.dumps(list(commands.items()), ensure_ascii=False).encode()
+        ).hexdigest()[:16]
+        self.scoped_chats: Set[int] = set()
+
+    def command_list(self) -> List[BotCommand]:
+        """
+        Повертає команди у форматі Bot API.
+        """
+        return [BotCommand(key, value) for key, value in self.commands.items()]
+
+    async def register(self, bot: Bot) -> None:
+        """
+        Реєструє команди та кнопку меню для всіх чатів, якщо версія меню
+        змінилася з попередньої реєстрації, і завантажує чати з власною
+        областю меню.
+
+        Параметри:
+            bot (Bot): Бот.
+        """
+        records = await self.store.aload_recent(self.NAMESPACE, 0.0)
+        self.scoped_chats = {int(key) for key in records if key != self.GLOBAL_KEY}
+        if self.scoped_chats:
+            logger.info("Чатів із застарілим меню: %d.", len(self.scoped_chats))
+        if records.get(self.GLOBAL_KEY) == self.version:
+            logger.info("Меню команд вже зареєстровано (версія %s).", self.version)
+            return
+        await asyncio.gather(
+            bot.set_my_commands(self.command_list()),
+            bot.set_chat_menu_button(menu_button=MenuButtonCommands()),
+        )
+        self.store.save(self.NAMESPACE, self.GLOBAL_KEY, self.version)
+        logger.info("Меню команд зареєстровано (версія %s).", self.version)
+
+    async def reset_chat(self, bot: Bot, chat_id: int) -> None:
+        """
+        Видаляє власну область меню чату, щоб для нього діяло глобальне меню.
+
+        Параметри:
+            bot (Bot): Бот.
+            chat_id (int): Ідентифікатор чату.
+        """
+        if chat_id not in self.scoped_chats:
+            return
+        self.scoped_chats.discard(chat_id)
+        await asyncio.gather(
+            bot.delete_my_commands(scope=BotCommandScopeChat(chat_id=chat_id)),
+            bot.set_chat_menu_button(chat_id=chat_id),
+        )
+        self.store.delete(self.NAMESPACE, str(chat_id))
+        logger.info("Застаріле меню чату %d видалено.", chat_id)
+
+
+@metrics.timed("show_main_menu")
+async def show_main_menu(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, menu: MenuState
+) -> None:
     """
-    Видаляє команди бота та скидає меню.
+    Забезпечує, що в чаті діє глобальне меню команд. Запит до Bot API
+    потрібен лише чатам, яким попередні версії бота встановили власне меню.
 
     Параметри:
         update (Update): Оновлення Telegram.
         context (ContextTypes.DEFAULT_TYPE): Контекст.
+        menu (MenuState): Меню команд.
     """
-    await context.bot.delete_my_commands(
-        scope=BotCommandScopeChat(chat_id=update.effective_chat.id)
-    )
-    await context.bot.set_chat_menu_button(
-        menu_button=MenuButtonDefault(), chat_id=update.effective_chat.id
-    )
-    logger.info("Головне меню сховано.")
+    await menu.reset_chat(context.bot, update.effective_chat.id)
 
 
 def load_message(name: str) -> str:
     """
-    Завантажує текст повідомлення з файлу у папці resources/messages.
+    Повертає текст повідомлення з папки resources/messages (з памʼяті).
 
     Параметри:
         name (str): Ім'я файлу (без розширення).
     Повертає:
         str: Вміст файлу.
     """
-    try:
-        base_dir = os.path.join(os.path.dirname(__file__), "..", "resources")
-        message_path = os.path.join(base_dir, "messages", f"{name}.txt")
-        with open(message_path, "r", encoding="utf8") as file:
-            content = file.read()
-            logger.debug("load_message: %s", name)
-            return content
-    except Exception as e:
-        logger.error("Помилка завантаження повідомлення %s: %s", name, e)
+    content = resource_registry.get("messages", name)
+    if content is None:
+        logger.error("Помилка завантаження повідомлення %s: не знайдено", name)
         return ""
+    logger.debug("load_message: %s", name)
+    return content
 
 
 def load_prompt(name: str) -> str:
     """
-    Завантажує prompt із файлу в папці resources/prompts.
+    Повертає prompt із папки resources/prompts (з памʼяті).
 
     Параметри:
         name (str): Ім'я файлу (без розширення).
     Повертає:
         str: Вміст файлу.
     """
-    try:
-        base_dir = os.path.join(os.path.dirname(__file__), "..", "resources")
-        prompt_path = os.path.join(base_dir, "prompts", f"{name}.txt")
-        with open(prompt_path, "r", encoding="utf8") as file:
-            content = file.read()
-            logger.debug("load_prompt: %s", name)
-            return content
-    except Exception as e:
-        logger.error("Помилка завантаження prompt %s: %s", name, e)
+    content = resource_registry.get("prompts", name)
+    if content is None:
+        logger.error("Помилка завантаження prompt %s: не знайдено", name)
         return ""
+    logger.debug("load_prompt: %s", name)
+    return content
 
 
 async def callback_echo_handler(
@@ -276,43 +536,179 @@ def is_correct_answer(user_answer: str, answers_list: List[str]) -> bool:
     return False
 
 
+class ChatState:
+    """
+    Стан одного чату: історія діалогу, відбитки питань квізу та лічильник
+    правильних відповідей.
+    """
+
+    __slots__ = ("messages", "quiz_history", "correct_answers", "last_access")
+
+    def __init__(self) -> None:
+        self.messages: List[MessageRecord] = []
+        # Відбитки поставлених питань; dict зберігає порядок додавання
+        self.quiz_history: Dict[bytes, Optional[MinHashSignature]] = {}
+        self.correct_answers = 0
+        self.last_access = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Перетворює стан на JSON-сумісний словник для сховища.
+        """
+        return {
+            "messages": [[m.role, m.content] for m in self.messages],
+            "quiz_history": [
+                [fingerprint.hex(), list(signature) if signature else None]
+                for fingerprint, signature in self.quiz_history.items()
+            ],
+            "correct_answers": self.correct_answers,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChatState":
+        """
+        Відновлює стан зі словника, збереженого to_dict.
+        """
+        state = cls()
+        state.messages = [
+            MessageRecord(role, content) for role, content in data.get("messages", [])
+        ]
+        state.quiz_history = {
+            bytes.fromhex(fingerprint): tuple(signature) if signature else None
+            for fingerprint, signature in data.get("quiz_history", [])
+        }
+        state.correct_answers = data.get("correct_answers", 0)
+        return state
+
+
 class Dialog:
     """
     Клас для управління історією діалогу та квізів.
+
+    Стан чату завантажується зі сховища при першому зверненні (або
+    заздалегідь через preload), змінений стан позначається у сховищі і
+    серіалізується лише під час пакетного запису, а чати, неактивні довше
+    за idle_ttl, вивантажуються з памʼяті.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        store: Optional[StateStore] = None,
+        idle_ttl: float = config.DIALOG_IDLE_TTL,
+        max_messages: int = config.DIALOG_MAX_MESSAGES,
+        quiz_history_limit: int = config.QUIZ_HISTORY_LIMIT,
+        near_duplicates: bool = config.QUIZ_NEAR_DUPLICATES,
+        near_duplicate_threshold: float = config.QUIZ_NEAR_DUPLICATE_THRESHOLD,
+    ) -> None:
         """
         Ініціалізує історію діалогів, історію квізів та лічильники правильних відповідей.
+
+        Параметри:
+            store (Optional[StateStore]): Сховище стану чатів (за замовчуванням – у памʼяті).
+            idle_ttl (float): Час неактивності, після якого стан чату вивантажується з памʼяті, с.
+            max_messages (int): Максимум повідомлень в історії діалогу чату.
+            quiz_history_limit (int): Максимум запамʼятованих питань квізу на чат.
+            near_duplicates (bool): Чи вважати повтором майже однакові питання (MinHash).
+            near_duplicate_threshold (float): Поріг схожості для майже однакових питань.
         """
-        self.dialogs: Dict[int, List[Dict[str, str]]] = {}
-        self.quiz_history: Dict[int, List[str]] = {}
-        self.correct_answers: Dict[int, int] = {}
+        self.store = store if store is not None else MemoryStateStore()
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.chats: "OrderedDict[int, ChatState]" = OrderedDict()
+        self.quiz_history_limit = quiz_history_limit
+        self.near_duplicates = near_duplicates
+        self.near_duplicate_threshold = near_duplicate_threshold
         logger.info("Ініціалізовано Dialog.")
 
+    def _state(self, chat_id: int) -> ChatState:
+        """
+        Повертає стан чату, за потреби завантажуючи його зі сховища.
+        """
+        state = self.chats.get(chat_id)
+        if state is None:
+            state = self._restore(self.store.load("dialog", str(chat_id)))
+        return self._cache(chat_id, state)
+
+    async def preload(self, chat_id: int) -> None:
+        """
+        Завантажує стан чату зі сховища, не блокуючи цикл подій, щоб
+        обробники отримали його вже з памʼяті.
+
+        Параметри:
+            chat_id (int): Ідентифікатор чату.
+        """
+        if chat_id in self.chats:
+            return
+        data = await self.store.aload("dialog", str(chat_id))
+        if chat_id not in self.chats:
+            self._cache(chat_id, self._restore(data))
+
+    @staticmethod
+    def _restore(data: Any) -> ChatState:
+        """
+        Створює стан чату зі значення сховища (словник або ще не записаний
+        ChatState).
+        """
+        if isinstance(data, ChatState):
+            return data
+        return ChatState.from_dict(data) if data else ChatState()
+
+    def _cache(self, chat_id: int, state: ChatState) -> ChatState:
+        """
+        Додає стан чату до памʼяті як найсвіжіший та вивантажує неактивні чати.
+        """
+        now = time.monotonic()
+        self.chats[chat_id] = state
+        self.chats.move_to_end(chat_id)
+        state.last_access = now
+        self._evict_idle(now)
+        return state
+
+    def _save(self, chat_id: int, state: ChatState) -> None:
+        """
+        Позначає стан чату зміненим: сховище серіалізує його (to_dict) лише
+        під час запису.
+        """
+        self.store.save("dialog", str(chat_id), state)
+
+    def _evict_idle(self, now: float) -> None:
+        """
+        Вивантажує з памʼяті чати, неактивні довше за idle_ttl
+        (їхній стан вже передано до сховища).
+        """
+        deadline = now - self.idle_ttl
+        while self.chats:
+            chat_id, state = next(iter(self.chats.items()))
+            if state.last_access >= deadline:
+                break
+            del self.chats[chat_id]
+            logger.debug("Стан чату %d вивантажено з памʼяті.", chat_id)
+
     def get_history(self, chat_id: int) -> List[Dict[str, str]]:
         """
-        Отримує історію повідомлень для вказаного чату.
+        Отримує історію повідомлень для вказаного чату у форматі OpenAI API.
 
         Параметри:
             chat_id (int): Ідентифікатор чату.
         Повертає:
             List[Dict[str, str]]: Список повідомлень діалогу.
         """
-        return self.dialogs.get(chat_id, [])
+        return [message.to_wire() for message in self._state(chat_id).messages]
 
     def add_message(self, chat_id: int, role: str, content: str) -> None:
         """
         Додає повідомлення до історії діалогу.
+        Зберігаються лише останні max_messages повідомлень.
 
         Параметри:
             chat_id (int): Ідентифікатор чату.
             role (str): Роль відправника (наприклад, "user" або "system").
             content (str): Текст повідомлення.
         """
-        if chat_id not in self.dialogs:
-            self.dialogs[chat_id] = []
-        self.dialogs[chat_id].append({"role": role, "content": content})
+        state = self._state(chat_id)
+        state.messages.append(MessageRecord(role, content))
+        del state.messages[: -self.max_messages]
+        self._save(chat_id, state)
         logger.debug("Додано повідомлення для чату %d: %s", chat_id, content)
 
     def clear_history(self, chat_id: int) -> None:
@@ -322,30 +718,34 @@ class Dialog:
         Параметри:
             chat_id (int): Ідентифікатор чату.
         """
-        if chat_id in self.dialogs:
-            del self.dialogs[chat_id]
-        if chat_id in self.quiz_history:
-            del self.quiz_history[chat_id]
-        if chat_id in self.correct_answers:
-            del self.correct_answers[chat_id]
+        self.chats.pop(chat_id, None)
+        self.store.delete("dialog", str(chat_id))
         logger.info("Історія для чату %d очищена.", chat_id)
 
     def add_quiz_question(self, chat_id: int, question: str) -> None:
         """
         Додає квізове питання до історії для зазначеного чату.
+        Зберігається лише відбиток питання; найстаріші відбитки витісняються
+        після quiz_history_limit питань.
 
         Параметри:
             chat_id (int): Ідентифікатор чату.
             question (str): Текст питання.
         """
-        if chat_id not in self.quiz_history:
-            self.quiz_history[chat_id] = []
-        self.quiz_history[chat_id].append(question)
+        state = self._state(chat_id)
+        history = state.quiz_history
+        signature = minhash_signature(question) if self.near_duplicates else None
+        history[question_fingerprint(question)] = signature
+        while len(history) > self.quiz_history_limit:
+            del history[next(iter(history))]
+        self._save(chat_id, state)
         logger.debug("Додано квізове питання для чату %d: %s", chat_id, question)
 
     def has_question_been_asked(self, chat_id: int, question: str) -> bool:
         """
         Перевіряє, чи було задано це питання раніше у квізі.
+        Порівнюються відбитки нормалізованих питань (O(1)); якщо увімкнено
+        near_duplicates, також шукаються майже однакові питання.
 
         Параметри:
             chat_id (int): Ідентифікатор чату.
@@ -353,7 +753,19 @@ class Dialog:
         Повертає:
             bool: True, якщо питання вже було поставлено, інакше False.
         """
-        return chat_id in self.quiz_history and question in self.quiz_history[chat_id]
+        history = self._state(chat_id).quiz_history
+        if not history:
+            return False
+        if question_fingerprint(question) in history:
+            return True
+        if not self.near_duplicates:
+            return False
+        signature = minhash_signature(question)
+        return any(
+            other is not None
+            and similarity(signature, other) >= self.near_duplicate_threshold
+            for other in history.values()
+        )
 
     def increment_correct_answers(self, chat_id: int) -> None:
         """
@@ -362,12 +774,10 @@ class Dialog:
         Параметри:
             chat_id (int): Ідентифікатор чату.
         """
-        if chat_id not in self.correct_answers:
-            self.correct_answers[chat_id] = 0
-        self.correct_answers[chat_id] += 1
-        logger.debug(
-            "Чат %d: правильних відповідей %d", chat_id, self.correct_answers[chat_id]
-        )
+        state = self._state(chat_id)
+        state.correct_answers += 1
+        self._save(chat_id, state)
+        logger.debug("Чат %d: правильних відповідей %d", chat_id, state.correct_answers)
 
     def get_correct_answers(self, chat_id: int) -> int:
         """
@@ -378,4 +788,4 @@ class Dialog:
         Повертає:
             int: Кількість правильних відповідей.
         """
-        return self.correct_answers.get(chat_id, 0)
+        return self._state(chat_id).correct_answers
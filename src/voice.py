@@ -0,0 +1,203 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import asyncio
+import io
+import logging
+
+from src import config, metrics
+
+logger = logging.getLogger(__name__)
+
+# Формат PCM-аудіо для розпізнавання мовлення: 16 кГц, 16 біт, моно
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+class VoiceProcessingError(Exception):
+    """
+    Помилка обробки голосового повідомлення (ffmpeg, STT або TTS).
+    """
+
+
+class VoiceBusyError(VoiceProcessingError):
+    """
+    Черга голосових повідомлень переповнена.
+    """
+
+
+class VoicePipeline:
+    """
+    Обробка голосу поза циклом подій і без тимчасових файлів.
+
+    ffmpeg запускається як асинхронний підпроцес, що читає аудіо зі stdin і
+    пише результат у stdout, а блокуючі розпізнавання
+    (SpeechRecognition) та синтез мовлення (gTTS) виконуються в обмеженому
+    пулі потоків. Кількість одночасних обробок обмежена семафором, а
+    кількість очікуючих – max_queue.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = config.VOICE_MAX_CONCURRENCY,
+        max_queue: int = config.VOICE_MAX_QUEUE,
+        ffmpeg: str = "ffmpeg",
+    ) -> None:
+        """
+        Параметри:
+            max_concurrency (int): Максимум одночасних обробок (і потоків пулу).
+            max_queue (int): Максимум обробок, що очікують на вільне місце.
+            ffmpeg (str): Шлях до виконуваного файлу ffmpeg.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.ffmpeg = ffmpeg
+        self.waiting = 0
+        self.active = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="voice"
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Кількість голосових задач, що очікують на вільне місце в пулі.
+        """
+        return self.waiting
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Займає місце в пулі обробки голосу на час блоку.
+
+        Викликає:
+            VoiceBusyError: Якщо черга очікування переповнена.
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise VoiceBusyError("Черга голосових повідомлень переповнена.")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        logger.debug(
+            "VoicePipeline: активних %d, у черзі %d", self.active, self.waiting
+        )
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def run_ffmpeg(self, data: bytes, *args: str) -> bytes:
+        """
+        Пропускає аудіо через ffmpeg у памʼяті: вхід подається в stdin,
+        результат читається зі stdout, тож тимчасові файли не потрібні.
+
+        Параметри:
+            data (bytes): Вхідне аудіо.
+            *args (str): Аргументи ffmpeg для вихідного потоку.
+        Повертає:
+            bytes: Вихідне аудіо.
+        Викликає:
+            VoiceProcessingError: Якщо ffmpeg завершився з помилкою.
+        """
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg,
+            "-loglevel",
+            "error",
+            "-i",
+            "pipe:0",
+            *args,
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate(input=data)
+        if process.returncode != 0:
+            raise VoiceProcessingError(
+                f"ffmpeg завершився з кодом {process.returncode}: "
+                f"{stderr.decode(errors='replace').strip()}"
+            )
+        return stdout
+
+    @metrics.timed("ffmpeg_decode")
+    async def to_pcm(self, data: bytes) -> bytes:
+        """
+        Декодує аудіо у сирий PCM (16 біт, моно, SAMPLE_RATE Гц).
+        """
+        return await self.run_ffmpeg(
+            data, "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE)
+        )
+
+    @metrics.timed("ffmpeg_encode")
+    async def to_opus(self, data: bytes) -> bytes:
+        """
+        Кодує аудіо в OGG/Opus для голосового повідомлення Telegram.
+        """
+        return await self.run_ffmpeg(data, "-c:a", "libopus", "-f", "ogg")
+
+    @metrics.timed("stt")
+    async def recognize(self, pcm: bytes, language: str = "uk-UA") -> Optional[str]:
+        """
+        Розпізнає мовлення з PCM-аудіо (Google Speech Recognition) у пулі потоків.
+
+        Параметри:
+            pcm (bytes): Аудіо у форматі, який повертає to_pcm.
+            language (str): Мова розпізнавання.
+        Повертає:
+            Optional[str]: Розпізнаний текст або None, якщо мовлення не розпізнано.
+        Викликає:
+            VoiceProcessingError: Якщо сервіс розпізнавання недоступний.
+        """
+        from speech_recognition import (
+            AudioData,
+            Recognizer,
+            RequestError,
+            UnknownValueError,
+        )
+
+        def _recognize() -> Optional[str]:
+            audio_data = AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH)
+            try:
+                return Recognizer().recognize_google(audio_data, language=language)  # type: ignore
+            except UnknownValueError:
+                return None
+            except RequestError as e:
+                raise VoiceProcessingError(
+                    f"Помилка розпізнавання мовлення: {e}"
+                ) from e
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _recognize)
+
+    @metrics.timed("tts")
+    async def synthesize(self, text: str, lang: str = "uk") -> bytes:
+        """
+        Синтезує мовлення (gTTS) у MP3 в памʼяті у пулі потоків.
+
+        Параметри:
+            text (str): Текст для озвучення.
+            lang (str): Мова озвучення.
+        Повертає:
+            bytes: Аудіо у форматі MP3.
+        """
+        from gtts import gTTS
+
+        def _synthesize() -> bytes:
+            buffer = io.BytesIO()
+            gTTS(text=text, lang=lang).write_to_fp(buffer)
+            return buffer.getvalue()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _synthesize)
+
+    def shutdown(self) -> None:
+        """
+        Зупиняє пул потоків.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
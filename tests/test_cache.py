@@ -0,0 +1,79 @@
+"""
+Тести кешів (src.cache).
+"""
+
+import asyncio
+import time
+
+from src.cache import SQLiteCacheStore, TTLCache, TranslationCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1}
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.cache.time.time", lambda: now[0])
+    cache = TTLCache(max_size=10, ttl=5)
+    cache.put("a", 1)
+    cache.put("b", 2, expires=now[0] + 100)
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert len(cache) == 1
+
+
+def test_sqlite_cache_store_batches_writes_and_reads_them(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def write():
+        store = SQLiteCacheStore(path)
+        expires = time.time() + 60
+        for i in range(50):
+            store.put(f"k{i}", f"v{i}", expires)
+        assert await store.get("k7") == ("v7", expires)
+        await store._writer
+        assert store.writes == 1
+        assert await store.get("k49") == ("v49", expires)
+        store.put("late", "v", expires)
+        store.put("stale", "v", time.time() - 1)
+        store.close()
+
+    async def read():
+        store = SQLiteCacheStore(path)
+        assert (await store.get("late"))[0] == "v"
+        assert await store.get("stale") is None
+        assert await store.get("missing") is None
+        assert store.purge() == 1
+        store.close()
+
+    asyncio.run(write())
+    asyncio.run(read())
+
+
+def test_translation_cache_uses_disk_after_restart(tmp_path):
+    path = str(tmp_path / "translations.db")
+
+    async def write():
+        cache = TranslationCache(path=path)
+        cache.put("Привіт,  світ!", "to_en", "prompt", "Hello, world!")
+        cache.close()
+
+    async def read():
+        cache = TranslationCache(path=path)
+        assert await cache.get("Привіт, світ! ", "to_en", "prompt") == "Hello, world!"
+        assert await cache.get("Привіт, світ!", "to_de", "prompt") is None
+        assert cache.stats()["disk_hits"] == 1
+        cache.close()
+
+    asyncio.run(write())
+    asyncio.run(read())
@@ -0,0 +1,71 @@
+"""
+Тести відбитків та MinHash-схожості питань квізу (src.dedup).
+"""
+
+from src.dedup import (
+    MINHASH_PERMUTATIONS,
+    minhash_signature,
+    normalize_question,
+    question_fingerprint,
+    similarity,
+)
+from src.storage import MemoryStateStore
+from src.util import Dialog
+
+
+def test_normalize_question():
+    assert normalize_question("  Яка СТОЛИЦЯ, Франції?! ") == "яка столиця франції"
+
+
+def test_fingerprint_ignores_case_and_punctuation():
+    assert question_fingerprint("Яка столиця Франції?") == question_fingerprint(
+        "яка   столиця франції"
+    )
+    assert question_fingerprint("Яка столиця Франції?") != question_fingerprint(
+        "Яка столиця Італії?"
+    )
+    assert len(question_fingerprint("питання")) == 8
+
+
+def test_minhash_similarity():
+    question = "Яка найвища гора в Україні та яка її висота?"
+    signature = minhash_signature(question)
+    assert len(signature) == MINHASH_PERMUTATIONS
+    assert similarity(signature, minhash_signature(question)) == 1.0
+    near = minhash_signature("Яка найвища гора в Україні і яка її висота?")
+    other = minhash_signature("Скільки планет у Сонячній системі?")
+    assert similarity(signature, near) >= 0.6
+    assert similarity(signature, other) <= 0.2
+
+
+def test_minhash_short_text():
+    assert similarity(minhash_signature("так"), minhash_signature("Так!")) == 1.0
+
+
+def test_dialog_detects_repeated_questions():
+    dialog = Dialog(MemoryStateStore(), near_duplicates=True, quiz_history_limit=2)
+    dialog.add_quiz_question(1, "Яка найвища гора в Україні та яка її висота?")
+    assert dialog.has_question_been_asked(
+        1, "яка найвища гора в україні та яка її висота"
+    )
+    assert dialog.has_question_been_asked(
+        1, "Яка найвища гора в Україні і яка її висота?"
+    )
+    assert not dialog.has_question_been_asked(1, "Скільки планет у Сонячній системі?")
+    assert not dialog.has_question_been_asked(2, "Яка найвища гора в Україні?")
+    dialog.add_quiz_question(1, "Перше питання про річки")
+    dialog.add_quiz_question(1, "Друге питання про озера")
+    assert not dialog.has_question_been_asked(
+        1, "Яка найвища гора в Україні та яка її висота?"
+    )
+
+
+def test_dialog_exact_only_without_near_duplicates():
+    dialog = Dialog(MemoryStateStore(), near_duplicates=False)
+    dialog.add_quiz_question(1, "Яка найвища гора в Україні та яка її висота?")
+    assert dialog.has_question_been_asked(
+        1, "Яка найвища гора в Україні та яка її висота"
+    )
+    assert not dialog.has_question_been_asked(
+        1, "Яка найвища гора в Україні і яка її висота?"
+    )
@@ -0,0 +1,130 @@
+"""
+Тести маркерного кошика та допуску запитів до GPT (src.limits).
+"""
+
+import asyncio
+
+import pytest
+
+from src.limits import (
+    AdmissionController,
+    QueueFullError,
+    RateLimitExceededError,
+    TokenBucket,
+)
+
+
+def test_token_bucket_allows_burst_then_rate():
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    bucket.updated = 0.0
+    assert [bucket.try_acquire(now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire(now=0.0) == pytest.approx(0.5)
+    assert bucket.try_acquire(now=0.5) == 0.0
+
+
+def test_token_bucket_reserve_queues_in_debt():
+    bucket = TokenBucket(rate=1.0, capacity=1)
+    bucket.updated = 0.0
+    assert bucket.reserve(now=0.0) == 0.0
+    assert bucket.reserve(now=0.0) == pytest.approx(1.0)
+    assert bucket.reserve(now=0.0) == pytest.approx(2.0)
+    assert not bucket.is_full(2.5)
+    assert bucket.is_full(3.0)
+
+
+def test_chat_rate_limit():
+    async def scenario():
+        limiter = AdmissionController(chat_rate=0.01, chat_burst=2)
+        for _ in range(2):
+            async with limiter.slot(1):
+                pass
+        with pytest.raises(RateLimitExceededError) as error:
+            async with limiter.slot(1):
+                pass
+        assert error.value.retry_after > 0
+        # Ліміт одного чату не впливає на інші чати та фонові запити
+        async with limiter.slot(2):
+            pass
+        async with limiter.slot():
+            pass
+        assert limiter.rejected == 1
+
+    asyncio.run(scenario())
+
+
+def test_slots_are_given_to_chats_round_robin():
+    async def scenario():
+        limiter = AdmissionController(max_concurrency=1, max_queue=10, chat_burst=10)
+        order = []
+        release = asyncio.Event()
+
+        async def request(chat_id, label):
+            async with limiter.slot(chat_id):
+                order.append(label)
+                if label == "hold":
+                    await release.wait()
+
+        holder = asyncio.create_task(request(0, "hold"))
+        await asyncio.sleep(0)
+        tasks = []
+        for chat_id, label in [(1, "a1"), (1, "a2"), (1, "a3"), (2, "b1"), (3, "c1")]:
+            tasks.append(asyncio.create_task(request(chat_id, label)))
+            await asyncio.sleep(0)
+        assert limiter.stats() == {"active": 1, "waiting": 5, "rejected": 0}
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        assert order == ["hold", "a1", "b1", "c1", "a2", "a3"]
+        assert limiter.stats() == {"active": 0, "waiting": 0, "rejected": 0}
+
+    asyncio.run(scenario())
+
+
+def test_queue_full_and_wait_timeout():
+    async def scenario():
+        limiter = AdmissionController(
+            max_concurrency=1, max_queue=1, max_wait=0.05, chat_burst=10
+        )
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot(1):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(limiter.slot(2).__aenter__())
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            async with limiter.slot(3):
+                pass
+        with pytest.raises(QueueFullError):
+            await waiter
+        assert limiter.stats() == {"active": 1, "waiting": 0, "rejected": 2}
+        release.set()
+        await holder
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        limiter = AdmissionController(max_concurrency=1, max_queue=5, chat_burst=10)
+        release = asyncio.Event()
+
+        async def request(chat_id):
+            async with limiter.slot(chat_id):
+                await release.wait()
+
+        holder = asyncio.create_task(request(1))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(request(2))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert limiter.waiting == 0
+        release.set()
+        await holder
+        assert limiter.stats() == {"active": 0, "waiting": 0, "rejected": 0}
+
+    asyncio.run(scenario())
@@ -0,0 +1,186 @@
+"""
+Тести буфера питань квізу та резервуару фактів (src.prefetch).
+"""
+
+import asyncio
+
+import pytest
+
+from src.limits import RateLimitExceededError
+from src.prefetch import FactReservoir, QuizItem, QuizPool, parse_quiz_item
+
+
+def test_parse_quiz_item():
+    assert parse_quiz_item({"question": " Q? ", "answers": [" Київ ", "", 1]}) == (
+        QuizItem("Q?", ["київ"])
+    )
+    assert parse_quiz_item({"question": "Q?", "answers": []}) is None
+    assert parse_quiz_item(None) is None
+
+
+class _Producer:
+    """
+    Генератор питань, що запамʼятовує виклики.
+    """
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    async def __call__(self, theme, chat_id):
+        self.calls.append((theme, chat_id))
+        await asyncio.sleep(0)
+        if self.error is not None and chat_id is not None:
+            raise self.error
+        return QuizItem(f"{theme} {len(self.calls)}", ["a"])
+
+
+def test_quiz_pool_serves_from_buffer_and_refills():
+    async def scenario():
+        producer = _Producer()
+        pool = QuizPool(producer, pool_size=3, max_age=60)
+        pool.warm(["history"])
+        await asyncio.sleep(0.01)
+        assert pool.size("history") == 3
+        item = await pool.get("history", chat_id=1)
+        assert item.question == "history 1"
+        await asyncio.sleep(0.01)
+        assert pool.size("history") == 3
+        assert all(chat_id is None for _, chat_id in producer.calls)
+        await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_quiz_pool_skips_excluded_items():
+    async def scenario():
+        pool = QuizPool(_Producer(), pool_size=2, max_age=60)
+        pool.warm(["science"])
+        await asyncio.sleep(0.01)
+        item = await pool.get(
+            "science", exclude=lambda item: item.question == "science 1"
+        )
+        assert item.question == "science 2"
+        assert (await pool.get("science")).question == "science 1"
+        await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_quiz_pool_produces_directly_for_chat_when_empty():
+    async def scenario():
+        producer = _Producer()
+        pool = QuizPool(producer, pool_size=1, max_age=60)
+        item = await pool.get("art", chat_id=42)
+        assert item is not None
+        assert producer.calls[0] == ("art", 42)
+        await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_quiz_pool_reports_chat_admission_errors():
+    async def scenario():
+        producer = _Producer(error=RateLimitExceededError("limit", retry_after=1.0))
+        pool = QuizPool(producer, pool_size=1, max_age=60)
+        with pytest.raises(RateLimitExceededError):
+            await pool.get("art", chat_id=42)
+        await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_quiz_pool_drops_stale_items():
+    async def scenario():
+        producer = _Producer()
+        pool = QuizPool(producer, pool_size=1, max_age=0.05)
+        pool.warm(["art"])
+        await asyncio.sleep(0.1)
+        assert pool.size("art") == 1
+        item = await pool.get("art", chat_id=5)
+        assert item is not None and item.question != "art 1"
+        assert ("art", 5) in producer.calls
+        await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+class _FactProducer:
+    """
+    Генератор пакетів фактів із затримкою.
+    """
+
+    def __init__(self, delay=0.05, batch=3, repeat=False):
+        self.delay = delay
+        self.batch = batch
+        self.repeat = repeat
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.repeat:
+            return ["той самий факт"] * self.batch
+        return [f"факт {self.calls}.{i}" for i in range(self.batch)]
+
+
+def test_fact_reservoir_cold_get_waits_for_first_batch():
+    async def scenario():
+        producer = _FactProducer(delay=0.05, batch=3)
+        reservoir = FactReservoir(
+            producer, capacity=9, low_watermark=2, seen_limit=100, batch_size=3
+        )
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await reservoir.get() is not None
+        assert loop.time() - started < 0.1
+        await asyncio.sleep(0.3)
+        # Поповнення йде пакетами, доки резервуар не заповниться, і зупиняється
+        assert 9 <= len(reservoir) < 9 + 3
+        assert not reservoir._batches
+        calls = producer.calls
+        await asyncio.sleep(0.1)
+        assert producer.calls == calls
+        await reservoir.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_fact_reservoir_parallel_batches_for_waiters():
+    async def scenario():
+        producer = _FactProducer(delay=0.05, batch=2)
+        reservoir = FactReservoir(
+            producer, capacity=6, low_watermark=1, seen_limit=100, batch_size=2
+        )
+        facts = await asyncio.gather(*(reservoir.get() for _ in range(6)))
+        assert all(facts)
+        assert len(set(facts)) == 6
+        await reservoir.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_fact_reservoir_drops_repeats():
+    async def scenario():
+        producer = _FactProducer(delay=0.0, batch=3, repeat=True)
+        reservoir = FactReservoir(
+            producer, capacity=5, low_watermark=1, seen_limit=100, batch_size=3
+        )
+        assert await reservoir.get() == "той самий факт"
+        await asyncio.sleep(0.01)
+        assert await reservoir.get() is None
+        await reservoir.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_fact_reservoir_returns_none_on_errors():
+    async def scenario():
+        async def failing():
+            raise RuntimeError("down")
+
+        reservoir = FactReservoir(failing, capacity=5, low_watermark=1, batch_size=5)
+        assert await reservoir.get() is None
+        await reservoir.aclose()
+
+    asyncio.run(scenario())
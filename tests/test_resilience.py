@@ -0,0 +1,210 @@
+"""
+Тести запобіжника та повторів запитів до OpenAI (src.resilience) проти
+локального фейкового сервера benchmarks.fake_openai.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import BadRequestError
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from src.gpt import ChatGptService, create_http_client
+from src.limits import AdmissionController
+from src.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    ResilientCaller,
+    retry_after,
+)
+
+
+class _Clock:
+    """
+    Керований замінник time.monotonic.
+    """
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr("src.resilience.time.monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 4.0
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after == pytest.approx(6.0)
+
+
+def test_breaker_success_resets_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+    clock.now += 10.0
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_breaker_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 10.0
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    # Запит, що завершився не через стан API, звільняє пробне місце
+    clock.now += 10.0
+    breaker.before_call()
+    breaker.record_ignored()
+    breaker.before_call()
+
+
+def _error(headers):
+    response = httpx.Response(
+        429, headers=headers, request=httpx.Request("POST", "http://test")
+    )
+    return BadRequestError("error", response=response, body=None)
+
+
+def test_retry_after_headers():
+    assert retry_after(_error({"retry-after-ms": "1500"})) == pytest.approx(1.5)
+    assert retry_after(_error({"retry-after": "2"})) == pytest.approx(2.0)
+    date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+    assert 25 < retry_after(_error({"retry-after": date})) <= 30
+    assert retry_after(_error({})) is None
+    assert retry_after(_error({"retry-after": "soon"})) is None
+    assert retry_after(ValueError()) is None
+
+
+def test_backoff_honours_retry_after():
+    caller = ResilientCaller(backoff_base=0.01, backoff_max=0.01)
+    assert caller.backoff(1, _error({"retry-after": "3"})) == pytest.approx(3.0)
+    assert caller.backoff(1, ValueError()) <= 0.01
+
+
+def _run_with_server(scenario, **caller):
+    """
+    Запускає сценарій з фейковим сервером OpenAI та ChatGptService.
+    """
+
+    async def main():
+        server = FakeOpenAIServer(latency=0.0)
+        await server.start()
+        service = ChatGptService(
+            "sk-test",
+            http_client=create_http_client(proxy=None),
+            base_url=server.base_url,
+            limiter=AdmissionController(),
+            resilience=ResilientCaller(**caller),
+            response_cache=None,
+        )
+        try:
+            await scenario(server, service)
+        finally:
+            await service.aclose()
+            await server.stop()
+
+    asyncio.run(main())
+
+
+def test_retries_429_after_retry_after():
+    async def scenario(server, service):
+        server.inject(429, retry_after=0.3)
+        started = time.monotonic()
+        assert await service.complete("system", "hello")
+        assert time.monotonic() - started >= 0.3
+        assert server.requests == 2
+        assert service.resilience.retries == 1
+
+    _run_with_server(scenario, deadline=5.0, backoff_base=0.01)
+
+
+def test_retries_server_errors_until_success():
+    async def scenario(server, service):
+        server.inject(503, count=2)
+        assert await service.complete("system", "hello")
+        assert server.requests == 3
+        assert service.resilience.breaker.state == CircuitBreaker.CLOSED
+
+    _run_with_server(scenario, deadline=5.0, max_attempts=3, backoff_base=0.01)
+
+
+def test_client_error_is_not_retried():
+    async def scenario(server, service):
+        server.inject(400)
+        with pytest.raises(BadRequestError):
+            await service.complete("system", "hello")
+        assert server.requests == 1
+        assert service.resilience.breaker.failures == 0
+
+    _run_with_server(scenario, deadline=5.0, backoff_base=0.01)
+
+
+def test_deadline_covers_slow_response():
+    async def scenario(server, service):
+        server.inject(200, delay=2.0)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            await service.complete("system", "hello")
+        assert time.monotonic() - started < 1.0
+
+    _run_with_server(scenario, deadline=0.3, backoff_base=0.01)
+
+
+def test_outage_opens_breaker_and_recovers():
+    async def scenario(server, service):
+        server.inject(500, count=10)
+        with pytest.raises(Exception):
+            await service.complete("system", "hello")
+        assert service.resilience.breaker.state == CircuitBreaker.OPEN
+        requests = server.requests
+        with pytest.raises(CircuitOpenError):
+            await service.complete("system", "hello")
+        assert server.requests == requests
+        server.faults.clear()
+        await asyncio.sleep(0.3)
+        assert await service.complete("system", "hello")
+        assert service.resilience.breaker.state == CircuitBreaker.CLOSED
+
+    _run_with_server(
+        scenario,
+        deadline=5.0,
+        max_attempts=3,
+        backoff_base=0.01,
+        breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.2),
+    )
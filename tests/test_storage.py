@@ -0,0 +1,137 @@
+"""
+Тести сховищ стану чатів (src.storage).
+"""
+
+import asyncio
+
+from src.storage import MemoryStateStore, SQLiteStateStore, StorePersistence
+
+
+class _State:
+    """
+    Обʼєкт стану, що серіалізується лише під час запису.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def to_dict(self):
+        return {"value": self.value}
+
+
+def test_sqlite_reads_own_unwritten_changes(tmp_path):
+    async def scenario():
+        store = SQLiteStateStore(str(tmp_path / "state.db"), batch_size=1000)
+        store.save("dialog", "1", {"a": 1})
+        assert await store.aload("dialog", "1") == {"a": 1}
+        assert store.load("dialog", "1") == {"a": 1}
+        store.delete("dialog", "1")
+        assert await store.aload("dialog", "1") is None
+        assert store.writes == 0
+        store.close()
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_reads_batch_while_it_is_written(tmp_path):
+    async def scenario():
+        store = SQLiteStateStore(str(tmp_path / "state.db"), batch_size=2)
+        store.save("dialog", "1", {"a": 1})
+        store.save("dialog", "2", {"b": 2})
+        # Пакет передано на запис у фоні, але він ще не записаний
+        assert not store._pending and store._writing
+        assert await store.aload("dialog", "2") == {"b": 2}
+        await asyncio.gather(*store._flushes)
+        assert store.writes == 1
+        assert not store._writing
+        store.close()
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_flush_persists_across_instances(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def write():
+        store = SQLiteStateStore(path, batch_size=1000)
+        store.save("dialog", "1", _State(1))
+        store.save("dialog", "2", {"b": 2})
+        store.save("user_data", "1", {"mode": "gpt"})
+        await store.aflush()
+        assert store.writes == 1
+        store.save("dialog", "2", {"b": 3})
+        store.delete("user_data", "1")
+        store.close()
+
+    async def read():
+        store = SQLiteStateStore(path)
+        assert await store.aload("dialog", "1") == {"value": 1}
+        assert await store.aload("dialog", "2") == {"b": 3}
+        assert await store.aload("user_data", "1") is None
+        assert await store.aload_recent("dialog", 0) == {
+            "1": {"value": 1},
+            "2": {"b": 3},
+        }
+        store.close()
+
+    asyncio.run(write())
+    asyncio.run(read())
+
+
+def test_sqlite_load_recent_merges_unwritten(tmp_path):
+    async def scenario():
+        store = SQLiteStateStore(str(tmp_path / "state.db"), batch_size=1000)
+        store.save("menu", "1", "v1")
+        store.save("menu", "2", "v1")
+        await store.aflush()
+        store.delete("menu", "1")
+        store.save("menu", "3", "v2")
+        assert await store.aload_recent("menu", 0) == {"2": "v1", "3": "v2"}
+        assert store.load_recent("menu", 0) == {"2": "v1", "3": "v2"}
+        store.close()
+
+    asyncio.run(scenario())
+
+
+def test_memory_store_evicts_idle_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.storage.time.time", lambda: now[0])
+    store = MemoryStateStore(idle_ttl=10.0)
+    store.save("dialog", "1", {"a": 1})
+    now[0] += 5
+    store.save("dialog", "2", {"b": 2})
+    now[0] += 6
+    assert store.load("dialog", "2") == {"b": 2}
+    assert store.load("dialog", "1") is None
+    assert store.evicted == 1
+
+
+def test_persistence_loads_user_data_lazily_once(monkeypatch):
+    async def scenario():
+        store = MemoryStateStore()
+        store.save("user_data", "7", {"mode": "quiz", "score": 1})
+        persistence = StorePersistence(store, idle_ttl=60.0)
+        assert await persistence.get_user_data() == {}
+        user_data = {"score": 5}
+        await persistence.refresh_user_data(7, user_data)
+        assert user_data == {"mode": "quiz", "score": 5}
+        store.save("user_data", "7", {"mode": "talk"})
+        await persistence.refresh_user_data(7, user_data)
+        assert user_data["mode"] == "quiz"
+
+    asyncio.run(scenario())
+
+
+def test_persistence_forgets_idle_users(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.storage.time.monotonic", lambda: now[0])
+
+    async def scenario():
+        persistence = StorePersistence(MemoryStateStore(), idle_ttl=10.0)
+        for user_id in range(100):
+            await persistence.refresh_user_data(user_id, {})
+        now[0] += 11
+        await persistence.refresh_user_data(1000, {})
+        assert list(persistence._loaded_users) == [1000]
+
+    asyncio.run(scenario())